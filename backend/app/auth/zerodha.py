@@ -7,6 +7,8 @@ from fastapi import APIRouter, HTTPException, Query, Response, Request
 from dotenv import load_dotenv
 from fastapi.responses import RedirectResponse
 from backend.app.services.db import save_zerodha_session, deactivate_session
+from backend.app.services.kite_client import kite_post
+from backend.app.services.zerodha_holdings import invalidate_session_cache
 
 # Compute .env path relative to this file (backend/app/auth/ -> backend/)
 _env_path = Path(__file__).resolve().parents[2] / ".env"
@@ -29,15 +31,19 @@ def zerodha_callback(request_token: str = Query(None)):
         f"{KITE_API_KEY}{request_token}{KITE_API_SECRET}".encode()
     ).hexdigest()
 
-    session_url = "https://api.kite.trade/session/token"
-
     payload = {
         "api_key": KITE_API_KEY,
         "request_token": request_token,
         "checksum": checksum
     }
 
-    response = requests.post(session_url, data=payload)
+    try:
+        response = kite_post("/session/token", payload)
+    except requests.RequestException:
+        raise HTTPException(
+            status_code=504,
+            detail="Zerodha authentication request failed"
+        )
 
     if response.status_code != 200:
         raise HTTPException(
@@ -58,7 +64,11 @@ def zerodha_callback(request_token: str = Query(None)):
 
     # Fire-and-forget trade sync with the fresh token
     from backend.app.services.trade_sync import sync_trades_from_kite
-    threading.Thread(target=sync_trades_from_kite, args=(access_token,), daemon=True).start()
+    threading.Thread(
+        target=sync_trades_from_kite,
+        kwargs={"access_token": access_token, "user_id": user_id, "session_id": session_id, "trigger": "login"},
+        daemon=True,
+    ).start()
 
     # Set session cookie and redirect to frontend
     redirect = RedirectResponse(
@@ -82,6 +92,7 @@ def zerodha_logout(request: Request):
     session_id = request.cookies.get("tf_session")
     if session_id:
         deactivate_session(session_id)
+        invalidate_session_cache(session_id)
 
     resp = Response(content='{"status":"logged_out"}', media_type="application/json")
     resp.delete_cookie("tf_session", path="/")
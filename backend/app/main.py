@@ -16,11 +16,13 @@ _env_path = Path(__file__).resolve().parents[1] / ".env"
 load_dotenv(dotenv_path=_env_path)
 
 from backend.app.auth.zerodha import router as zerodha_auth_router
-from backend.app.services.db import init_db, init_holdings_snapshot_table, create_delivery_cache_table, create_trades_table
+from backend.app.services.db import close_connections, run_migrations
+from backend.app.services.enrichment import start_enrichment_worker, stop_enrichment_worker
+from backend.app.services.kite_client import aclose_async_client, close_session
 from backend.app.services.scheduler import start_scheduler, stop_scheduler
+from backend.app.services.snapshots import start_snapshot_writer, stop_snapshot_writer
 from backend.app.services.sessions import router as session_router
 from backend.app.services.holdings import router as holdings_router
-from backend.app.services.db import create_instruments_table
 from backend.app.routes.portfolio import router as portfolio_router
 
 app = FastAPI(
@@ -51,21 +53,34 @@ app.include_router(portfolio_router)
 
 @app.on_event("startup")
 def startup_event():
-    init_db()
-    init_holdings_snapshot_table()
-    create_instruments_table()
-    create_delivery_cache_table()
-    create_trades_table()
+    run_migrations()
     start_scheduler()
+    start_enrichment_worker()
+    start_snapshot_writer()
 
 @app.on_event("shutdown")
-def shutdown_event():
+async def shutdown_event():
     stop_scheduler()
+    stop_enrichment_worker()
+    stop_snapshot_writer()
+    close_session()
+    await aclose_async_client()
+    close_connections()
 
 @app.get("/api/health")
 def health_check():
     return {"status": "TuneFolio backend running"}
 
+@app.get("/api/cache/stats")
+def cache_stats():
+    from backend.app.services.cache import get_cache_stats
+    return get_cache_stats()
+
+@app.get("/api/snapshots/status")
+def snapshot_status():
+    from backend.app.services.snapshots import get_snapshot_status
+    return get_snapshot_status()
+
 # Serve frontend static files (MUST be LAST — acts as catch-all)
 _frontend_dir = Path(__file__).resolve().parents[2] / "frontend"
 if _frontend_dir.is_dir():
@@ -0,0 +1,97 @@
+"""
+Base schema: the tables previously created ad hoc at startup.
+
+Safe on existing databases — tables use IF NOT EXISTS and columns that
+older deployments added later (snapshot_type, delivery OHLC) are added
+only when missing.
+"""
+
+
+def _columns(conn, table: str) -> set:
+    return {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS zerodha_sessions (
+            id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL,
+            access_token TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            expires_at TEXT NOT NULL,
+            is_active INTEGER DEFAULT 1
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS holdings_snapshots (
+            id TEXT PRIMARY KEY,
+            snapshot_at TEXT NOT NULL,
+            snapshot_type TEXT NOT NULL,   -- 'SOD' or 'EOD'
+            tradingsymbol TEXT NOT NULL,
+            exchange TEXT,
+            quantity INTEGER,
+            average_price REAL,
+            last_price REAL,
+            pnl REAL
+        )
+    """)
+    if "snapshot_type" not in _columns(conn, "holdings_snapshots"):
+        conn.execute("ALTER TABLE holdings_snapshots ADD COLUMN snapshot_type TEXT")
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS instruments (
+            symbol TEXT NOT NULL,
+            exchange TEXT NOT NULL,
+            company_name TEXT,
+            sector TEXT,
+            industry TEXT,
+            isin TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (symbol, exchange)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS delivery_cache (
+            symbol TEXT NOT NULL,
+            trade_date TEXT NOT NULL,
+            total_traded_qty INTEGER DEFAULT 0,
+            delivered_qty INTEGER DEFAULT 0,
+            not_delivered_qty INTEGER DEFAULT 0,
+            delivery_pct REAL DEFAULT 0,
+            price_up INTEGER DEFAULT 1,
+            close_price REAL DEFAULT 0,
+            open_price REAL DEFAULT 0,
+            high_price REAL DEFAULT 0,
+            low_price REAL DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (symbol, trade_date)
+        )
+    """)
+    existing = _columns(conn, "delivery_cache")
+    for col in ["close_price", "open_price", "high_price", "low_price"]:
+        if col not in existing:
+            conn.execute(f"ALTER TABLE delivery_cache ADD COLUMN {col} REAL DEFAULT 0")
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS trades (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            symbol TEXT NOT NULL,
+            isin TEXT,
+            trade_date TEXT NOT NULL,
+            exchange TEXT NOT NULL,
+            segment TEXT,
+            series TEXT,
+            trade_type TEXT NOT NULL,
+            auction TEXT,
+            quantity REAL NOT NULL,
+            price REAL NOT NULL,
+            trade_id TEXT NOT NULL,
+            order_id TEXT,
+            order_execution_time TEXT,
+            source_file TEXT,
+            imported_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(trade_id, symbol, trade_date, exchange)
+        )
+    """)
@@ -0,0 +1,43 @@
+"""
+Secondary indexes for the hot read paths, plus a stored snapshot_date.
+
+  trades               — FIFO / historical scans ordered by (symbol, date, time),
+                         and the sell-date scan behind get_available_fys
+  holdings_snapshots   — per-day SOD/EOD duplicate check (sargable via
+                         snapshot_date), per-symbol meta, latest snapshot
+  zerodha_sessions     — scheduler's "most recent active token" lookup
+"""
+
+
+def upgrade(conn):
+    # snapshot_at is an IST ISO timestamp; its first 10 chars are the IST date.
+    # (DATE(snapshot_at) normalises the +05:30 offset to UTC and can't use an index.)
+    conn.execute("ALTER TABLE holdings_snapshots ADD COLUMN snapshot_date TEXT")
+    conn.execute("UPDATE holdings_snapshots SET snapshot_date = substr(snapshot_at, 1, 10)")
+
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_trades_symbol_chrono
+        ON trades (symbol, trade_date, order_execution_time, trade_type, quantity, price)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_trades_type_date
+        ON trades (trade_type, trade_date)
+    """)
+
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_snapshots_date_type
+        ON holdings_snapshots (snapshot_date, snapshot_type)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_snapshots_symbol_at
+        ON holdings_snapshots (tradingsymbol, snapshot_at)
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_snapshots_at
+        ON holdings_snapshots (snapshot_at)
+    """)
+
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sessions_active
+        ON zerodha_sessions (is_active, expires_at, created_at, access_token)
+    """)
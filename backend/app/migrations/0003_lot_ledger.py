@@ -0,0 +1,68 @@
+"""
+Materialized FIFO lot ledger (see services/lot_ledger.py).
+
+  ledger_lots     — open buy lots with their unconsumed quantity
+  ledger_sells    — one row per sell trade with its realised P&L
+  ledger_matches  — sell → buy allocations, one row per matched lot
+  ledger_state    — per-symbol replay position (last applied trade)
+"""
+
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ledger_lots (
+            buy_trade_id INTEGER PRIMARY KEY,   -- trades.id
+            symbol TEXT NOT NULL,
+            seq INTEGER NOT NULL,               -- FIFO position within symbol
+            trade_date TEXT NOT NULL,
+            qty_remaining REAL NOT NULL,
+            price REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ledger_lots_symbol ON ledger_lots (symbol, seq)")
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ledger_sells (
+            sell_trade_id INTEGER PRIMARY KEY,  -- trades.id
+            symbol TEXT NOT NULL,
+            sell_date TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            matched_qty REAL NOT NULL,
+            price REAL NOT NULL,
+            realised_pnl REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_ledger_sells_window
+        ON ledger_sells (sell_date, symbol, quantity, realised_pnl)
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ledger_sells_symbol ON ledger_sells (symbol)")
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ledger_matches (
+            sell_trade_id INTEGER NOT NULL,
+            buy_trade_id INTEGER NOT NULL,
+            symbol TEXT NOT NULL,
+            sell_date TEXT NOT NULL,
+            buy_date TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            buy_price REAL NOT NULL,
+            sell_price REAL NOT NULL,
+            realised_pnl REAL NOT NULL,
+            PRIMARY KEY (sell_trade_id, buy_trade_id)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ledger_matches_symbol ON ledger_matches (symbol)")
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ledger_state (
+            symbol TEXT PRIMARY KEY,
+            last_trade_date TEXT NOT NULL,
+            last_exec_time TEXT NOT NULL,
+            last_trade_type TEXT NOT NULL,
+            last_trade_id INTEGER NOT NULL,
+            max_trade_id INTEGER NOT NULL,      -- highest trades.id applied
+            next_seq INTEGER NOT NULL,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
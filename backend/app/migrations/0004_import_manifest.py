@@ -0,0 +1,21 @@
+"""
+Tradebook import manifest: one row per imported CSV, so unchanged files
+are skipped on re-import (matched by size+mtime, then by content hash).
+"""
+
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS import_manifest (
+            file_name TEXT PRIMARY KEY,
+            sha256 TEXT NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            row_count INTEGER NOT NULL,
+            inserted INTEGER NOT NULL,
+            errors INTEGER NOT NULL DEFAULT 0,
+            duration_ms REAL,
+            imported_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_import_manifest_sha ON import_manifest (sha256)")
@@ -0,0 +1,24 @@
+"""
+Sector enrichment state: retry/backoff bookkeeping for instruments whose
+sector could not be resolved locally, plus a negative cache for symbols
+Yahoo Finance has no sector data for.
+"""
+
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sector_enrichment (
+            symbol TEXT NOT NULL,
+            exchange TEXT NOT NULL,
+            status TEXT NOT NULL,              -- retry | unavailable
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            next_attempt_at REAL NOT NULL,     -- unix seconds
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (symbol, exchange)
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_sector_enrichment_due
+        ON sector_enrichment (next_attempt_at)
+    """)
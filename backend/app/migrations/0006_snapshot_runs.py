@@ -0,0 +1,30 @@
+"""
+Scheduled SOD/EOD holdings snapshots: per-account snapshot rows
+(holdings_snapshots.user_id) and one snapshot_runs row per job run with
+its duration and row counts.
+"""
+
+
+def upgrade(conn):
+    conn.execute("ALTER TABLE holdings_snapshots ADD COLUMN user_id TEXT")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS snapshot_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            snapshot_date TEXT NOT NULL,
+            snapshot_type TEXT NOT NULL,       -- SOD | EOD
+            trigger TEXT NOT NULL,             -- scheduled | catch_up | manual
+            status TEXT NOT NULL,              -- ok | partial | failed | skipped
+            accounts INTEGER NOT NULL DEFAULT 0,
+            accounts_failed INTEGER NOT NULL DEFAULT 0,
+            snapshots_written INTEGER NOT NULL DEFAULT 0,
+            rows_written INTEGER NOT NULL DEFAULT 0,
+            duration_ms REAL,
+            error TEXT,
+            started_at TEXT NOT NULL,
+            finished_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_snapshot_runs_slot
+        ON snapshot_runs (snapshot_date, snapshot_type, status)
+    """)
@@ -0,0 +1,39 @@
+"""
+Trade sync history: one trade_sync_runs row per sync (scheduled or
+manual) and one trade_sync_accounts row per account it covered, with the
+outcome, Kite latency and fetched/inserted counts.
+"""
+
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS trade_sync_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            trigger TEXT NOT NULL,             -- scheduled | manual | login
+            status TEXT NOT NULL,              -- ok | partial | failed | skipped
+            reason TEXT,
+            accounts INTEGER NOT NULL DEFAULT 0,
+            accounts_failed INTEGER NOT NULL DEFAULT 0,
+            fetched INTEGER NOT NULL DEFAULT 0,
+            inserted INTEGER NOT NULL DEFAULT 0,
+            duration_ms REAL,
+            started_at TEXT NOT NULL,
+            finished_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS trade_sync_accounts (
+            run_id INTEGER NOT NULL REFERENCES trade_sync_runs (id),
+            user_id TEXT,
+            session_id TEXT,
+            status TEXT NOT NULL,              -- ok | skipped | error
+            reason TEXT,
+            fetched INTEGER NOT NULL DEFAULT 0,
+            inserted INTEGER NOT NULL DEFAULT 0,
+            latency_ms REAL
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_trade_sync_accounts_run
+        ON trade_sync_accounts (run_id)
+    """)
@@ -0,0 +1,34 @@
+"""
+Persistent scheduler state: APScheduler jobs (pickled job state keyed by
+id, as in APScheduler's SQLAlchemy store) and a job_runs history row for
+every run or missed run of a scheduled job.
+"""
+
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS scheduler_jobs (
+            id TEXT PRIMARY KEY,
+            next_run_time REAL,                -- UTC unix seconds; NULL = paused
+            job_state BLOB NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_scheduler_jobs_next_run
+        ON scheduler_jobs (next_run_time)
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS job_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL,
+            outcome TEXT NOT NULL,             -- ok | failed | error | missed
+            error TEXT,
+            scheduled_at TEXT,                 -- missed runs: the run time that was skipped
+            started_at TEXT,
+            finished_at TEXT,
+            duration_ms REAL,
+            payload_bytes INTEGER              -- JSON size of the job's result
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_job_runs_job ON job_runs (job_id, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_job_runs_outcome ON job_runs (outcome, id)")
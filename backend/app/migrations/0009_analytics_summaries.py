@@ -0,0 +1,46 @@
+"""
+Post-sync analytics summaries (see services/analytics.py).
+
+  symbol_trade_stats   — per-symbol trade counts, quantities, values and
+                         dates; exited = fully sold positions
+  realised_pnl_by_fy   — realised P&L per FY and symbol, from ledger_sells
+  analytics_state      — the trades data version the summaries were built from
+"""
+
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS symbol_trade_stats (
+            symbol TEXT PRIMARY KEY,
+            exchange TEXT,
+            isin TEXT,
+            num_trades INTEGER NOT NULL,
+            buy_qty REAL NOT NULL,
+            sell_qty REAL NOT NULL,
+            buy_value REAL NOT NULL,
+            sell_value REAL NOT NULL,
+            first_buy_date TEXT,
+            last_sell_date TEXT,
+            exited INTEGER NOT NULL             -- 1: buy_qty > 0 and fully sold
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS realised_pnl_by_fy (
+            fy_label TEXT NOT NULL,             -- e.g. FY2024-25
+            symbol TEXT NOT NULL,
+            realised_pnl REAL NOT NULL,
+            qty_sold REAL NOT NULL,
+            sells INTEGER NOT NULL,
+            PRIMARY KEY (fy_label, symbol)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS analytics_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            data_version TEXT NOT NULL,         -- "<max trades.id>:<trade count>"
+            symbols INTEGER NOT NULL,
+            fy_rows INTEGER NOT NULL,
+            duration_ms REAL,
+            computed_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
@@ -0,0 +1,40 @@
+"""
+Delivery coverage index: the date intervals already requested from NSE
+per symbol, whether or not NSE returned rows for them (holidays,
+pre-listing, suspensions).  Intervals of a symbol never overlap or touch;
+services/db.py merges them on insert.
+
+Existing caches are seeded from their cached runs (days at most a week
+apart), so upgraded installs don't refetch what they already hold.
+"""
+
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS delivery_coverage (
+            symbol TEXT NOT NULL,
+            start_date TEXT NOT NULL,           -- ISO, inclusive
+            end_date TEXT NOT NULL,             -- ISO, inclusive
+            rows INTEGER NOT NULL DEFAULT 0,    -- cached rows NSE returned; 0 = empty range
+            fetched_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (symbol, start_date)
+        )
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO delivery_coverage (symbol, start_date, end_date, rows)
+        WITH days AS (
+            SELECT symbol, trade_date,
+                   CASE WHEN julianday(trade_date) - julianday(LAG(trade_date) OVER (
+                             PARTITION BY symbol ORDER BY trade_date)) <= 7
+                        THEN 0 ELSE 1 END AS starts_run
+            FROM delivery_cache
+        ),
+        runs AS (
+            SELECT symbol, trade_date,
+                   SUM(starts_run) OVER (PARTITION BY symbol ORDER BY trade_date) AS run
+            FROM days
+        )
+        SELECT symbol, MIN(trade_date), MAX(trade_date), COUNT(*)
+        FROM runs
+        GROUP BY symbol, run
+    """)
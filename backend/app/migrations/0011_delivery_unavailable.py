@@ -0,0 +1,18 @@
+"""
+Negative cache for NSE delivery data: symbols NSE returned nothing for
+(BSE-only, SME) or whose requests failed, with the reason and when to
+ask again (see services/delivery.py).
+"""
+
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS delivery_unavailable (
+            symbol TEXT PRIMARY KEY,
+            reason TEXT NOT NULL,              -- empty | blocked | rate_limited | error
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            retry_at REAL NOT NULL,            -- unix seconds
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
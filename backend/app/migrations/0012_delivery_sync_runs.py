@@ -0,0 +1,43 @@
+"""
+Delivery sync checkpoints (see services/delivery_sync.py): one
+delivery_sync_runs row per run with its symbol list and progress, and one
+delivery_sync_symbols row per symbol as it finishes.  A run left
+'running' by a crash or interrupt is resumed from the symbols still
+missing; finished chunks are already in delivery_coverage.
+"""
+
+
+def upgrade(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS delivery_sync_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            trigger TEXT NOT NULL,              -- api | script
+            status TEXT NOT NULL,               -- running | completed | interrupted | abandoned
+            period_days INTEGER NOT NULL,
+            symbols TEXT NOT NULL,              -- JSON list, sorted
+            total INTEGER NOT NULL,
+            done INTEGER NOT NULL DEFAULT 0,
+            requests INTEGER NOT NULL DEFAULT 0,
+            errors INTEGER NOT NULL DEFAULT 0,
+            records INTEGER NOT NULL DEFAULT 0,
+            rate REAL,                          -- limiter rate (req/s) at the last update
+            started_at TEXT NOT NULL,
+            finished_at TEXT,
+            duration_ms REAL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS delivery_sync_symbols (
+            run_id INTEGER NOT NULL REFERENCES delivery_sync_runs (id),
+            symbol TEXT NOT NULL,
+            status TEXT NOT NULL,               -- ok | up_to_date | unavailable | failed
+            reason TEXT,
+            requests INTEGER NOT NULL DEFAULT 0,
+            errors INTEGER NOT NULL DEFAULT 0,
+            records INTEGER NOT NULL DEFAULT 0,
+            fetched_days INTEGER NOT NULL DEFAULT 0,
+            skipped_days INTEGER NOT NULL DEFAULT 0,
+            finished_at TEXT,
+            PRIMARY KEY (run_id, symbol)
+        )
+    """)
@@ -0,0 +1,174 @@
+"""
+Per-account trades: trades.user_id (Zerodha client id).
+
+Multi-account trade sync writes every account's fills into one table, so
+FIFO matching and everything derived from it is partitioned by account.
+
+  trades               — rebuilt with user_id in the UNIQUE key.  Tradebook
+                         rows take the client id from their file name
+                         (tradebook-<CLIENT_ID>-EQ.csv); Kite-synced rows
+                         take the only session user if there has been
+                         exactly one, else '' (unknown)
+  ledger_*             — recreated keyed by (user_id, symbol); derived
+                         data, replayed from trades on the next refresh
+  symbol_trade_stats,
+  realised_pnl_by_fy   — recreated keyed by user_id; analytics_state is
+                         cleared so readers recompute until the next refresh
+"""
+
+
+def _rebuild_trades(conn):
+    conn.execute("""
+        CREATE TABLE trades_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL DEFAULT '',
+            symbol TEXT NOT NULL,
+            isin TEXT,
+            trade_date TEXT NOT NULL,
+            exchange TEXT NOT NULL,
+            segment TEXT,
+            series TEXT,
+            trade_type TEXT NOT NULL,
+            auction TEXT,
+            quantity REAL NOT NULL,
+            price REAL NOT NULL,
+            trade_id TEXT NOT NULL,
+            order_id TEXT,
+            order_execution_time TEXT,
+            source_file TEXT,
+            imported_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(user_id, trade_id, symbol, trade_date, exchange)
+        )
+    """)
+
+    sessions = conn.execute("SELECT DISTINCT user_id FROM zerodha_sessions").fetchall()
+    sync_user = sessions[0]["user_id"] if len(sessions) == 1 else ""
+
+    conn.execute("""
+        INSERT INTO trades_new (
+            id, user_id, symbol, isin, trade_date, exchange, segment, series, trade_type,
+            auction, quantity, price, trade_id, order_id, order_execution_time,
+            source_file, imported_at
+        )
+        SELECT id,
+               CASE
+                   WHEN source_file LIKE 'tradebook-%-%'
+                       THEN substr(source_file, 11, instr(substr(source_file, 11), '-') - 1)
+                   WHEN source_file = 'kite_api_sync' THEN ?
+                   ELSE ''
+               END,
+               symbol, isin, trade_date, exchange, segment, series, trade_type,
+               auction, quantity, price, trade_id, order_id, order_execution_time,
+               source_file, imported_at
+        FROM trades
+    """, (sync_user,))
+
+    conn.execute("DROP TABLE trades")
+    conn.execute("ALTER TABLE trades_new RENAME TO trades")
+
+    conn.execute("""
+        CREATE INDEX idx_trades_user_symbol_chrono
+        ON trades (user_id, symbol, trade_date, order_execution_time, trade_type, quantity, price)
+    """)
+    conn.execute("CREATE INDEX idx_trades_type_date ON trades (trade_type, trade_date)")
+
+
+def upgrade(conn):
+    _rebuild_trades(conn)
+
+    for table in ("ledger_lots", "ledger_sells", "ledger_matches", "ledger_state",
+                  "symbol_trade_stats", "realised_pnl_by_fy"):
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.execute("DELETE FROM analytics_state")
+
+    conn.execute("""
+        CREATE TABLE ledger_lots (
+            buy_trade_id INTEGER PRIMARY KEY,   -- trades.id
+            user_id TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            seq INTEGER NOT NULL,               -- FIFO position within (user_id, symbol)
+            trade_date TEXT NOT NULL,
+            qty_remaining REAL NOT NULL,
+            price REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX idx_ledger_lots_symbol ON ledger_lots (user_id, symbol, seq)")
+
+    conn.execute("""
+        CREATE TABLE ledger_sells (
+            sell_trade_id INTEGER PRIMARY KEY,  -- trades.id
+            user_id TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            sell_date TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            matched_qty REAL NOT NULL,
+            price REAL NOT NULL,
+            realised_pnl REAL NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE INDEX idx_ledger_sells_window
+        ON ledger_sells (sell_date, symbol, quantity, realised_pnl)
+    """)
+    conn.execute("CREATE INDEX idx_ledger_sells_symbol ON ledger_sells (user_id, symbol)")
+
+    conn.execute("""
+        CREATE TABLE ledger_matches (
+            sell_trade_id INTEGER NOT NULL,
+            buy_trade_id INTEGER NOT NULL,
+            user_id TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            sell_date TEXT NOT NULL,
+            buy_date TEXT NOT NULL,
+            quantity REAL NOT NULL,
+            buy_price REAL NOT NULL,
+            sell_price REAL NOT NULL,
+            realised_pnl REAL NOT NULL,
+            PRIMARY KEY (sell_trade_id, buy_trade_id)
+        )
+    """)
+    conn.execute("CREATE INDEX idx_ledger_matches_symbol ON ledger_matches (user_id, symbol)")
+
+    conn.execute("""
+        CREATE TABLE ledger_state (
+            user_id TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            last_trade_date TEXT NOT NULL,
+            last_exec_time TEXT NOT NULL,
+            last_trade_type TEXT NOT NULL,
+            last_trade_id INTEGER NOT NULL,
+            max_trade_id INTEGER NOT NULL,      -- highest trades.id applied
+            next_seq INTEGER NOT NULL,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, symbol)
+        )
+    """)
+
+    conn.execute("""
+        CREATE TABLE symbol_trade_stats (
+            user_id TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            exchange TEXT,
+            isin TEXT,
+            num_trades INTEGER NOT NULL,
+            buy_qty REAL NOT NULL,
+            sell_qty REAL NOT NULL,
+            buy_value REAL NOT NULL,
+            sell_value REAL NOT NULL,
+            first_buy_date TEXT,
+            last_sell_date TEXT,
+            exited INTEGER NOT NULL,            -- 1: buy_qty > 0 and fully sold
+            PRIMARY KEY (user_id, symbol)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE realised_pnl_by_fy (
+            fy_label TEXT NOT NULL,             -- e.g. FY2024-25
+            user_id TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            realised_pnl REAL NOT NULL,
+            qty_sold REAL NOT NULL,
+            sells INTEGER NOT NULL,
+            PRIMARY KEY (fy_label, user_id, symbol)
+        )
+    """)
@@ -0,0 +1,21 @@
+"""
+Trades write counter for the analytics summaries.
+
+  analytics_state.trades_version — bumped by db.insert_trades in the same
+                                   transaction as every insert that adds
+                                   rows; the summaries are current while
+                                   data_version (the counter they were built
+                                   from) equals it.  One PK lookup replaces
+                                   MAX(id)/COUNT(*) over trades per read.
+
+The single analytics_state row now always exists; it starts out stale.
+"""
+
+
+def upgrade(conn):
+    conn.execute("ALTER TABLE analytics_state ADD COLUMN trades_version INTEGER NOT NULL DEFAULT 0")
+    conn.execute("DELETE FROM analytics_state")
+    conn.execute("""
+        INSERT INTO analytics_state (id, data_version, symbols, fy_rows, trades_version)
+        VALUES (1, '', 0, 0, 1)
+    """)
@@ -0,0 +1,24 @@
+"""
+Delivery sync run ownership (see services/delivery_sync.py).
+
+  start_date   — first day of the synced window; with the symbol list it
+                 is the resume key (period_days for period=all grows daily)
+  owner_pid,
+  owner_host   — the process running the run
+  updated_at   — heartbeat, unix seconds; a 'running' row is only resumed
+                 or abandoned once its owner is gone or this is stale
+
+Existing rows get the start date their period implied when they started,
+and no owner, so unfinished ones count as stale.
+"""
+
+
+def upgrade(conn):
+    conn.execute("ALTER TABLE delivery_sync_runs ADD COLUMN start_date TEXT")
+    conn.execute("ALTER TABLE delivery_sync_runs ADD COLUMN owner_pid INTEGER")
+    conn.execute("ALTER TABLE delivery_sync_runs ADD COLUMN owner_host TEXT")
+    conn.execute("ALTER TABLE delivery_sync_runs ADD COLUMN updated_at REAL")
+    conn.execute("""
+        UPDATE delivery_sync_runs
+        SET start_date = date(started_at, '-' || period_days || ' days')
+    """)
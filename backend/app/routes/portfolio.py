@@ -1,275 +1,169 @@
+import asyncio
+import logging
+
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
 
-from backend.app.services.zerodha_holdings import fetch_zerodha_holdings, fetch_zerodha_margins
+from backend.app.services.zerodha_holdings import (
+    afetch_zerodha_holdings,
+    afetch_zerodha_margins,
+    fetch_zerodha_holdings,
+)
+from backend.app.services.dashboard import (
+    LIVE_PANELS,
+    build_dashboard,
+    exited_positions,
+    historical_panel,
+    holdings_panel,
+    load_portfolio_state,
+    margins_panel,
+    overview_panel,
+    parse_fields,
+    realised_pnl_panel,
+    resolve_state_sectors,
+    sector_allocation_panel,
+    trade_counts,
+)
 from backend.app.services.db import (
     get_latest_snapshot_meta,
-    upsert_instruments_from_holdings,
-    get_instrument,
     get_active_access_token,
+    get_active_zerodha_session,
+    run_db,
 )
-from backend.app.services.instruments import enrich_instrument_if_missing
 from backend.app.services.db import get_connection
-from backend.app.services.trade_sync import sync_trades_from_kite
+from backend.app.services.trade_sync import get_sync_history, sync_all_accounts, sync_trades_from_kite
+from backend.app.services.job_store import get_job_duration_stats, get_recent_job_failures
 from backend.app.services.scheduler import get_scheduler_status
 
 router = APIRouter(prefix="/portfolio", tags=["Portfolio"])
+logger = logging.getLogger("tunefolio.portfolio")
 
-@router.get("/overview")
-def portfolio_overview(request: Request):
-    """
-    Portfolio summary (Phase 1)
-    """
-    session_id = request.cookies.get("tf_session")
+# Live-data endpoints below are async: Kite calls go through the async
+# client and overlap with each other and with DB work, which runs on the
+# DB executor (run_db) so the event loop never blocks on SQLite.  The
+# per-symbol panels are plain JSON already and go out as JSONResponse,
+# skipping FastAPI's jsonable_encoder walk over every value.
+
+
+def _require_session(request: Request) -> dict:
+    """The caller's active Zerodha session, or 401."""
+    session = get_active_zerodha_session(request.cookies.get("tf_session"))
+    if session is None:
+        raise HTTPException(status_code=401, detail="No active Zerodha session")
+    return session
+
+
+async def _live_holdings(session_id: str):
+    """Kite holdings, or 403 if the session can't fetch them."""
     try:
-        holdings = fetch_zerodha_holdings(session_id)
+        return await afetch_zerodha_holdings(session_id)
     except Exception as e:
         raise HTTPException(status_code=403, detail=str(e))
 
-    total_stocks = len(holdings)
-    total_quantity = sum(h["quantity"] for h in holdings)
-    total_invested = sum(h["average_price"] * h["quantity"] for h in holdings)
-    current_value = sum(h["last_price"] * h["quantity"] for h in holdings)
-    total_pnl = current_value - total_invested
 
-    return {
-        "total_stocks": total_stocks,
-        "total_quantity": total_quantity,
-        "total_invested_value": round(total_invested, 2),
-        "current_value": round(current_value, 2),
-        "total_pnl": round(total_pnl, 2),
-    }
+@router.get("/dashboard")
+async def portfolio_dashboard(request: Request, fields: str = None, fy: str = None):
+    """
+    Every dashboard panel in one round trip, derived from one shared state.
+
+    ?fields=holdings,margins,... selects panels (default: all of
+    session, overview, holdings, sector_allocation, margins, realised_pnl,
+    historical).  ?fy=FY2024-25 filters historical and adds a specific FY to
+    realised_pnl.  Requires an active session; trade-derived panels cover
+    its account only.  Secondary panels that fail are null with the reason
+    in "errors"; live holdings panels fail the request with 403.
+    """
+    try:
+        panels = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    session = await run_db(_require_session, request)
+    state = await load_portfolio_state(session, panels, fy)
+    if "holdings" in state["errors"] and LIVE_PANELS.intersection(panels):
+        raise HTTPException(status_code=403, detail=state["errors"]["holdings"])
+
+    return build_dashboard(state, panels)
+
+
+@router.get("/overview")
+async def portfolio_overview(request: Request):
+    """
+    Portfolio summary (Phase 1)
+    """
+    holdings = await _live_holdings(request.cookies.get("tf_session"))
+    return overview_panel(holdings)
 
 @router.get("/margins")
-def portfolio_margins(request: Request):
+async def portfolio_margins(request: Request):
     """Available cash and collateral from Zerodha equity margins."""
     session_id = request.cookies.get("tf_session")
     try:
-        margins = fetch_zerodha_margins(session_id)
+        margins = await afetch_zerodha_margins(session_id)
     except Exception as e:
         raise HTTPException(status_code=403, detail=str(e))
 
-    available = margins.get("available", {})
-    return {
-        "net": round(margins.get("net", 0), 2),
-        "cash": round(available.get("cash", 0), 2),
-        "collateral": round(available.get("collateral", 0), 2),
-        "opening_balance": round(available.get("opening_balance", 0), 2),
-        "live_balance": round(available.get("live_balance", 0), 2),
-        "intraday_payin": round(available.get("intraday_payin", 0), 2),
-    }
+    return margins_panel(margins)
 
 
 @router.get("/holdings")
-def portfolio_holdings(request: Request):
-    session_id = request.cookies.get("tf_session")
-    try:
-        holdings = fetch_zerodha_holdings(session_id)
-    except Exception as e:
-        raise HTTPException(status_code=403, detail=str(e))
+async def portfolio_holdings(request: Request):
+    session = await run_db(_require_session, request)
 
-    # Ensure instruments exist & enriched
-    upsert_instruments_from_holdings(holdings)
-
-    # Get trade counts per symbol from trades table
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT symbol, COUNT(*) as cnt FROM trades GROUP BY symbol")
-    trade_counts = {row["symbol"]: row["cnt"] for row in cursor.fetchall()}
-    conn.close()
-
-    data = []
-    total_invested = 0
-    total_current = 0
-
-    for h in holdings:
-        invested_value = round(h["average_price"] * h["quantity"], 2)
-        current_value = round(h["last_price"] * h["quantity"], 2)
-        pnl = round(current_value - invested_value, 2)
-
-        total_invested += invested_value
-        total_current += current_value
-
-        # Look up sector from instruments table
-        instrument = get_instrument(h["tradingsymbol"], h["exchange"])
-        sector = instrument["sector"] if instrument and instrument["sector"] else None
-
-        # Trigger enrichment if sector is still missing
-        if not sector:
-            enrich_instrument_if_missing(h["tradingsymbol"], h["exchange"])
-            instrument = get_instrument(h["tradingsymbol"], h["exchange"])
-            sector = instrument["sector"] if instrument and instrument["sector"] else None
-
-        data.append({
-            "symbol": h["tradingsymbol"],
-            "exchange": h["exchange"],
-            "quantity": h["quantity"],
-            "avg_buy_price": h["average_price"],
-            "current_price": h["last_price"],
-            "invested_value": invested_value,
-            "current_value": current_value,
-            "pnl": pnl,
-            "sector": sector,
-            "num_trades": trade_counts.get(h["tradingsymbol"], 0),
-        })
+    # Kite holdings and the account's per-symbol trade counts in parallel
+    holdings, counts = await asyncio.gather(
+        _live_holdings(session["session_id"]),
+        run_db(trade_counts, session["user_id"]),
+    )
+
+    # Ensure instruments exist; sectors for all holdings in one batch.
+    # Missing ones are enriched in the background and show as pending
+    # (sector=None) until then
+    sectors = await run_db(resolve_state_sectors, holdings, [])
+
+    return JSONResponse(holdings_panel(holdings, sectors, counts))
+
+
+async def _holdings_or_empty(session_id: str) -> list:
+    try:
+        return await afetch_zerodha_holdings(session_id)
+    except Exception:
+        return []  # If session expired, still show historical data
 
-    return {
-        "count": len(data),
-        "data": data,
-        "meta": {
-            "total_invested": round(total_invested, 2),
-            "total_current": round(total_current, 2),
-            "total_pnl": round(total_current - total_invested, 2)
-        }
-    }
 
 @router.get("/historical-holdings")
-def historical_holdings(request: Request, fy: str = None):
+async def historical_holdings(request: Request, fy: str = None):
     """
-    Stocks fully exited (total buy qty == total sell qty from trades table),
-    excluding any stock currently held in Zerodha.
+    Stocks the caller's account fully exited (total buy qty == total sell
+    qty from trades table), excluding any stock currently held in Zerodha.
     Optional FY filter: ?fy=FY2024-25 filters by last_sell_date within that FY.
     """
-    from backend.app.services.trades import compute_historical_holdings, get_fy_bounds, get_available_fys
-
-    # Get current holdings symbols to exclude
-    session_id = request.cookies.get("tf_session")
-    current_symbols = []
-    try:
-        holdings = fetch_zerodha_holdings(session_id)
-        current_symbols = [h["tradingsymbol"] for h in holdings]
-    except Exception:
-        pass  # If session expired, still show historical data
+    from backend.app.services.trades import get_fy_bounds
 
     # Parse FY filter
     fy_start, fy_end = None, None
     if fy and fy.startswith("FY"):
         fy_start, fy_end = get_fy_bounds(fy)
 
-    data = compute_historical_holdings(current_symbols, fy_start=fy_start, fy_end=fy_end)
-
-    # Step 1: Insert historical symbols into instruments table (INSERT OR IGNORE)
-    # so they exist for sector enrichment to work
-    conn = get_connection()
-    cursor = conn.cursor()
-    for item in data:
-        cursor.execute("""
-            INSERT OR IGNORE INTO instruments (symbol, exchange, isin)
-            VALUES (?, ?, ?)
-        """, (item["symbol"], item["exchange"], item.get("isin")))
-    conn.commit()
-    conn.close()
-
-    # Step 2: Enrich with sector info from instruments table + sector_map
-    from backend.app.services.sector_map import get_sector_info
-    from backend.app.services.instruments import enrich_instrument_if_missing
-    missing_sectors = []
-    for item in data:
-        instrument = get_instrument(item["symbol"], item["exchange"])
-        sector = instrument["sector"] if instrument and instrument["sector"] else None
-        if not sector:
-            info = get_sector_info(item["symbol"])
-            if info.get("sector") and info["sector"] != "Unknown":
-                sector = info["sector"]
-                # Also persist to instruments table
-                from backend.app.services.db import update_instrument_sector
-                update_instrument_sector(item["symbol"], item["exchange"],
-                                         info["sector"], info.get("industry", "Unknown"))
-            else:
-                missing_sectors.append((item["symbol"], item["exchange"]))
-        item["sector"] = sector
-
-    # Step 3: Background-enrich missing sectors via Yahoo Finance
-    # (results available on next page load)
-    if missing_sectors:
-        import threading
-        def _bg_enrich(pairs):
-            import logging
-            log = logging.getLogger("sector_enrich")
-            for sym, exch in pairs:
-                try:
-                    enrich_instrument_if_missing(sym, exch)
-                    log.info(f"Enriched sector for {sym}")
-                except Exception:
-                    pass
-        threading.Thread(target=_bg_enrich, args=(missing_sectors,), daemon=True).start()
-
-    total_pnl = sum(d["total_pnl"] for d in data)
+    # Current holdings (to exclude) and the trades aggregation in parallel;
+    # the exclusion is per symbol, so it can be applied afterwards
+    session = await run_db(_require_session, request)
+    holdings, (exited, available_fys) = await asyncio.gather(
+        _holdings_or_empty(session["session_id"]),
+        run_db(exited_positions, fy_start, fy_end, session["user_id"]),
+    )
 
-    return {
-        "count": len(data),
-        "data": data,
-        "meta": {
-            "total_invested": round(sum(d["total_invested"] for d in data), 2),
-            "total_proceeds": round(sum(d["total_proceeds"] for d in data), 2),
-            "total_pnl": round(total_pnl, 2),
-        },
-        "available_fys": get_available_fys(),
-    }
+    # Insert historical symbols into instruments table (INSERT OR IGNORE)
+    # so they exist for sector enrichment to work; anything missing is
+    # enriched in the background (available on next page load)
+    sectors = await run_db(resolve_state_sectors, [], exited)
 
+    current_symbols = {h["tradingsymbol"] for h in holdings}
+    return JSONResponse(historical_panel(exited, available_fys, sectors, current_symbols))
 
-@router.get("/sector-allocation")
-def sector_allocation(request: Request):
-    """
-    Aggregated sector allocation — uses live holdings enriched with sector data.
-    Falls back to snapshot data only if live fetch fails.
-    """
-    session_id = request.cookies.get("tf_session")
-
-    # --- Primary path: compute from live holdings (always fresh) ---
-    try:
-        holdings = fetch_zerodha_holdings(session_id)
-        upsert_instruments_from_holdings(holdings)
-
-        sector_map = {}
-        for h in holdings:
-            instrument = get_instrument(h["tradingsymbol"], h["exchange"])
-            sector = instrument["sector"] if instrument and instrument["sector"] else None
-
-            if not sector:
-                enrich_instrument_if_missing(h["tradingsymbol"], h["exchange"])
-                instrument = get_instrument(h["tradingsymbol"], h["exchange"])
-                sector = instrument["sector"] if instrument and instrument["sector"] else "Unknown"
-
-            if sector not in sector_map:
-                sector_map[sector] = {"current": 0, "invested": 0, "pnl": 0}
-
-            invested = h["average_price"] * h["quantity"]
-            current = h["last_price"] * h["quantity"]
-            sector_map[sector]["invested"] += invested
-            sector_map[sector]["current"] += current
-            sector_map[sector]["pnl"] += current - invested
-
-        total_current = sum(v["current"] for v in sector_map.values()) or 1
-        total_invested = sum(v["invested"] for v in sector_map.values()) or 1
-
-        by_current_value = []
-        by_invested_value = []
-
-        for sector, v in sector_map.items():
-            by_current_value.append({
-                "sector": sector,
-                "value": round(v["current"], 2),
-                "percentage": round((v["current"] / total_current) * 100, 2),
-                "profit": round(v["pnl"], 2)
-            })
-            by_invested_value.append({
-                "sector": sector,
-                "value": round(v["invested"], 2),
-                "percentage": round((v["invested"] / total_invested) * 100, 2)
-            })
-
-        return {
-            "by_current_value": by_current_value,
-            "by_invested_value": by_invested_value
-        }
-
-    except Exception:
-        pass  # Fall through to snapshot-based approach
-
-    # --- Fallback: snapshot-based (if live fails) ---
-    conn = get_connection()
-    cursor = conn.cursor()
 
+def _snapshot_sector_allocation() -> dict:
+    """Allocation from the latest holdings snapshot (DB executor)."""
     query = """
     SELECT
         i.sector AS sector,
@@ -286,9 +180,7 @@ def sector_allocation(request: Request):
     GROUP BY i.sector
     """
 
-    cursor.execute(query)
-    rows = cursor.fetchall()
-    conn.close()
+    rows = get_connection().execute(query).fetchall()
 
     total_current = sum(row["current_value"] for row in rows) or 1
     total_invested = sum(row["invested_value"] for row in rows) or 1
@@ -315,11 +207,33 @@ def sector_allocation(request: Request):
         "by_invested_value": by_invested_value
     }
 
+
+@router.get("/sector-allocation")
+async def sector_allocation(request: Request):
+    """
+    Aggregated sector allocation — uses live holdings enriched with sector data.
+    Falls back to snapshot data only if live fetch fails.
+    """
+    session_id = request.cookies.get("tf_session")
+
+    # --- Primary path: compute from live holdings (always fresh) ---
+    try:
+        holdings = await afetch_zerodha_holdings(session_id)
+        sectors = await run_db(resolve_state_sectors, holdings, [])
+        return sector_allocation_panel(holdings, sectors)
+    except Exception:
+        pass  # Fall through to snapshot-based approach
+
+    # --- Fallback: snapshot-based (if live fails) ---
+    return await run_db(_snapshot_sector_allocation)
+
 @router.get("/delivery-data")
 def delivery_data(symbol: str, period: str = "1y"):
     """
     Fetch delivery volume data for a single NSE stock.
-    Serves from DB cache (populated by sync). Falls back to live NSE if cache empty.
+    Serves from DB cache (populated by sync), filling missing ranges from
+    live NSE.  Symbols NSE has no data for are answered from the negative
+    cache without a request.
     """
     from backend.app.services.delivery import fetch_delivery_data
 
@@ -331,15 +245,21 @@ def delivery_data(symbol: str, period: str = "1y"):
         period_days = period_map.get(period, 365)
 
     try:
-        data = fetch_delivery_data(symbol, period_days)
-    except Exception:
-        data = []
+        result = fetch_delivery_data(symbol, period_days)
+    except Exception as e:
+        logger.error(f"Delivery data for {symbol} failed: {e}", exc_info=True)
+        result = {"status": "no_data", "reason": "error", "retry_at": None, "data": []}
 
     return {
         "symbol": symbol,
         "period": period,
-        "count": len(data),
-        "data": data
+        # no_data: nothing to show (reason, retry_at say why / until when);
+        # reason "error" means the lookup itself failed
+        "status": result["status"],
+        "reason": result["reason"],
+        "retry_at": result["retry_at"],
+        "count": len(result["data"]),
+        "data": result["data"]
     }
 
 
@@ -348,8 +268,12 @@ def sync_delivery_data(request: Request, period: str = "all"):
     """
     Sync delivery data for ALL holdings from NSE into DB cache.
     Call this from local machine daily (NSE blocks cloud IPs).
+    Only date ranges missing from the coverage index are requested, in
+    parallel under an adaptive rate limit; each symbol reports its
+    fetched/skipped day counts.  Symbols in the negative cache are skipped
+    until their TTL expires.  An interrupted sync resumes where it stopped.
     """
-    from backend.app.services.delivery import fetch_and_cache_delivery
+    from backend.app.services.delivery_sync import DeliverySyncBusy, run_delivery_sync
 
     session_id = request.cookies.get("tf_session")
 
@@ -369,108 +293,172 @@ def sync_delivery_data(request: Request, period: str = "all"):
 
     all_symbols = list(set(h["tradingsymbol"] for h in holdings))
 
-    results = {}
-    for sym in all_symbols:
-        try:
-            data = fetch_and_cache_delivery(sym, period_days)
-            results[sym] = len(data)
-        except Exception as e:
-            results[sym] = f"error: {str(e)}"
+    try:
+        run = run_delivery_sync(all_symbols, period_days, trigger="api")
+    except DeliverySyncBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
-    return {
-        "synced": len(all_symbols),
-        "period": period,
-        "results": results
-    }
+    return {"synced": len(all_symbols), "period": period, **run}
+
+
+@router.get("/delivery-data/sync/status")
+def delivery_sync_status(limit: int = 10):
+    """Recent delivery sync runs with progress, request counts and limiter rate."""
+    from backend.app.services.delivery_sync import get_delivery_sync_status
+    return get_delivery_sync_status(limit)
 
 
 # ─── Trades Import & Realised P&L ────────────────────────────────────
 
 @router.post("/trades/import")
-def import_trades():
-    """Import all tradebook CSVs into trades table. Idempotent."""
+def import_trades(force: bool = False):
+    """
+    Import tradebook CSVs into trades table. Idempotent; files unchanged
+    since their last import are skipped unless ?force=true.  The analytics
+    summaries are rebuilt if anything changed.
+    """
+    from backend.app.services.analytics import refresh_analytics
     from backend.app.services.trades import import_tradebooks
-    summary = import_tradebooks()
-    total = sum(summary.values())
-    return {"status": "ok", "total_imported": total, "by_file": summary}
+    summary = import_tradebooks(force=force)
+    total = sum(f["inserted"] for f in summary.values())
+    skipped = sum(1 for f in summary.values() if f["status"] == "unchanged")
+    return {
+        "status": "ok",
+        "total_imported": total,
+        "files_skipped": skipped,
+        "by_file": summary,
+        "analytics": refresh_analytics(force=force),
+    }
 
 
 @router.get("/realised-pnl")
-def realised_pnl(fy: str = None):
+def realised_pnl(request: Request, fy: str = None):
     """
-    Realised P&L computed via FIFO.
+    Realised P&L of the caller's account, computed via FIFO.
 
     Returns YTD (current FY to today), previous FY, and optionally a
     specific FY if ?fy=FY2022-23 is provided.
     """
+    return realised_pnl_panel(fy, _require_session(request)["user_id"])
+
+
+@router.get("/realised-pnl/by-fy")
+def realised_pnl_by_fy(request: Request, include_symbols: bool = False):
+    """
+    Realised P&L of the caller's account for every FY that has sells, plus
+    YTD, in one call.  Pass ?include_symbols=true for the per-symbol
+    breakdown of each FY.  Served from the analytics summaries unless they
+    are stale.
+    """
+    from backend.app.services import analytics
     from backend.app.services.trades import (
-        compute_realised_pnl,
+        compute_realised_pnl_windows,
+        fy_label_for_year,
         get_fy_bounds,
         get_available_fys,
     )
     from datetime import datetime as _dt
 
-    today = _dt.now().strftime("%Y-%m-%d")
-
-    # Current FY bounds
-    current_fy_start, current_fy_end = get_fy_bounds()
-    current_fy_label = f"FY{current_fy_start[:4]}-{str(int(current_fy_start[:4]) + 1)[-2:]}"
-
-    # YTD = current FY start → today
-    ytd_result = compute_realised_pnl(current_fy_start, today)
+    user_id = _require_session(request)["user_id"]
+    current_fy_start, _ = get_fy_bounds()
+    current_fy_label = fy_label_for_year(int(current_fy_start[:4]))
 
-    # Previous FY
-    prev_start_year = int(current_fy_start[:4]) - 1
-    prev_fy_start = f"{prev_start_year}-04-01"
-    prev_fy_end = f"{prev_start_year + 1}-03-31"
-    prev_fy_label = f"FY{prev_start_year}-{str(prev_start_year + 1)[-2:]}"
-    prev_fy_result = compute_realised_pnl(prev_fy_start, prev_fy_end)
-
-    # Specific FY (optional query param)
-    specific_fy = None
-    if fy and fy.startswith("FY"):
-        fy_s, fy_e = get_fy_bounds(fy)
-        specific_result = compute_realised_pnl(fy_s, fy_e)
-        specific_fy = {
-            "label": fy,
-            "realised_pnl": specific_result["total_realised_pnl"],
-            "total_sells": specific_result["total_sells"],
-            "symbols_sold": specific_result["total_symbols_sold"],
-            "by_symbol": specific_result["by_symbol"],
+    fys = analytics.get_available_fys(user_id)
+    results = analytics.get_realised_pnl_by_fy(fys + [current_fy_label], user_id) if fys is not None else None
+    if results is not None:
+        # Sells can't be dated after today, so YTD is the current FY's total
+        results["ytd"] = results[current_fy_label]
+    else:
+        fys = get_available_fys(user_id)
+        results = compute_realised_pnl_windows({
+            **{label: get_fy_bounds(label) for label in fys},
+            "ytd": (current_fy_start, _dt.now().strftime("%Y-%m-%d")),
+        }, user_id=user_id)
+
+    rows = []
+    for label in fys:
+        r = results[label]
+        start, end = get_fy_bounds(label)
+        row = {
+            "label": label,
+            "start_date": start,
+            "end_date": end,
+            "realised_pnl": r["total_realised_pnl"],
+            "total_sells": r["total_sells"],
+            "symbols_sold": r["total_symbols_sold"],
         }
-
-    available = get_available_fys()
+        if include_symbols:
+            row["by_symbol"] = r["by_symbol"]
+        rows.append(row)
 
     return {
-        "ytd": {
-            "label": f"YTD ({current_fy_label})",
-            "realised_pnl": ytd_result["total_realised_pnl"],
-            "total_sells": ytd_result["total_sells"],
-            "symbols_sold": ytd_result["total_symbols_sold"],
-        },
-        "previous_fy": {
-            "label": prev_fy_label,
-            "realised_pnl": prev_fy_result["total_realised_pnl"],
-            "total_sells": prev_fy_result["total_sells"],
-            "symbols_sold": prev_fy_result["total_symbols_sold"],
+        "count": len(rows),
+        "data": rows,
+        "meta": {
+            "total_realised_pnl": round(sum(r["realised_pnl"] for r in rows), 2),
+            "ytd_realised_pnl": results["ytd"]["total_realised_pnl"],
         },
-        "available_fys": available,
-        "specific_fy": specific_fy,
     }
 
 
+# ─── Sector Enrichment ────────────────────────────────────────────────
+
+@router.get("/sector-enrichment/status")
+def sector_enrichment_status():
+    """Background sector worker: queue depth, retrying and unavailable counts."""
+    from backend.app.services.enrichment import get_enrichment_status
+    return get_enrichment_status()
+
+
 # ─── Trade Sync (Kite API → trades table) ─────────────────────────────
 
 @router.get("/trade-sync/status")
-def trade_sync_status():
-    """Return scheduler status and next run times."""
-    return get_scheduler_status()
+def trade_sync_status(limit: int = 10, failures: int = 10):
+    """
+    Scheduler status and next run times, recent sync runs with per-account
+    outcomes, p50/p95 durations per scheduled job and the last `failures`
+    failed or missed job runs.
+    """
+    return {
+        **get_scheduler_status(),
+        "recent_runs": get_sync_history(limit),
+        "job_durations": get_job_duration_stats(),
+        "recent_failures": get_recent_job_failures(failures),
+    }
 
 
 @router.post("/trade-sync/trigger")
-def trade_sync_trigger(request: Request):
-    """Manually trigger a trade sync using the current session's token."""
-    session_id = request.cookies.get("tf_session")
-    token = get_active_access_token(session_id) if session_id else None
-    result = sync_trades_from_kite(access_token=token)
-    return result
+def trade_sync_trigger(request: Request, all_accounts: bool = False):
+    """
+    Manually trigger a trade sync of the caller's account, or of every
+    active account with ?all_accounts=true.  Both require an active
+    session; fills are stored under the account they were fetched for.
+    """
+    session = _require_session(request)
+    if all_accounts:
+        return sync_all_accounts(trigger="manual")
+
+    return sync_trades_from_kite(
+        access_token=get_active_access_token(session["session_id"]),
+        user_id=session["user_id"],
+        session_id=session["session_id"],
+    )
+
+
+# ─── Holdings Snapshots ───────────────────────────────────────────────
+
+@router.post("/snapshots/trigger")
+def snapshot_trigger(request: Request, type: str = "EOD"):
+    """
+    Capture a SOD/EOD holdings snapshot of the caller's account now.
+    Requires an active session; other accounts are left to the scheduler.
+    Returns once the snapshot is queued; the run shows up in
+    /portfolio/snapshots/status when the writer has committed it.
+    """
+    from backend.app.services.snapshots import capture_holdings_snapshots
+
+    session = _require_session(request)
+    try:
+        return capture_holdings_snapshots(type.upper(), trigger="manual", user_id=session["user_id"])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,177 @@
+"""
+Post-sync analytics: summary tables materialized from the trades table.
+
+refresh_analytics() runs after trades are inserted (trade sync, tradebook
+import) and rebuilds, in one transaction:
+
+    symbol_trade_stats   per-account, per-symbol counts, quantities, values
+                         and dates; serves trade counts and exited positions
+    realised_pnl_by_fy   realised P&L per FY, account and symbol, from the
+                         lot ledger
+
+Both are tagged with the trades data version they were built from
+(analytics_state.data_version).  Every trades insert bumps
+analytics_state.trades_version in the inserting transaction
+(db.insert_trades);
+the get_* readers return None when the two differ, and callers fall back
+to live computation.
+"""
+
+import logging
+import time
+
+from backend.app.services.db import get_connection, transaction
+from backend.app.services.lot_ledger import refresh_ledger
+from backend.app.services.trades import POSITION_STATS_SQL, aggregate_realised, historical_row
+
+logger = logging.getLogger("tunefolio.analytics")
+
+
+def data_version(conn=None) -> str:
+    """The trades write counter (analytics_state.trades_version), as text."""
+    conn = conn or get_connection()
+    return str(conn.execute("SELECT trades_version FROM analytics_state WHERE id = 1").fetchone()[0])
+
+
+def is_current(conn=None) -> bool:
+    """One PK lookup: were the summaries built from the latest trades write?"""
+    conn = conn or get_connection()
+    row = conn.execute(
+        "SELECT data_version, trades_version FROM analytics_state WHERE id = 1"
+    ).fetchone()
+    return row["data_version"] == str(row["trades_version"])
+
+
+# ─── Refresh ─────────────────────────────────────────────────────────
+
+def refresh_analytics(force: bool = False) -> dict:
+    """
+    Rebuild the summary tables if the trades table changed since the last
+    build (or always, with force=True).
+
+    Returns: {"status": "current" | "refreshed", "data_version", "symbols",
+              "fy_rows", "duration_ms"}
+    """
+    started = time.perf_counter()
+    if not force and is_current():
+        return {"status": "current", "data_version": data_version()}
+
+    # Realised P&L comes from the ledger, so bring it up to date first
+    refresh_ledger()
+
+    with transaction() as conn:
+        version = data_version(conn)
+
+        conn.execute("DELETE FROM symbol_trade_stats")
+        conn.execute(f"""
+            INSERT INTO symbol_trade_stats (
+                user_id, symbol, exchange, isin, num_trades, buy_qty, sell_qty,
+                buy_value, sell_value, first_buy_date, last_sell_date, exited
+            )
+            SELECT user_id, symbol, exchange, isin, num_trades, buy_qty, sell_qty,
+                   buy_value, sell_value, first_buy_date, last_sell_date, exited
+            FROM ({POSITION_STATS_SQL})
+        """, {"exclude": "[]"})
+        symbols = conn.execute("SELECT changes()").fetchone()[0]
+
+        # Indian FY: April–March; FY label of the sell date's FY start year
+        conn.execute("DELETE FROM realised_pnl_by_fy")
+        conn.execute("""
+            INSERT INTO realised_pnl_by_fy (fy_label, user_id, symbol, realised_pnl, qty_sold, sells)
+            SELECT 'FY' || fy || '-' || substr(CAST(fy + 1 AS TEXT), 3, 2),
+                   user_id, symbol, SUM(realised_pnl), SUM(quantity), COUNT(*)
+            FROM (
+                SELECT CAST(substr(sell_date, 1, 4) AS INTEGER)
+                         - (CAST(substr(sell_date, 6, 2) AS INTEGER) < 4) AS fy,
+                       user_id, symbol, realised_pnl, quantity
+                FROM ledger_sells
+            )
+            GROUP BY fy, user_id, symbol
+        """)
+        fy_rows = conn.execute("SELECT changes()").fetchone()[0]
+
+        duration_ms = round((time.perf_counter() - started) * 1000, 1)
+        conn.execute("""
+            UPDATE analytics_state
+            SET data_version = ?, symbols = ?, fy_rows = ?, duration_ms = ?, computed_at = CURRENT_TIMESTAMP
+            WHERE id = 1
+        """, (version, symbols, fy_rows, duration_ms))
+
+    logger.info(f"Analytics refreshed for data version {version}: {symbols} symbols, {fy_rows} FY rows in {duration_ms}ms")
+    return {
+        "status": "refreshed",
+        "data_version": version,
+        "symbols": symbols,
+        "fy_rows": fy_rows,
+        "duration_ms": duration_ms,
+    }
+
+
+# ─── Readers (None = stale, compute live) ────────────────────────────
+
+# Each reader takes the caller's user_id and reads only that account's
+# rows; user_id=None sums over every account (scripts, tests).
+
+def get_trade_counts(user_id: str = None) -> dict | None:
+    conn = get_connection()
+    if not is_current(conn):
+        return None
+    account = "WHERE user_id = ?" if user_id is not None else ""
+    rows = conn.execute(f"""
+        SELECT symbol, SUM(num_trades) AS num_trades FROM symbol_trade_stats
+        {account}
+        GROUP BY symbol
+    """, (user_id,) if user_id is not None else ()).fetchall()
+    return {r["symbol"]: r["num_trades"] for r in rows}
+
+
+def get_exited_positions(fy_start: str = None, fy_end: str = None, user_id: str = None) -> list | None:
+    """Same rows as trades.compute_historical_holdings([]), from symbol_trade_stats."""
+    conn = get_connection()
+    if not is_current(conn):
+        return None
+    account = "AND user_id = :user_id" if user_id is not None else ""
+    rows = conn.execute(f"""
+        SELECT * FROM symbol_trade_stats
+        WHERE exited = 1 {account}
+          AND (:fy_start IS NULL OR last_sell_date IS NULL OR last_sell_date >= :fy_start)
+          AND (:fy_end IS NULL OR last_sell_date IS NULL OR last_sell_date <= :fy_end)
+        ORDER BY symbol, user_id
+    """, {"fy_start": fy_start, "fy_end": fy_end, "user_id": user_id}).fetchall()
+    return [historical_row(r) for r in rows]
+
+
+def get_realised_pnl_by_fy(fy_labels: list, user_id: str = None) -> dict | None:
+    """
+    trades.compute_realised_pnl_windows results for whole FYs, keyed by
+    FY label ("FY2024-25"), from realised_pnl_by_fy.
+    """
+    conn = get_connection()
+    if not is_current(conn):
+        return None
+    labels = list(dict.fromkeys(fy_labels))
+    if not labels:
+        return {}
+    account = "AND user_id = ?" if user_id is not None else ""
+    rows = conn.execute(f"""
+        SELECT fy_label AS label, symbol,
+               SUM(realised_pnl) AS realised_pnl, SUM(qty_sold) AS qty_sold, SUM(sells) AS sells
+        FROM realised_pnl_by_fy
+        WHERE fy_label IN ({", ".join("?" * len(labels))}) {account}
+        GROUP BY fy_label, symbol
+        ORDER BY fy_label, symbol
+    """, labels + ([user_id] if user_id is not None else [])).fetchall()
+    return aggregate_realised(rows, labels)
+
+
+def get_available_fys(user_id: str = None) -> list | None:
+    """FY labels that have sells (same as trades.get_available_fys)."""
+    conn = get_connection()
+    if not is_current(conn):
+        return None
+    account = "WHERE user_id = ?" if user_id is not None else ""
+    rows = conn.execute(
+        f"SELECT DISTINCT fy_label FROM realised_pnl_by_fy {account} ORDER BY fy_label",
+        (user_id,) if user_id is not None else (),
+    ).fetchall()
+    return [r["fy_label"] for r in rows]
@@ -0,0 +1,291 @@
+"""
+In-process cache for upstream (Kite) reads.
+
+SingleFlightCache coalesces concurrent misses for the same key onto one
+loader call (single-flight) and serves expired entries while one
+background refresh runs (stale-while-revalidate):
+
+    age < ttl                 fresh: returned as is
+    ttl <= age < ttl + stale  stale: returned at once, refreshed in background
+    older / missing           callers block on a single in-flight load
+
+Each cache is bounded by max_entries and max_bytes (JSON-encoded size of
+the stored values); least-recently-used entries are evicted first, and
+entries past ttl + stale are purged on every write.  Every cache registers
+itself so get_cache_stats() can report hit/miss/eviction counters.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger("tunefolio.cache")
+
+_registry = {}  # name → SingleFlightCache
+
+
+def _sizeof(value) -> int:
+    """Approximate payload size in bytes (API responses are JSON-shaped)."""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class _Flight:
+    """One in-progress loader call that other callers can wait on."""
+    __slots__ = ("done", "value", "error", "abandoned", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.abandoned = False  # leader cancelled; waiters retry the lookup
+        self.waiters = []       # (loop, future) pairs of async waiters
+
+
+def _resolve(future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class SingleFlightCache:
+    def __init__(self, name: str, ttl: float, stale_ttl: float = 0,
+                 max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # key → (value, stored_at, size); LRU first
+        self._flights = {}              # key → _Flight
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._tasks = set()             # background async refreshes (strong refs)
+        self._stats = {
+            "hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0,
+            "load_errors": 0, "evictions": 0, "expirations": 0, "invalidations": 0,
+        }
+        _registry[name] = self
+
+    def _lookup(self, key, start_refresh):
+        """
+        Classify a lookup under the lock.  Returns (kind, payload):
+        ("hit", value), ("lead", flight) or ("wait", flight).  On a stale
+        hit with no refresh running, registers a flight and calls
+        start_refresh(flight) to run it in the background.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            age = now - entry[1] if entry else None
+
+            if entry and age < self.ttl:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return "hit", entry[0]
+
+            flight = self._flights.get(key)
+            if entry and age < self.ttl + self.stale_ttl:
+                self._entries.move_to_end(key)
+                self._stats["stale_hits"] += 1
+                if flight is None:
+                    flight = self._flights[key] = _Flight()
+                    start_refresh(flight)
+                return "hit", entry[0]
+
+            if flight is None:
+                self._stats["misses"] += 1
+                flight = self._flights[key] = _Flight()
+                return "lead", flight
+
+            # Registered flights are always unfinished (_finish unregisters first)
+            self._stats["coalesced"] += 1
+            return "wait", flight
+
+    def get(self, key, loader):
+        """Cached value for `key`, calling `loader()` at most once per key at a time."""
+        def start_refresh(flight):
+            threading.Thread(
+                target=self._refresh, args=(key, loader, flight),
+                name=f"{self.name}-refresh", daemon=True,
+            ).start()
+
+        while True:
+            kind, payload = self._lookup(key, start_refresh)
+            if kind == "hit":
+                return payload
+
+            flight = payload
+            if kind == "lead":
+                self._finish(key, flight, *self._call(loader))
+            else:
+                flight.done.wait()
+            if not flight.abandoned:
+                break
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    async def aget(self, key, loader):
+        """
+        Async get(): `loader` is a coroutine function.  Waiters (sync or
+        async) share the same in-flight load; the event loop never blocks.
+        If the leading task is cancelled, the first waiter to wake takes
+        over the load with its own loader.
+        """
+        loop = asyncio.get_running_loop()
+
+        def start_refresh(flight):
+            task = loop.create_task(self._arefresh(key, loader, flight))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        while True:
+            kind, payload = self._lookup(key, start_refresh)
+            if kind == "hit":
+                return payload
+
+            flight = payload
+            if kind == "lead":
+                await self._aload(key, loader, flight)
+            else:
+                waiter = loop.create_future()
+                with self._lock:
+                    if not flight.done.is_set():
+                        flight.waiters.append((loop, waiter))
+                    else:
+                        waiter.set_result(None)
+                await waiter
+            if not flight.abandoned:
+                break
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    @staticmethod
+    def _call(loader) -> tuple:
+        try:
+            return loader(), None
+        except Exception as e:
+            return None, e
+
+    def _finish(self, key, flight: _Flight, value, error) -> None:
+        """Publish a load result to the cache and to every waiter."""
+        flight.value, flight.error = value, error
+        # Size the payload outside the lock
+        size = _sizeof(value) if error is None else 0
+        with self._lock:
+            # An invalidation while loading drops the result (it may be
+            # for a session that has since logged out)
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+                if error is None:
+                    self._store(key, value, size)
+            if error is not None:
+                self._stats["load_errors"] += 1
+            self._release(flight)
+
+    def _abandon(self, key, flight: _Flight) -> None:
+        """Unregister a cancelled load; its waiters look the key up again."""
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.abandoned = True
+            self._release(flight)
+
+    @staticmethod
+    def _release(flight: _Flight) -> None:
+        """Wake every waiter (call with _lock held)."""
+        flight.done.set()
+        waiters, flight.waiters = flight.waiters, []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(_resolve, waiter)
+
+    def _refresh(self, key, loader, flight: _Flight) -> None:
+        self._finish(key, flight, *self._call(loader))
+        if flight.error is not None:
+            # Keep serving the stale entry until it ages out
+            logger.warning(f"{self.name}: background refresh failed for {key!r}: {flight.error}")
+
+    async def _aload(self, key, loader, flight: _Flight) -> None:
+        """
+        Await `loader()` and publish the result.  A cancelled load is
+        abandoned before the cancellation propagates: its waiters wake and
+        retry, and the first of them leads a fresh load.
+        """
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            self._abandon(key, flight)
+            raise
+        except Exception as e:
+            self._finish(key, flight, None, e)
+        else:
+            self._finish(key, flight, value, None)
+
+    async def _arefresh(self, key, loader, flight: _Flight) -> None:
+        await self._aload(key, loader, flight)
+        if flight.error is not None:
+            logger.warning(f"{self.name}: background refresh failed for {key!r}: {flight.error}")
+
+    # ─── Eviction (call with _lock held) ─────────────────────────────
+
+    def _drop(self, key) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _store(self, key, value, size: int) -> None:
+        if key in self._entries:
+            self._drop(key)
+        if size > self.max_bytes:
+            return  # Would evict everything else; serve it uncached
+        self._entries[key] = (value, time.time(), size)
+        self._bytes += size
+
+        cutoff = time.time() - (self.ttl + self.stale_ttl)
+        for k in [k for k, (_, stored_at, _) in self._entries.items() if stored_at < cutoff]:
+            self._drop(k)
+            self._stats["expirations"] += 1
+
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            self._drop(next(iter(self._entries)))
+            self._stats["evictions"] += 1
+
+    # ─── Invalidation & Stats ────────────────────────────────────────
+
+    def invalidate(self, key=None) -> None:
+        """Drop one key, or every entry when key is None.  In-flight loads are discarded."""
+        with self._lock:
+            if key is None:
+                self._stats["invalidations"] += len(self._entries)
+                self._entries.clear()
+                self._flights.clear()
+                self._bytes = 0
+            else:
+                if key in self._entries:
+                    self._drop(key)
+                    self._stats["invalidations"] += 1
+                self._flights.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["stale_hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round((self._stats["hits"] + self._stats["stale_hits"]) / lookups, 4) if lookups else None,
+            }
+
+
+def get_cache_stats() -> dict:
+    """Counters for every cache created in this process."""
+    return {name: cache.stats() for name, cache in _registry.items()}
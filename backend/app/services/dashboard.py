@@ -0,0 +1,363 @@
+"""
+Portfolio dashboard: every panel of the main page from one shared state.
+
+load_portfolio_state() fetches only what the requested panels need — Kite
+holdings and margins run concurrently with the DB reads (trade counts,
+realised P&L windows, exited positions of the caller's account) — then
+resolves sectors for live and exited symbols in one batch.  Panels are pure functions of
+that state.  The single-panel routes in routes/portfolio.py use the same
+builders, so both paths return identical figures.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+
+from backend.app.services import analytics
+from backend.app.services.db import (
+    get_connection,
+    run_db,
+    upsert_instruments,
+)
+from backend.app.services.instruments import resolve_sectors
+from backend.app.services.zerodha_holdings import afetch_zerodha_holdings, afetch_zerodha_margins
+
+logger = logging.getLogger("tunefolio.dashboard")
+
+PANELS = ("session", "overview", "holdings", "sector_allocation", "margins", "realised_pnl", "historical")
+
+# Panels that need live Kite holdings; without them the request fails
+LIVE_PANELS = {"overview", "holdings", "sector_allocation"}
+
+
+def parse_fields(fields: str = None) -> list:
+    """'holdings,margins' → ["holdings", "margins"]; None or "" → every panel."""
+    if not fields:
+        return list(PANELS)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in PANELS]
+    if unknown:
+        raise ValueError(f"Unknown dashboard fields: {', '.join(unknown)} (valid: {', '.join(PANELS)})")
+    return [p for p in PANELS if p in requested]
+
+
+# ─── DB Reads (run on the DB executor) ───────────────────────────────
+
+# Each reader serves the post-sync summaries (analytics.py) and computes
+# from the trades table only when they are stale.  Routes pass the
+# session's user_id, so a caller only sees their own account.
+
+def trade_counts(user_id: str = None) -> dict:
+    counts = analytics.get_trade_counts(user_id)
+    if counts is not None:
+        return counts
+    account = "WHERE user_id = ?" if user_id is not None else ""
+    rows = get_connection().execute(
+        f"SELECT symbol, COUNT(*) as cnt FROM trades {account} GROUP BY symbol",
+        (user_id,) if user_id is not None else (),
+    ).fetchall()
+    return {row["symbol"]: row["cnt"] for row in rows}
+
+
+def exited_positions(fy_start: str = None, fy_end: str = None, user_id: str = None) -> tuple:
+    """Fully exited positions (current holdings not yet excluded) plus the FY list."""
+    from backend.app.services.trades import compute_historical_holdings, get_available_fys
+
+    exited = analytics.get_exited_positions(fy_start, fy_end, user_id)
+    fys = analytics.get_available_fys(user_id) if exited is not None else None
+    if exited is None or fys is None:
+        return (compute_historical_holdings([], fy_start=fy_start, fy_end=fy_end, user_id=user_id),
+                get_available_fys(user_id))
+    return exited, fys
+
+
+def resolve_state_sectors(holdings: list, exited: list) -> dict:
+    """
+    Ensure instruments exist for live and exited symbols and resolve all
+    their sectors in one batch.  Missing ones are enriched in the
+    background and come back as None (pending) until then.
+    """
+    upsert_instruments(
+        [{"symbol": h["tradingsymbol"], "exchange": h["exchange"], "isin": h.get("isin")} for h in holdings]
+        + list(exited)
+    )
+    pairs = [(h["tradingsymbol"], h["exchange"]) for h in holdings]
+    pairs += [(d["symbol"], d["exchange"]) for d in exited]
+    return resolve_sectors(pairs)
+
+
+# ─── Panels ──────────────────────────────────────────────────────────
+
+def overview_panel(holdings: list) -> dict:
+    total_invested = sum(h["average_price"] * h["quantity"] for h in holdings)
+    current_value = sum(h["last_price"] * h["quantity"] for h in holdings)
+
+    return {
+        "total_stocks": len(holdings),
+        "total_quantity": sum(h["quantity"] for h in holdings),
+        "total_invested_value": round(total_invested, 2),
+        "current_value": round(current_value, 2),
+        "total_pnl": round(current_value - total_invested, 2),
+    }
+
+
+def margins_panel(margins: dict) -> dict:
+    available = margins.get("available", {})
+    return {
+        "net": round(margins.get("net", 0), 2),
+        "cash": round(available.get("cash", 0), 2),
+        "collateral": round(available.get("collateral", 0), 2),
+        "opening_balance": round(available.get("opening_balance", 0), 2),
+        "live_balance": round(available.get("live_balance", 0), 2),
+        "intraday_payin": round(available.get("intraday_payin", 0), 2),
+    }
+
+
+def holdings_panel(holdings: list, sectors: dict, counts: dict) -> dict:
+    data = []
+    total_invested = 0
+    total_current = 0
+
+    for h in holdings:
+        invested_value = round(h["average_price"] * h["quantity"], 2)
+        current_value = round(h["last_price"] * h["quantity"], 2)
+
+        total_invested += invested_value
+        total_current += current_value
+
+        data.append({
+            "symbol": h["tradingsymbol"],
+            "exchange": h["exchange"],
+            "quantity": h["quantity"],
+            "avg_buy_price": h["average_price"],
+            "current_price": h["last_price"],
+            "invested_value": invested_value,
+            "current_value": current_value,
+            "pnl": round(current_value - invested_value, 2),
+            "sector": sectors.get((h["tradingsymbol"], h["exchange"])),
+            "num_trades": counts.get(h["tradingsymbol"], 0),
+        })
+
+    return {
+        "count": len(data),
+        "data": data,
+        "meta": {
+            "total_invested": round(total_invested, 2),
+            "total_current": round(total_current, 2),
+            "total_pnl": round(total_current - total_invested, 2),
+            "sectors_pending": sum(1 for d in data if not d["sector"]),
+        }
+    }
+
+
+def sector_allocation_panel(holdings: list, sectors: dict) -> dict:
+    sector_map = {}
+    for h in holdings:
+        sector = sectors.get((h["tradingsymbol"], h["exchange"])) or "Unknown"
+
+        if sector not in sector_map:
+            sector_map[sector] = {"current": 0, "invested": 0, "pnl": 0}
+
+        invested = h["average_price"] * h["quantity"]
+        current = h["last_price"] * h["quantity"]
+        sector_map[sector]["invested"] += invested
+        sector_map[sector]["current"] += current
+        sector_map[sector]["pnl"] += current - invested
+
+    total_current = sum(v["current"] for v in sector_map.values()) or 1
+    total_invested = sum(v["invested"] for v in sector_map.values()) or 1
+
+    by_current_value = []
+    by_invested_value = []
+
+    for sector, v in sector_map.items():
+        by_current_value.append({
+            "sector": sector,
+            "value": round(v["current"], 2),
+            "percentage": round((v["current"] / total_current) * 100, 2),
+            "profit": round(v["pnl"], 2)
+        })
+        by_invested_value.append({
+            "sector": sector,
+            "value": round(v["invested"], 2),
+            "percentage": round((v["invested"] / total_invested) * 100, 2)
+        })
+
+    return {
+        "by_current_value": by_current_value,
+        "by_invested_value": by_invested_value
+    }
+
+
+def historical_panel(exited: list, available_fys: list, sectors: dict, current_symbols: set) -> dict:
+    data = [dict(d) for d in exited if d["symbol"] not in current_symbols]
+    for item in data:
+        item["sector"] = sectors.get((item["symbol"], item["exchange"]))
+
+    return {
+        "count": len(data),
+        "data": data,
+        "meta": {
+            "total_invested": round(sum(d["total_invested"] for d in data), 2),
+            "total_proceeds": round(sum(d["total_proceeds"] for d in data), 2),
+            "total_pnl": round(sum(d["total_pnl"] for d in data), 2),
+            "sectors_pending": sum(1 for d in data if not d["sector"]),
+        },
+        "available_fys": available_fys,
+    }
+
+
+def realised_pnl_panel(fy: str = None, user_id: str = None) -> dict:
+    """
+    YTD (current FY to today) and previous-FY realised P&L, plus `fy`
+    (e.g. "FY2022-23") with its per-symbol breakdown if given, for
+    `user_id`'s account.  All windows come from the FY summary table, or
+    one ledger pass when it is stale (DB executor).
+    """
+    from backend.app.services.trades import (
+        compute_realised_pnl_windows,
+        fy_label_for_year,
+        get_fy_bounds,
+        get_available_fys,
+    )
+
+    today = datetime.now().strftime("%Y-%m-%d")
+
+    current_fy_start, _ = get_fy_bounds()
+    current_fy_label = fy_label_for_year(int(current_fy_start[:4]))
+    prev_fy_label = fy_label_for_year(int(current_fy_start[:4]) - 1)
+
+    windows = {
+        "ytd": (current_fy_start, today),
+        "previous_fy": get_fy_bounds(prev_fy_label),
+    }
+    if fy and fy.startswith("FY"):
+        windows["specific_fy"] = get_fy_bounds(fy)
+
+    # Sells can't be dated after today, so YTD is the current FY's total
+    labels = {"ytd": current_fy_label, "previous_fy": prev_fy_label}
+    if "specific_fy" in windows:
+        labels["specific_fy"] = fy_label_for_year(int(windows["specific_fy"][0][:4]))
+    by_fy = analytics.get_realised_pnl_by_fy(list(labels.values()), user_id)
+    available_fys = analytics.get_available_fys(user_id) if by_fy is not None else None
+    if by_fy is None or available_fys is None:
+        results = compute_realised_pnl_windows(windows, user_id=user_id)
+        available_fys = get_available_fys(user_id)
+    else:
+        results = {key: by_fy[label] for key, label in labels.items()}
+
+    ytd_result = results["ytd"]
+    prev_fy_result = results["previous_fy"]
+
+    specific_fy = None
+    if "specific_fy" in results:
+        specific_result = results["specific_fy"]
+        specific_fy = {
+            "label": fy,
+            "realised_pnl": specific_result["total_realised_pnl"],
+            "total_sells": specific_result["total_sells"],
+            "symbols_sold": specific_result["total_symbols_sold"],
+            "by_symbol": specific_result["by_symbol"],
+        }
+
+    return {
+        "ytd": {
+            "label": f"YTD ({current_fy_label})",
+            "realised_pnl": ytd_result["total_realised_pnl"],
+            "total_sells": ytd_result["total_sells"],
+            "symbols_sold": ytd_result["total_symbols_sold"],
+        },
+        "previous_fy": {
+            "label": prev_fy_label,
+            "realised_pnl": prev_fy_result["total_realised_pnl"],
+            "total_sells": prev_fy_result["total_sells"],
+            "symbols_sold": prev_fy_result["total_symbols_sold"],
+        },
+        "available_fys": available_fys,
+        "specific_fy": specific_fy,
+    }
+
+
+# ─── Shared State ────────────────────────────────────────────────────
+
+async def _skip():
+    return None
+
+
+async def _attempt(name: str, coro, errors: dict):
+    """Await `coro`; on failure record the error under `name` and return None."""
+    try:
+        return await coro
+    except Exception as e:
+        errors[name] = str(e)
+        return None
+
+
+async def load_portfolio_state(session: dict, panels: list, fy: str = None) -> dict:
+    """
+    Load everything `panels` need for the caller's `session` (see
+    db.get_active_zerodha_session), independent sources concurrently.
+    Trade-derived panels cover only the session's account.
+
+    Returns {"holdings", "margins", "sectors", "trade_counts", "exited",
+    "available_fys", "realised_pnl", "session", "errors"}; sources a panel
+    doesn't need stay None, failed ones are None with the reason in errors.
+    """
+    from backend.app.services.trades import get_fy_bounds
+
+    session_id, user_id = session["session_id"], session["user_id"]
+    wanted = set(panels)
+    need_holdings = bool(wanted & (LIVE_PANELS | {"historical"}))
+    need_margins = "margins" in wanted
+    fy_start, fy_end = get_fy_bounds(fy) if fy and fy.startswith("FY") else (None, None)
+    errors = {}
+
+    holdings, margins, counts, exited, realised = await asyncio.gather(
+        _attempt("holdings", afetch_zerodha_holdings(session_id), errors) if need_holdings else _skip(),
+        _attempt("margins", afetch_zerodha_margins(session_id), errors) if need_margins else _skip(),
+        run_db(trade_counts, user_id) if "holdings" in wanted else _skip(),
+        run_db(exited_positions, fy_start, fy_end, user_id) if "historical" in wanted else _skip(),
+        _attempt("realised_pnl", run_db(realised_pnl_panel, fy, user_id), errors) if "realised_pnl" in wanted else _skip(),
+    )
+
+    exited, available_fys = exited if exited is not None else (None, None)
+
+    sectors = None
+    if wanted & {"holdings", "sector_allocation", "historical"}:
+        sectors = await run_db(resolve_state_sectors, holdings or [], exited or [])
+
+    return {
+        "holdings": holdings,
+        "margins": margins,
+        "sectors": sectors,
+        "trade_counts": counts,
+        "exited": exited,
+        "available_fys": available_fys,
+        "realised_pnl": realised,
+        "session": session if "session" in wanted else None,
+        "errors": errors,
+    }
+
+
+def build_dashboard(state: dict, panels: list) -> dict:
+    """Derive each requested panel from `state`; unavailable panels are None."""
+    holdings = state["holdings"]
+    margins = state["margins"]
+    builders = {
+        "session": lambda: state["session"],
+        "overview": lambda: overview_panel(holdings),
+        "holdings": lambda: holdings_panel(holdings, state["sectors"], state["trade_counts"]),
+        "sector_allocation": lambda: sector_allocation_panel(holdings, state["sectors"]),
+        "margins": lambda: margins_panel(margins) if margins is not None else None,
+        "realised_pnl": lambda: state["realised_pnl"],
+        # If holdings failed, still show historical data
+        "historical": lambda: historical_panel(
+            state["exited"], state["available_fys"], state["sectors"],
+            {h["tradingsymbol"] for h in holdings or []},
+        ),
+    }
+
+    result = {panel: builders[panel]() for panel in panels}
+    result["fields"] = panels
+    result["errors"] = state["errors"]
+    return result
@@ -1,5 +1,14 @@
+import os
+import json
+import asyncio
 import sqlite3
 import shutil
+import threading
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice
 from pathlib import Path
 
 DB_PATH = Path(__file__).resolve().parents[2] / "data" / "tunefolio.db"
@@ -10,78 +19,271 @@ DB_PATH.parent.mkdir(parents=True, exist_ok=True)  # Ensure data/ dir exists (fo
 if not DB_PATH.exists() and SEED_DB_PATH.exists():
     shutil.copy2(SEED_DB_PATH, DB_PATH)
 
-def get_connection():
-    conn = sqlite3.connect(DB_PATH)
+# ─── Connection Management ─────────────────────────────────────────
+#
+# One long-lived connection per thread (FastAPI threadpool workers, the
+# APScheduler thread, background workers).  Connections run in autocommit
+# mode; writes go through transaction(), which issues BEGIN IMMEDIATE so
+# writers queue on busy_timeout instead of failing with "database is locked".
+
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KIB = 16 * 1024          # 16 MiB page cache per connection
+MMAP_SIZE_BYTES = 128 * 1024 * 1024  # 128 MiB memory-mapped reads
+
+_local = threading.local()
+_open_connections = {}   # thread -> connection, so dead threads' handles get closed
+_open_connections_lock = threading.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        isolation_level=None,       # autocommit; transaction() manages BEGIN/COMMIT
+        cached_statements=256,
+        check_same_thread=False,    # still one thread per conn; lets shutdown close all
+    )
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")   # safe with WAL, fsync only at checkpoint
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE_BYTES}")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    with _open_connections_lock:
+        for thread in [t for t in _open_connections if not t.is_alive()]:
+            _close_quietly(_open_connections.pop(thread))
+        _open_connections[threading.current_thread()] = conn
+    return conn
+
+
+def _close_quietly(conn: sqlite3.Connection):
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Return this thread's long-lived connection, opening it on first use.
+    Callers must NOT close it — use close_connections() at shutdown.
+    """
+    conn = getattr(_local, "conn", None)
+    # A forked worker process inherits the parent's thread-local; never reuse it
+    if conn is None or _local.pid != os.getpid():
+        conn = _connect()
+        _local.conn = conn
+        _local.pid = os.getpid()
+        _local.tx_depth = 0
     return conn
 
-def init_db():
+
+@contextmanager
+def transaction():
+    """
+    Run a block of writes atomically on this thread's connection.
+
+        with transaction() as conn:
+            conn.execute("INSERT ...")
+
+    Nested blocks join the outermost transaction.  Commits on success,
+    rolls back on any exception.
+    """
     conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS zerodha_sessions (
-            id TEXT PRIMARY KEY,
-            user_id TEXT NOT NULL,
-            access_token TEXT NOT NULL,
-            created_at TEXT NOT NULL,
-            expires_at TEXT NOT NULL,
-            is_active INTEGER DEFAULT 1
-        )
-    """)
+    if _local.tx_depth > 0:
+        _local.tx_depth += 1
+        try:
+            yield conn
+        finally:
+            _local.tx_depth -= 1
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    _local.tx_depth = 1
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+    finally:
+        _local.tx_depth = 0
+
+
+# ─── Schema Migrations ─────────────────────────────────────────────
+#
+# Ordered modules in backend/app/migrations named NNNN_description.py, each
+# exposing upgrade(conn).  Pending ones run in a single transaction at
+# startup and are recorded in schema_version.
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[1] / "migrations"
+MIGRATIONS_PACKAGE = "backend.app.migrations"
+
+
+def _discover_migrations() -> list:
+    """Return [(version, module_name), ...] sorted by version."""
+    migrations = []
+    for path in MIGRATIONS_DIR.glob("[0-9][0-9][0-9][0-9]_*.py"):
+        migrations.append((int(path.name[:4]), path.stem))
+    return sorted(migrations)
+
+
+def run_migrations() -> list:
+    """
+    Bring the schema up to date.  All pending migrations share one
+    transaction, so a failure leaves the database at its previous version.
+
+    Returns: list of applied migration names.
+    """
+    applied = []
+    with transaction() as conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Read inside the write transaction so concurrent workers can't double-apply
+        current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+
+        for version, name in _discover_migrations():
+            if version <= current:
+                continue
+            module = importlib.import_module(f"{MIGRATIONS_PACKAGE}.{name}")
+            module.upgrade(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                (version, name),
+            )
+            applied.append(name)
+
+    return applied
+
+
+# ─── Bulk Ingest ───────────────────────────────────────────────────
+
+BULK_BATCH_SIZE = 5000
+
+
+def bulk_insert(table: str, columns: list, rows, conflict: str = "IGNORE",
+                batch_size: int = BULK_BATCH_SIZE) -> dict:
+    """
+    Insert an iterable of row tuples with executemany, in one transaction.
+
+    `rows` may be a generator — it is consumed in batches of `batch_size`,
+    each bound to the same prepared INSERT OR <conflict> statement.
+    With conflict="IGNORE", `ignored` counts rows skipped as duplicates;
+    with "REPLACE", every row counts as inserted.
+
+    Returns: {"inserted": int, "ignored": int}
+    """
+    if conflict not in ("IGNORE", "REPLACE"):
+        raise ValueError(f"Unsupported conflict policy: {conflict}")
+
+    sql = (
+        f"INSERT OR {conflict} INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})"
+    )
 
-    conn.commit()
-    conn.close()
+    total = 0
+    inserted = 0
+    rows = iter(rows)
+    with transaction() as conn:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            cursor = conn.executemany(sql, batch)
+            inserted += cursor.rowcount  # executemany sums per-row changes
+            total += len(batch)
+
+    return {"inserted": inserted, "ignored": total - inserted}
+
+
+# ─── Async Access ──────────────────────────────────────────────────
+#
+# Async route handlers never touch SQLite on the event loop: run_db()
+# hands the call to a small dedicated pool, whose threads each keep their
+# own pooled connection like any other thread.
+
+DB_EXECUTOR_WORKERS = 4
+
+_db_executor: ThreadPoolExecutor | None = None
+_db_executor_lock = threading.Lock()
+
+
+def _get_db_executor() -> ThreadPoolExecutor:
+    global _db_executor
+    if _db_executor is None:
+        with _db_executor_lock:
+            if _db_executor is None:
+                _db_executor = ThreadPoolExecutor(
+                    max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="tunefolio-db"
+                )
+    return _db_executor
+
+
+async def run_db(fn, *args, **kwargs):
+    """Await fn(*args, **kwargs) on the DB executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_db_executor(), partial(fn, *args, **kwargs))
+
+
+def close_connections():
+    """Stop the DB executor and close every pooled connection (app shutdown)."""
+    global _db_executor
+    with _db_executor_lock:
+        if _db_executor is not None:
+            _db_executor.shutdown(wait=True)
+            _db_executor = None
+
+    with _open_connections_lock:
+        conns = list(_open_connections.values())
+        _open_connections.clear()
+    for conn in conns:
+        _close_quietly(conn)
+    _local.__dict__.clear()
 
 import uuid
 from datetime import datetime, timedelta
 
 def save_zerodha_session(user_id: str, access_token: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-
     session_id = str(uuid.uuid4())
     created_at = datetime.utcnow()
     expires_at = created_at + timedelta(hours=12)  # Zerodha token validity (approx)
 
-    cursor.execute("""
-        INSERT INTO zerodha_sessions (
-            id, user_id, access_token, created_at, expires_at, is_active
-        )
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (
-        session_id,
-        user_id,
-        access_token,
-        created_at.isoformat(),
-        expires_at.isoformat(),
-        1
-    ))
-
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("""
+            INSERT INTO zerodha_sessions (
+                id, user_id, access_token, created_at, expires_at, is_active
+            )
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (
+            session_id,
+            user_id,
+            access_token,
+            created_at.isoformat(),
+            expires_at.isoformat(),
+            1
+        ))
 
     return session_id
 
 def get_active_zerodha_session(session_id: str = None):
     """Look up an active session by its cookie session_id."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    if session_id:
-        cursor.execute("""
-            SELECT id, user_id, created_at, expires_at
-            FROM zerodha_sessions
-            WHERE id = ? AND is_active = 1
-            LIMIT 1
-        """, (session_id,))
-    else:
+    if not session_id:
         # Fallback: no cookie provided — return nothing (forces login)
-        conn.close()
         return None
 
-    row = cursor.fetchone()
-    conn.close()
+    row = get_connection().execute("""
+        SELECT id, user_id, created_at, expires_at
+        FROM zerodha_sessions
+        WHERE id = ? AND is_active = 1
+        LIMIT 1
+    """, (session_id,)).fetchone()
 
     if not row:
         return None
@@ -95,185 +297,122 @@ def get_active_zerodha_session(session_id: str = None):
 
 def get_active_access_token(session_id: str = None):
     """Get the Zerodha access_token for a specific session cookie."""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    if session_id:
-        cursor.execute("""
-            SELECT access_token
-            FROM zerodha_sessions
-            WHERE id = ? AND is_active = 1
-            LIMIT 1
-        """, (session_id,))
-    else:
-        conn.close()
+    if not session_id:
         return None
 
-    row = cursor.fetchone()
-    conn.close()
+    row = get_connection().execute("""
+        SELECT access_token
+        FROM zerodha_sessions
+        WHERE id = ? AND is_active = 1
+        LIMIT 1
+    """, (session_id,)).fetchone()
 
     if not row:
         return None
 
     return row["access_token"]
 
-def get_any_active_access_token() -> str | None:
-    """Return the most recent active, non-expired token (for scheduler use)."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT access_token FROM zerodha_sessions
+def get_active_accounts() -> list:
+    """Latest active, non-expired session per Zerodha user: [{session_id, user_id, access_token}]."""
+    rows = get_connection().execute("""
+        SELECT id, user_id, access_token FROM zerodha_sessions
         WHERE is_active = 1 AND expires_at > datetime('now')
-        ORDER BY created_at DESC LIMIT 1
-    """)
-    row = cursor.fetchone()
-    conn.close()
-    return row["access_token"] if row else None
+        ORDER BY created_at DESC
+    """).fetchall()
+
+    accounts = {}
+    for r in rows:
+        accounts.setdefault(r["user_id"], {
+            "session_id": r["id"], "user_id": r["user_id"], "access_token": r["access_token"],
+        })
+    return list(accounts.values())
 
 def deactivate_session(session_id: str):
     """Deactivate a single session by its ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE zerodha_sessions
-        SET is_active = 0
-        WHERE id = ?
-    """, (session_id,))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("""
+            UPDATE zerodha_sessions
+            SET is_active = 0
+            WHERE id = ?
+        """, (session_id,))
 
 def deactivate_all_sessions():
     """Set is_active = 0 for all active sessions (admin/cleanup)."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE zerodha_sessions
-        SET is_active = 0
-        WHERE is_active = 1
-    """)
-    conn.commit()
-    conn.close()
-
-def init_holdings_snapshot_table():
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS holdings_snapshots (
-            id TEXT PRIMARY KEY,
-            snapshot_at TEXT NOT NULL,
-            snapshot_type TEXT NOT NULL,   -- 'SOD' or 'EOD'
-            tradingsymbol TEXT NOT NULL,
-            exchange TEXT,
-            quantity INTEGER,
-            average_price REAL,
-            last_price REAL,
-            pnl REAL
-        )
-    """)
-
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("""
+            UPDATE zerodha_sessions
+            SET is_active = 0
+            WHERE is_active = 1
+        """)
 
 import uuid
-from datetime import datetime, time
+from datetime import datetime
 import pytz
 
 IST = pytz.timezone("Asia/Kolkata")
 
-def save_holdings_snapshot(holdings: list):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    now_ist = datetime.now(IST)
-    today = now_ist.date().isoformat()
-
-    snapshot_type = None
-
-    # 🕣 Start of Day snapshot window
-    if time(8, 30) <= now_ist.time() <= time(9, 15):
-        snapshot_type = "SOD"
-
-    # 🕟 End of Day snapshot window
-    elif now_ist.time() >= time(16, 30):
-        snapshot_type = "EOD"
-
-    # ❌ Outside snapshot windows → do nothing
-    if snapshot_type is None:
-        conn.close()
-        return
-
-    # ❌ Prevent duplicate SOD/EOD snapshots for the same day
-    cursor.execute("""
-        SELECT 1 FROM holdings_snapshots
-        WHERE DATE(snapshot_at) = ?
-          AND snapshot_type = ?
-        LIMIT 1
-    """, (today, snapshot_type))
-
-    if cursor.fetchone():
-        conn.close()
-        return
+HOLDINGS_SNAPSHOT_COLUMNS = [
+    "id", "snapshot_at", "snapshot_date", "snapshot_type", "user_id",
+    "tradingsymbol", "exchange",
+    "quantity", "average_price", "last_price", "pnl",
+]
 
-    snapshot_time = now_ist.isoformat()
+def write_holdings_snapshots(snapshots) -> dict:
+    """
+    Persist (snapshot_date, snapshot_type, snapshot_at, user_id, holdings)
+    tuples in one transaction.  A (date, type, account) already stored is
+    skipped, so the first snapshot of each SOD/EOD slot wins.
 
-    for h in holdings:
-        cursor.execute("""
-            INSERT INTO holdings_snapshots (
-                id, snapshot_at, snapshot_type,
-                tradingsymbol, exchange,
-                quantity, average_price, last_price, pnl
+    Returns: {"snapshots": int, "rows": int} actually written
+    """
+    written = {"snapshots": 0, "rows": 0}
+    with transaction() as conn:
+        for today, snapshot_type, snapshot_time, user_id, holdings in snapshots:
+            # ❌ Prevent duplicate SOD/EOD snapshots for the same day and account
+            exists = conn.execute("""
+                SELECT 1 FROM holdings_snapshots
+                WHERE snapshot_date = ?
+                  AND snapshot_type = ?
+                  AND user_id IS ?
+                LIMIT 1
+            """, (today, snapshot_type, user_id)).fetchone()
+
+            if exists:
+                continue
+
+            # Deterministic ids (one per day/type/account/instrument) instead of a uuid per row
+            result = bulk_insert(
+                "holdings_snapshots",
+                HOLDINGS_SNAPSHOT_COLUMNS,
+                (
+                    (
+                        f"{today}:{snapshot_type}:{user_id}:{h.get('exchange')}:{h.get('tradingsymbol')}",
+                        snapshot_time,
+                        today,
+                        snapshot_type,
+                        user_id,
+                        h.get("tradingsymbol"),
+                        h.get("exchange"),
+                        h.get("quantity"),
+                        h.get("average_price"),
+                        h.get("last_price"),
+                        h.get("pnl")
+                    )
+                    for h in holdings
+                ),
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            str(uuid.uuid4()),
-            snapshot_time,
-            snapshot_type,
-            h.get("tradingsymbol"),
-            h.get("exchange"),
-            h.get("quantity"),
-            h.get("average_price"),
-            h.get("last_price"),
-            h.get("pnl")
-        ))
-
-    conn.commit()
-    conn.close()
-
-def create_instruments_table():
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS instruments (
-            symbol TEXT NOT NULL,
-            exchange TEXT NOT NULL,
-            company_name TEXT,
-            sector TEXT,
-            industry TEXT,
-            isin TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            PRIMARY KEY (symbol, exchange)
-        )
-    """)
-
-    conn.commit()
-    conn.close()
+            written["rows"] += result["inserted"]
+            written["snapshots"] += 1
+    return written
 
 def get_latest_snapshot_meta(tradingsymbol: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("""
+    row = get_connection().execute("""
         SELECT
             MAX(snapshot_at) as last_snapshot_at,
             COUNT(*) as snapshot_count
         FROM holdings_snapshots
         WHERE tradingsymbol = ?
-    """, (tradingsymbol,))
-
-    row = cursor.fetchone()
-    conn.close()
+    """, (tradingsymbol,)).fetchone()
 
     if not row or not row[0]:
         return {
@@ -291,123 +430,91 @@ def upsert_instruments_from_holdings(holdings: list):
     Populate instruments table using live Zerodha holdings.
     Inserts only if (symbol, exchange) does not already exist.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    query = """
-        INSERT OR IGNORE INTO instruments (
-            symbol,
-            exchange,
-            company_name,
-            sector,
-            industry,
-            isin
-        )
-        VALUES (?, ?, ?, ?, ?, ?)
-    """
-
-    for h in holdings:
-        cursor.execute(
-            query,
-            (
-                h.get("tradingsymbol"),
-                h.get("exchange"),
-                None,                  # company_name (later)
-                None,                  # sector
-                None,                  # industry
-                h.get("isin")
-            )
-        )
+    return upsert_instruments(
+        {"symbol": h.get("tradingsymbol"), "exchange": h.get("exchange"), "isin": h.get("isin")}
+        for h in holdings
+    )
 
-    conn.commit()
-    conn.close()
+def upsert_instruments(items) -> dict:
+    """
+    INSERT OR IGNORE of {"symbol", "exchange", "isin"} dicts as one
+    statement; existing (symbol, exchange) rows are left untouched.
+    """
+    items = [[item["symbol"], item["exchange"], item.get("isin")] for item in items]
+    if not items:
+        return {"inserted": 0, "ignored": 0}
+
+    with transaction() as conn:
+        inserted = conn.execute("""
+            INSERT OR IGNORE INTO instruments (symbol, exchange, isin)
+            SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]'), json_extract(value, '$[2]')
+            FROM json_each(?)
+        """, (json.dumps(items),)).rowcount
+    return {"inserted": inserted, "ignored": len(items) - inserted}
 
 def enrich_instruments_with_sector():
     from backend.app.services.sector_map import get_sector_info
 
-    conn = get_connection()
-    cursor = conn.cursor()
+    rows = get_connection().execute("SELECT symbol, exchange FROM instruments").fetchall()
 
-    cursor.execute("SELECT symbol, exchange FROM instruments")
-    rows = cursor.fetchall()
+    with transaction() as conn:
+        for row in rows:
+            symbol = row["symbol"]
+            info = get_sector_info(symbol)
 
-    for row in rows:
-        symbol = row["symbol"]
-        info = get_sector_info(symbol)
-
-        cursor.execute("""
-            UPDATE instruments
-            SET sector = ?, industry = ?
-            WHERE symbol = ?
-        """, (info["sector"], info["industry"], symbol))
-
-    conn.commit()
-    conn.close()
+            conn.execute("""
+                UPDATE instruments
+                SET sector = ?, industry = ?
+                WHERE symbol = ?
+            """, (info["sector"], info["industry"], symbol))
 
 def get_instrument(symbol: str, exchange: str):
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
+    return get_connection().execute(
         """
         SELECT * FROM instruments
         WHERE symbol = ? AND exchange = ?
         """,
         (symbol, exchange)
-    )
-
-    row = cursor.fetchone()
-    conn.close()
-    return row
+    ).fetchone()
 
-def update_instrument_sector(symbol, exchange, sector, industry):
-    conn = get_connection()
-    cursor = conn.cursor()
+def get_instruments(pairs) -> dict:
+    """
+    Batch lookup: {(symbol, exchange): Row} for every pair that exists.
+    One query regardless of how many pairs are passed.
+    """
+    pairs = list(dict.fromkeys(pairs))
+    if not pairs:
+        return {}
 
-    cursor.execute(
-        """
-        UPDATE instruments
-        SET sector = ?, industry = ?
-        WHERE symbol = ? AND exchange = ?
-        """,
-        (sector, industry, symbol, exchange)
-    )
+    rows = get_connection().execute("""
+        SELECT i.*
+        FROM json_each(?) j
+        JOIN instruments i
+          ON i.symbol = json_extract(j.value, '$[0]')
+         AND i.exchange = json_extract(j.value, '$[1]')
+    """, (json.dumps(pairs),)).fetchall()
 
-    conn.commit()
-    conn.close()
+    return {(row["symbol"], row["exchange"]): row for row in rows}
 
+def update_instrument_sector(symbol, exchange, sector, industry):
+    update_instrument_sectors([(symbol, exchange, sector, industry)])
 
-# ─── Delivery Data Cache ───────────────────────────────────────────
+def update_instrument_sectors(updates: list):
+    """Batch sector update from (symbol, exchange, sector, industry) tuples, as one statement."""
+    if not updates:
+        return
+    with transaction() as conn:
+        conn.execute("""
+            UPDATE instruments
+            SET sector = json_extract(j.value, '$[2]'),
+                industry = json_extract(j.value, '$[3]')
+            FROM json_each(?) j
+            WHERE instruments.symbol = json_extract(j.value, '$[0]')
+              AND instruments.exchange = json_extract(j.value, '$[1]')
+        """, (json.dumps([list(u) for u in updates]),))
 
-def create_delivery_cache_table():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS delivery_cache (
-            symbol TEXT NOT NULL,
-            trade_date TEXT NOT NULL,
-            total_traded_qty INTEGER DEFAULT 0,
-            delivered_qty INTEGER DEFAULT 0,
-            not_delivered_qty INTEGER DEFAULT 0,
-            delivery_pct REAL DEFAULT 0,
-            price_up INTEGER DEFAULT 1,
-            close_price REAL DEFAULT 0,
-            open_price REAL DEFAULT 0,
-            high_price REAL DEFAULT 0,
-            low_price REAL DEFAULT 0,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            PRIMARY KEY (symbol, trade_date)
-        )
-    """)
-    # Add OHLC columns if table already exists (migration for existing DBs)
-    for col in ["close_price", "open_price", "high_price", "low_price"]:
-        try:
-            cursor.execute(f"ALTER TABLE delivery_cache ADD COLUMN {col} REAL DEFAULT 0")
-        except Exception:
-            pass  # Column already exists
-    conn.commit()
-    conn.close()
 
+# ─── Delivery Data Cache ───────────────────────────────────────────
 
 def _normalize_date_to_iso(date_str: str) -> str:
     """Convert DD-Mon-YYYY (e.g. '21-Nov-2025') to YYYY-MM-DD for SQLite."""
@@ -418,43 +525,44 @@ def _normalize_date_to_iso(date_str: str) -> str:
         return date_str  # Already ISO or unknown format
 
 
-def save_delivery_cache(symbol: str, records: list):
+DELIVERY_CACHE_COLUMNS = [
+    "symbol", "trade_date", "total_traded_qty", "delivered_qty",
+    "not_delivered_qty", "delivery_pct", "price_up",
+    "close_price", "open_price", "high_price", "low_price",
+]
+
+
+def save_delivery_cache(symbol: str, records: list) -> dict:
     """Upsert delivery records for a symbol into cache. Dates stored as ISO."""
     if not records:
-        return
-    conn = get_connection()
-    cursor = conn.cursor()
-    for r in records:
-        iso_date = _normalize_date_to_iso(r["date"])
-        cursor.execute("""
-            INSERT OR REPLACE INTO delivery_cache
-                (symbol, trade_date, total_traded_qty, delivered_qty,
-                 not_delivered_qty, delivery_pct, price_up,
-                 close_price, open_price, high_price, low_price)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            symbol,
-            iso_date,
-            r.get("total_traded_qty", 0),
-            r.get("delivered_qty", 0),
-            r.get("not_delivered_qty", 0),
-            r.get("delivery_pct", 0),
-            1 if r.get("price_up", True) else 0,
-            r.get("close_price", 0),
-            r.get("open_price", 0),
-            r.get("high_price", 0),
-            r.get("low_price", 0)
-        ))
-    conn.commit()
-    conn.close()
+        return {"inserted": 0, "ignored": 0}
+    return bulk_insert(
+        "delivery_cache",
+        DELIVERY_CACHE_COLUMNS,
+        (
+            (
+                symbol,
+                _normalize_date_to_iso(r["date"]),
+                r.get("total_traded_qty", 0),
+                r.get("delivered_qty", 0),
+                r.get("not_delivered_qty", 0),
+                r.get("delivery_pct", 0),
+                1 if r.get("price_up", True) else 0,
+                r.get("close_price", 0),
+                r.get("open_price", 0),
+                r.get("high_price", 0),
+                r.get("low_price", 0)
+            )
+            for r in records
+        ),
+        conflict="REPLACE",
+    )
 
 
 def get_delivery_cache(symbol: str, period_days: int = 365) -> list:
     """Read cached delivery data for a symbol within the given period."""
     from datetime import datetime as _dt
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+    rows = get_connection().execute("""
         SELECT trade_date, total_traded_qty, delivered_qty,
                not_delivered_qty, delivery_pct, price_up,
                close_price, open_price, high_price, low_price
@@ -462,9 +570,7 @@ def get_delivery_cache(symbol: str, period_days: int = 365) -> list:
         WHERE symbol = ?
           AND trade_date >= date('now', ?)
         ORDER BY trade_date ASC
-    """, (symbol, f"-{period_days} days"))
-    rows = cursor.fetchall()
-    conn.close()
+    """, (symbol, f"-{period_days} days")).fetchall()
 
     results = []
     for row in rows:
@@ -488,31 +594,65 @@ def get_delivery_cache(symbol: str, period_days: int = 365) -> list:
     return results
 
 
-# ─── Trades (Tradebook Import) ──────────────────────────────────────
+def get_delivery_coverage(symbol: str, start: str, end: str) -> list:
+    """Covered intervals of a symbol overlapping [start, end] (ISO dates), as [(start, end), ...] in order."""
+    rows = get_connection().execute("""
+        SELECT start_date, end_date FROM delivery_coverage
+        WHERE symbol = ? AND start_date <= ? AND end_date >= ?
+        ORDER BY start_date
+    """, (symbol, end, start)).fetchall()
+    return [(r["start_date"], r["end_date"]) for r in rows]
 
-def create_trades_table():
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS trades (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            symbol TEXT NOT NULL,
-            isin TEXT,
-            trade_date TEXT NOT NULL,
-            exchange TEXT NOT NULL,
-            segment TEXT,
-            series TEXT,
-            trade_type TEXT NOT NULL,
-            auction TEXT,
-            quantity REAL NOT NULL,
-            price REAL NOT NULL,
-            trade_id TEXT NOT NULL,
-            order_id TEXT,
-            order_execution_time TEXT,
-            source_file TEXT,
-            imported_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            UNIQUE(trade_id, symbol, trade_date, exchange)
+
+def add_delivery_coverage(symbol: str, start: str, end: str) -> tuple:
+    """
+    Record [start, end] (ISO dates) as fetched for a symbol, merged with any
+    interval it overlaps or touches.  The merged interval's row count is
+    recounted from delivery_cache (write the chunk's rows first), so days
+    fetched twice are not counted twice.  Returns the merged (start, end).
+    """
+    with transaction() as conn:
+        overlapping = conn.execute("""
+            SELECT start_date, end_date FROM delivery_coverage
+            WHERE symbol = ?
+              AND start_date <= date(?, '+1 day')
+              AND end_date >= date(?, '-1 day')
+        """, (symbol, end, start)).fetchall()
+
+        merged_start = min([start] + [r["start_date"] for r in overlapping])
+        merged_end = max([end] + [r["end_date"] for r in overlapping])
+        conn.executemany(
+            "DELETE FROM delivery_coverage WHERE symbol = ? AND start_date = ?",
+            [(symbol, r["start_date"]) for r in overlapping],
         )
-    """)
-    conn.commit()
-    conn.close()
+        conn.execute("""
+            INSERT INTO delivery_coverage (symbol, start_date, end_date, rows)
+            SELECT ?, ?, ?, COUNT(*) FROM delivery_cache
+            WHERE symbol = ? AND trade_date BETWEEN ? AND ?
+        """, (symbol, merged_start, merged_end, symbol, merged_start, merged_end))
+    return merged_start, merged_end
+
+
+# ─── Trades (Tradebook Import) ──────────────────────────────────────
+
+TRADE_COLUMNS = [
+    "symbol", "isin", "trade_date", "exchange", "segment",
+    "series", "trade_type", "auction", "quantity", "price",
+    "trade_id", "order_id", "order_execution_time", "source_file", "user_id",
+]
+
+
+def insert_trades(rows) -> dict:
+    """
+    bulk_insert rows (TRADE_COLUMNS order) into trades, INSERT OR IGNORE.
+    If any row is new, analytics_state.trades_version is bumped in the same
+    transaction, so the analytics summaries see the change without
+    scanning trades.
+
+    Returns: {"inserted": int, "ignored": int}
+    """
+    with transaction() as conn:
+        result = bulk_insert("trades", TRADE_COLUMNS, rows)
+        if result["inserted"]:
+            conn.execute("UPDATE analytics_state SET trades_version = trades_version + 1 WHERE id = 1")
+    return result
@@ -1,143 +1,321 @@
-from datetime import datetime, timedelta
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
 from nselib import capital_market
+import numpy as np
 import pandas as pd
 
-from backend.app.services.db import save_delivery_cache, get_delivery_cache
+from backend.app.services.db import (
+    DELIVERY_CACHE_COLUMNS,
+    add_delivery_coverage,
+    bulk_insert,
+    get_connection,
+    get_delivery_cache,
+    get_delivery_coverage,
+    transaction,
+)
 
+logger = logging.getLogger("tunefolio.delivery")
 
-def _safe_float(val) -> float:
-    """Convert a value to float, stripping commas from string representations."""
-    if val is None or (isinstance(val, float) and pd.isna(val)):
-        return 0.0
-    if isinstance(val, str):
-        return float(val.replace(",", ""))
-    return float(val)
+# NSE serves at most about a year per request
+NSE_CHUNK_DAYS = 365
 
+# How long a symbol stays in the negative cache, per reason (seconds)
+NEGATIVE_TTL_SECONDS = {
+    "empty": int(os.getenv("DELIVERY_EMPTY_TTL", 7 * 24 * 3600)),          # BSE-only / SME: weekly
+    "blocked": int(os.getenv("DELIVERY_BLOCKED_TTL", 6 * 3600)),           # NSE refusing this IP
+    "rate_limited": int(os.getenv("DELIVERY_RATE_LIMITED_TTL", 15 * 60)),
+    "error": int(os.getenv("DELIVERY_ERROR_TTL", 3600)),
+}
 
-def _safe_int(val) -> int:
-    """Convert a value to int, stripping commas from string representations."""
-    if val is None or (isinstance(val, float) and pd.isna(val)):
-        return 0
-    if isinstance(val, str):
-        return int(float(val.replace(",", "")))
-    return int(val)
 
+class DeliveryFetchError(Exception):
+    """An NSE request that failed, with its negative-cache reason."""
 
-def _fetch_nse_chunk(symbol: str, start: datetime, end: datetime) -> list[dict]:
-    """Fetch one chunk of delivery data from NSE (max ~365 days recommended)."""
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+def _classify_nse_error(message: str) -> str:
+    text = message.lower()
+    if "429" in text or "too many" in text or "rate limit" in text:
+        return "rate_limited"
+    if "403" in text or "forbidden" in text or "access denied" in text or "<html" in text:
+        return "blocked"
+    return "error"
+
+
+# ─── NSE Fetch & Parse ───────────────────────────────────────────────
+
+def _numeric(df: pd.DataFrame, column: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    A column as a float array, commas stripped, missing values as 0.  Also
+    returns the mask of values present but not numeric (e.g. "-"); those
+    rows are dropped.
+    """
+    if column not in df.columns:
+        return np.zeros(len(df)), np.zeros(len(df), dtype=bool)
+    raw = df[column]
+    missing = raw.isna().to_numpy()
+    if pd.api.types.is_numeric_dtype(raw):
+        values = raw.to_numpy(dtype=float, na_value=np.nan)
+    else:
+        values = pd.to_numeric(raw.astype(str).str.replace(",", "", regex=False), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    return np.where(missing, 0.0, values), np.isnan(values) & ~missing
+
+
+def parse_delivery_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    nselib's price/volume/deliverable frame → delivery_cache rows
+    (DELIVERY_CACHE_COLUMNS without symbol), one per ISO trade date, in date
+    order.  Rows without a parseable date or with a non-numeric value are
+    dropped; a repeated date keeps its first row.
+    """
+    if df is None or df.empty or "Date" not in df.columns:
+        return pd.DataFrame(columns=DELIVERY_CACHE_COLUMNS[1:])
+
+    dates = pd.to_datetime(df["Date"], format="%d-%b-%Y", errors="coerce")
+    if dates.isna().any():
+        dates = dates.fillna(pd.to_datetime(df["Date"], format="%Y-%m-%d", errors="coerce"))
+    keep = dates.notna().to_numpy()
+
+    values = {}
+    for name, column in (
+        ("total_traded_qty", "TotalTradedQuantity"),
+        ("delivered_qty", "DeliverableQty"),
+        ("delivery_pct", "%DlyQttoTradedQty"),
+        ("close_price", "ClosePrice"),
+        ("prev_close", "PrevClose"),
+        ("open_price", "OpenPrice"),
+        ("high_price", "HighPrice"),
+        ("low_price", "LowPrice"),
+    ):
+        values[name], bad = _numeric(df, column)
+        keep = keep & ~bad
+
+    total = values["total_traded_qty"][keep].astype(np.int64)
+    delivered = values["delivered_qty"][keep].astype(np.int64)
+    frame = pd.DataFrame({
+        "trade_date": dates.to_numpy()[keep].astype("datetime64[D]").astype(str),
+        "total_traded_qty": total,
+        "delivered_qty": delivered,
+        "not_delivered_qty": np.maximum(total - delivered, 0),
+        # round() rather than numpy's scale-and-round, which differs on halves (51.735)
+        "delivery_pct": [round(x, 2) for x in values["delivery_pct"][keep].tolist()],
+        "price_up": (values["close_price"] >= values["prev_close"])[keep].astype(np.int64),
+        "close_price": values["close_price"][keep],
+        "open_price": values["open_price"][keep],
+        "high_price": values["high_price"][keep],
+        "low_price": values["low_price"][keep],
+    })
+
+    return frame.drop_duplicates("trade_date").sort_values("trade_date", kind="stable", ignore_index=True)
+
+
+def delivery_rows(symbol: str, frame: pd.DataFrame):
+    """parse_delivery_frame() output as delivery_cache row tuples, straight from its columns."""
+    return zip([symbol] * len(frame), *(frame[c].tolist() for c in DELIVERY_CACHE_COLUMNS[1:]))
+
+
+def _nse_chunk(symbol: str, start: datetime, end: datetime, fetcher=None) -> pd.DataFrame:
+    """
+    Fetch one chunk of delivery data from NSE (max ~365 days recommended),
+    parsed by parse_delivery_frame().  Raises DeliveryFetchError if the
+    request fails; an empty frame means NSE has no rows for the range.
+
+    `fetcher` stands in for nselib's
+    price_volume_and_deliverable_position_data(symbol, "dd-mm-YYYY", "dd-mm-YYYY").
+    """
     from_date = start.strftime("%d-%m-%Y")
     to_date = end.strftime("%d-%m-%Y")
+    fetcher = fetcher or capital_market.price_volume_and_deliverable_position_data
 
     try:
-        df = capital_market.price_volume_and_deliverable_position_data(
-            symbol, from_date, to_date
-        )
-    except Exception:
-        return []
+        df = fetcher(symbol, from_date, to_date)
+    except Exception as e:
+        raise DeliveryFetchError(_classify_nse_error(str(e)), str(e)) from e
 
     if df is None or (hasattr(df, 'empty') and df.empty):
-        return []
+        return parse_delivery_frame(None)
 
-    results = []
-    for _, row in df.iterrows():
-        try:
-            total_traded = _safe_int(row.get("TotalTradedQuantity", 0))
-            delivered = _safe_int(row.get("DeliverableQty", 0))
-            not_delivered = max(total_traded - delivered, 0)
-            delivery_pct = round(_safe_float(row.get("%DlyQttoTradedQty", 0)), 2)
-
-            close_price = _safe_float(row.get("ClosePrice", 0))
-            prev_close = _safe_float(row.get("PrevClose", 0))
-            open_price = _safe_float(row.get("OpenPrice", 0))
-            high_price = _safe_float(row.get("HighPrice", 0))
-            low_price = _safe_float(row.get("LowPrice", 0))
-
-            price_up = close_price >= prev_close
-
-            results.append({
-                "date": str(row["Date"]),
-                "total_traded_qty": total_traded,
-                "delivered_qty": delivered,
-                "not_delivered_qty": not_delivered,
-                "delivery_pct": delivery_pct,
-                "price_up": price_up,
-                "close_price": close_price,
-                "open_price": open_price,
-                "high_price": high_price,
-                "low_price": low_price
-            })
-        except (ValueError, KeyError, TypeError):
-            continue
-
-    return results
-
-
-def fetch_delivery_from_nse(symbol: str, period_days: int = 365) -> list[dict]:
-    """
-    Fetch delivery volume + price data from NSE via nselib.
-    For periods > 365 days, fetches in yearly chunks to avoid NSE API limits.
-    Returns list of dicts with price direction and OHLC prices.
-    Returns empty list on any failure (NSE blocks cloud IPs, rate limits, etc.)
-    """
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=period_days)
-
-    # Split into yearly chunks for long periods
-    all_results = []
-    chunk_start = start_date
-    while chunk_start < end_date:
-        chunk_end = min(chunk_start + timedelta(days=365), end_date)
-        chunk_data = _fetch_nse_chunk(symbol, chunk_start, chunk_end)
-        all_results.extend(chunk_data)
-        chunk_start = chunk_end + timedelta(days=1)
+    # nselib doesn't check the HTTP status: a refused request comes back as
+    # an HTML page parsed into a frame without dates
+    if "Date" not in df.columns or df["Date"].isna().all():
+        raise DeliveryFetchError("blocked", f"Unexpected NSE response for {symbol}: {list(df.columns)[:5]}")
 
-    if not all_results:
-        return []
+    return parse_delivery_frame(df)
 
-    # De-duplicate by date (chunks may overlap at boundaries)
-    seen_dates = set()
-    unique_results = []
-    for r in all_results:
-        if r["date"] not in seen_dates:
-            seen_dates.add(r["date"])
-            unique_results.append(r)
 
-    try:
-        unique_results.sort(key=lambda x: datetime.strptime(x["date"], "%d-%b-%Y"))
-    except ValueError:
-        pass
+def nse_chunks(start: date, end: date):
+    """Split [start, end] into NSE-sized (start, end) request windows."""
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=NSE_CHUNK_DAYS), end)
+        yield chunk_start, chunk_end
+        chunk_start = chunk_end + timedelta(days=1)
 
-    return unique_results
 
+# ─── Read Path ───────────────────────────────────────────────────────
 
-def fetch_and_cache_delivery(symbol: str, period_days: int = 365) -> list[dict]:
+def fetch_delivery_data(symbol: str, period_days: int = 365) -> dict:
     """
-    Fetch from NSE, cache to DB, return results.
-    Called from sync endpoints or local scripts.
+    Primary function called by the API endpoint.
+    1. Unless the symbol is negatively cached, fill the true gaps in the
+       coverage index up to yesterday from NSE (works locally, may fail on
+       Render); ranges already fetched — with or without rows — are never
+       requested again.  Today comes from sync.
+    2. Return the cache for the requested period.  An empty period is
+       no_data: with the negative-cache reason while one is active, else
+       "empty" if NSE has already answered for any of it.
+
+    Returns: {"status": "ok" | "no_data", "reason", "retry_at", "data"}
     """
-    data = fetch_delivery_from_nse(symbol, period_days)
+    today = date.today()
+    start, end = today - timedelta(days=period_days), today - timedelta(days=1)
+    unavailable = get_unavailable(symbol)
+    if unavailable is None:
+        _fill(symbol, missing_ranges(symbol, start, end))
+        unavailable = get_unavailable(symbol)
+
+    data = get_delivery_cache(symbol, period_days)
     if data:
-        save_delivery_cache(symbol, data)
-    return data
+        return {"status": "ok", "reason": None, "retry_at": None, "data": data}
+    if unavailable is not None:
+        return {"status": "no_data", **unavailable, "data": []}
+    if get_delivery_coverage(symbol, start.isoformat(), end.isoformat()):
+        # Fetched, but NSE had no rows in this period (the negative entry,
+        # if any, has expired or covers a longer history)
+        return {"status": "no_data", "reason": "empty", "retry_at": None, "data": []}
+    return {"status": "ok", "reason": None, "retry_at": None, "data": []}
+
 
+# ─── Negative Cache ──────────────────────────────────────────────────
 
-def fetch_delivery_data(symbol: str, period_days: int = 365) -> list[dict]:
+def get_unavailable(symbol: str) -> dict | None:
+    """{"reason", "retry_at"} while the symbol is negatively cached, else None."""
+    row = get_connection().execute(
+        "SELECT reason, retry_at FROM delivery_unavailable WHERE symbol = ? AND retry_at > ?",
+        (symbol, time.time()),
+    ).fetchone()
+    if row is None:
+        return None
+    return {"reason": row["reason"], "retry_at": datetime.fromtimestamp(row["retry_at"]).isoformat(timespec="seconds")}
+
+
+def _record_unavailable(symbol: str, reason: str, error: str = None) -> None:
+    with transaction() as conn:
+        conn.execute("""
+            INSERT INTO delivery_unavailable (symbol, reason, attempts, last_error, retry_at, updated_at)
+            VALUES (?, ?, 1, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT (symbol) DO UPDATE SET
+                reason = excluded.reason,
+                attempts = attempts + 1,
+                last_error = excluded.last_error,
+                retry_at = excluded.retry_at,
+                updated_at = excluded.updated_at
+        """, (symbol, reason, error[:500] if error else None, time.time() + NEGATIVE_TTL_SECONDS[reason]))
+    logger.info(f"No NSE delivery data for {symbol} ({reason}); skipping it for {NEGATIVE_TTL_SECONDS[reason]}s")
+
+
+def _clear_unavailable(symbol: str) -> None:
+    with transaction() as conn:
+        conn.execute("DELETE FROM delivery_unavailable WHERE symbol = ?", (symbol,))
+
+
+# ─── Coverage-Aware Fill ─────────────────────────────────────────────
+
+def missing_ranges(symbol: str, start: date, end: date) -> list[tuple[date, date]]:
+    """[start, end] minus the symbol's covered intervals, as (start, end) ranges."""
+    ranges = []
+    cursor = start
+    for covered_start, covered_end in get_delivery_coverage(symbol, start.isoformat(), end.isoformat()):
+        covered_start, covered_end = date.fromisoformat(covered_start), date.fromisoformat(covered_end)
+        if covered_start > cursor:
+            ranges.append((cursor, covered_start - timedelta(days=1)))
+        cursor = max(cursor, covered_end + timedelta(days=1))
+    if cursor <= end:
+        ranges.append((cursor, end))
+    return ranges
+
+
+def fill_chunk(symbol: str, start: date, end: date, fetcher=None) -> int:
     """
-    Primary function called by the API endpoint.
-    1. Try DB cache first (always fast)
-    2. If cache seems incomplete for the requested period, try live NSE fetch
-    3. Return whatever we have (cache may have partial data for long periods)
-    """
-    # 1. Check cache — always return what we have
-    cached = get_delivery_cache(symbol, period_days)
-
-    # 2. If cache empty or has fewer data points than expected for this period,
-    #    try live NSE fetch to supplement (works locally, may fail on Render)
-    expected_min_days = period_days * 0.5  # ~50% of trading days in the range
-    if not cached or (period_days > 365 and len(cached) < expected_min_days * 0.3):
-        live_data = fetch_and_cache_delivery(symbol, period_days)
-        if live_data:
-            # Re-read from cache (now merged with new data)
-            cached = get_delivery_cache(symbol, period_days)
-
-    return cached or []
+    Fetch one NSE chunk and cache its rows and its coverage together.  A
+    failed chunk (DeliveryFetchError) is not recorded, so it stays missing.
+    NSE publishes a day's data after the close, so today counts as covered
+    only once its row has come back.
+
+    Returns: rows cached
+    """
+    rows = _nse_chunk(symbol, start, end, fetcher)
+
+    today = date.today()
+    covered_end = end
+    if end >= today:
+        covered_end = today - timedelta(days=1)
+        if len(rows):
+            covered_end = max(covered_end, date.fromisoformat(rows["trade_date"].iloc[-1]))
+    with transaction():
+        bulk_insert("delivery_cache", DELIVERY_CACHE_COLUMNS, delivery_rows(symbol, rows), conflict="REPLACE")
+        if covered_end >= start:
+            add_delivery_coverage(symbol, start.isoformat(), covered_end.isoformat())
+    return len(rows)
+
+
+def _fill_range(symbol: str, start: date, end: date) -> dict:
+    """
+    fill_chunk() over [start, end], in order.  Stops at the first blocked
+    or rate-limited chunk: the rest would fail too.
+
+    Returns: {"requests", "errors", "records", "error"} — error is the last
+             DeliveryFetchError, if any
+    """
+    outcome = {"requests": 0, "errors": 0, "records": 0, "error": None}
+    for chunk_start, chunk_end in nse_chunks(start, end):
+        outcome["requests"] += 1
+        try:
+            outcome["records"] += fill_chunk(symbol, chunk_start, chunk_end)
+        except DeliveryFetchError as e:
+            outcome["errors"] += 1
+            outcome["error"] = e
+            if e.reason in ("blocked", "rate_limited"):
+                break
+    return outcome
+
+
+def settle_unavailable(symbol: str, requests: int, records: int, error: DeliveryFetchError = None) -> None:
+    """
+    Update the negative cache after fetching a symbol: rows clear it, a
+    failure records its reason, and a symbol NSE answered empty for with
+    nothing ever cached is recorded as "empty".
+    """
+    if records:
+        _clear_unavailable(symbol)
+    elif error is not None:
+        _record_unavailable(symbol, error.reason, str(error))
+    elif requests and get_connection().execute(
+        "SELECT 1 FROM delivery_cache WHERE symbol = ? LIMIT 1", (symbol,)
+    ).fetchone() is None:
+        _record_unavailable(symbol, "empty")
+
+
+def _fill(symbol: str, ranges: list) -> dict:
+    """
+    _fill_range() over `ranges`, then settle_unavailable().
+
+    Returns: {"requests", "errors", "records"}
+    """
+    result = {"requests": 0, "errors": 0, "records": 0}
+    error = None
+    for range_start, range_end in ranges:
+        outcome = _fill_range(symbol, range_start, range_end)
+        error = outcome.pop("error") or error
+        for key, value in outcome.items():
+            result[key] += value
+        if error is not None and error.reason in ("blocked", "rate_limited"):
+            break
+
+    settle_unavailable(symbol, result["requests"], result["records"], error)
+    return result
@@ -0,0 +1,396 @@
+"""
+Parallel delivery-data sync.
+
+run_delivery_sync() brings the delivery cache of many symbols up to date.
+Every NSE chunk missing from the coverage index (delivery.py) becomes a
+task on a bounded thread pool, and all tasks draw from one shared
+AdaptiveTokenBucket: it speeds up while NSE answers with rows and backs off
+on empty answers and errors, harder when NSE blocks or rate-limits.
+
+Progress is checkpointed in delivery_sync_runs / delivery_sync_symbols.
+Each run records its owner (pid, host) and heartbeats while it works.  A
+run that was interrupted, or whose owner died or stopped heartbeating, is
+resumed by the next call with the same symbols and start date, skipping
+the symbols it finished; chunks fetched before the interruption are
+already in the coverage index.  A run whose owner is still alive makes
+the next call fail with DeliverySyncBusy instead.
+
+`fetcher` replaces nselib's call, so the engine can run against a local
+stand-in (scripts/benchmark.py delivery-sync).
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+from backend.app.services.db import get_connection, transaction
+from backend.app.services.delivery import (
+    DeliveryFetchError,
+    fill_chunk,
+    get_unavailable,
+    missing_ranges,
+    nse_chunks,
+    settle_unavailable,
+)
+from backend.app.services.kite_client import TokenBucket
+
+logger = logging.getLogger("tunefolio.delivery_sync")
+
+DELIVERY_SYNC_WORKERS = 4
+
+NSE_RATE_INITIAL = 1.0          # requests/second
+NSE_RATE_MIN = 0.1
+NSE_RATE_MAX = 4.0
+NSE_RATE_BURST = 2
+NSE_RATE_STEP = 0.1             # added per chunk NSE answered with rows
+NSE_EMPTY_BACKOFF = 0.8         # rate multiplier per empty answer for a week or more
+NSE_EMPTY_MIN_DAYS = 7          # shorter ranges are often just weekends / unpublished days
+NSE_ERROR_BACKOFF = 0.5         # ... per failed request
+NSE_THROTTLED_BACKOFF = 0.25    # ... when NSE blocks or rate-limits
+
+RUN_HEARTBEAT_SECONDS = 30
+RUN_STALE_SECONDS = 300         # a 'running' run without a heartbeat this long is orphaned
+
+_run_lock = threading.Lock()    # one sync at a time per process
+
+
+class DeliverySyncBusy(Exception):
+    """Another delivery sync is running, in this process or another live one."""
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """TokenBucket whose rate moves within [min_rate, max_rate]: additive increase, multiplicative decrease."""
+
+    def __init__(self, rate: float, burst: int, min_rate: float, max_rate: float, step: float = NSE_RATE_STEP):
+        super().__init__(rate, burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.step = step
+
+    def _adjust(self, rate_fn) -> None:
+        with self._lock:
+            # Bank the tokens earned at the old rate before switching
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self.rate = min(self.max_rate, max(self.min_rate, rate_fn(self.rate)))
+
+    def succeeded(self) -> None:
+        self._adjust(lambda rate: rate + self.step)
+
+    def backoff(self, factor: float) -> None:
+        self._adjust(lambda rate: rate * factor)
+
+
+def default_limiter() -> AdaptiveTokenBucket:
+    return AdaptiveTokenBucket(NSE_RATE_INITIAL, NSE_RATE_BURST, NSE_RATE_MIN, NSE_RATE_MAX)
+
+
+def _now_iso() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+# ─── Checkpoints ─────────────────────────────────────────────────────
+
+def _owner() -> tuple:
+    return os.getpid(), socket.gethostname()
+
+
+# Updates to a run this process still owns; a run another process has
+# abandoned or taken over is left alone
+_OWNED = "id = ? AND status = 'running' AND owner_pid = ? AND owner_host = ?"
+
+
+def _owner_gone(row, now: float) -> bool:
+    """Whether an unfinished run is no longer being worked on by its owner."""
+    if row["status"] != "running":
+        return True                 # interrupted: its owner closed it
+    if row["updated_at"] is None or now - row["updated_at"] > RUN_STALE_SECONDS:
+        return True
+    pid, host = _owner()
+    if row["owner_host"] != host:
+        return False                # fresh heartbeat from another host
+    if row["owner_pid"] == pid:
+        return True                 # this process holds _run_lock, so that run is over
+    try:
+        os.kill(row["owner_pid"], 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass                        # exists, owned by another user
+    return False
+
+
+def _open_run(symbols: list, start_date: str, period_days: int, trigger: str, resume: bool) -> tuple:
+    """
+    Resume the latest unfinished run for the same symbols and start date,
+    or start a new one, owned by this process.  Other unfinished runs are
+    marked abandoned.  Raises DeliverySyncBusy if an unfinished run's owner
+    is still alive and heartbeating.
+
+    Returns: (run_id, symbols already finished, resumed)
+    """
+    key = json.dumps(symbols)
+    pid, host = _owner()
+    now = time.time()
+    with transaction() as conn:
+        unfinished = conn.execute("""
+            SELECT id, status, start_date, symbols, owner_pid, owner_host, updated_at
+            FROM delivery_sync_runs
+            WHERE status IN ('running', 'interrupted')
+            ORDER BY id DESC
+        """).fetchall()
+
+        live = [row for row in unfinished if not _owner_gone(row, now)]
+        if live:
+            row = live[0]
+            raise DeliverySyncBusy(
+                f"Delivery sync run {row['id']} is running (pid {row['owner_pid']} on {row['owner_host']})"
+            )
+
+        run_id = None
+        for row in unfinished:
+            if resume and run_id is None and row["start_date"] == start_date and row["symbols"] == key:
+                run_id = row["id"]
+            else:
+                conn.execute(
+                    "UPDATE delivery_sync_runs SET status = 'abandoned', finished_at = ? WHERE id = ?",
+                    (_now_iso(), row["id"]),
+                )
+
+        if run_id is not None:
+            conn.execute("""
+                UPDATE delivery_sync_runs
+                SET status = 'running', owner_pid = ?, owner_host = ?, updated_at = ?
+                WHERE id = ?
+            """, (pid, host, now, run_id))
+            finished = {r["symbol"] for r in conn.execute(
+                "SELECT symbol FROM delivery_sync_symbols WHERE run_id = ?", (run_id,)
+            )}
+            return run_id, finished, True
+
+        run_id = conn.execute("""
+            INSERT INTO delivery_sync_runs (
+                trigger, status, period_days, start_date, symbols, total, started_at,
+                owner_pid, owner_host, updated_at
+            ) VALUES (?, 'running', ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (trigger, period_days, start_date, key, len(symbols), _now_iso(), pid, host, now)).lastrowid
+        return run_id, set(), False
+
+
+def _heartbeat(run_id: int, stop: threading.Event) -> None:
+    """Keep the run's updated_at fresh until `stop` is set."""
+    while not stop.wait(RUN_HEARTBEAT_SECONDS):
+        with transaction() as conn:
+            conn.execute(f"UPDATE delivery_sync_runs SET updated_at = ? WHERE {_OWNED}",
+                         (time.time(), run_id, *_owner()))
+
+
+def _checkpoint_symbol(run_id: int, result: dict, rate: float) -> None:
+    with transaction() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO delivery_sync_symbols (
+                run_id, symbol, status, reason, requests, errors, records,
+                fetched_days, skipped_days, finished_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            run_id, result["symbol"], result["status"], result["reason"], result["requests"],
+            result["errors"], result["records"], result["fetched_days"], result["skipped_days"], _now_iso(),
+        ))
+        conn.execute(f"""
+            UPDATE delivery_sync_runs
+            SET done = done + 1, requests = requests + ?, errors = errors + ?,
+                records = records + ?, rate = ?, updated_at = ?
+            WHERE {_OWNED}
+        """, (result["requests"], result["errors"], result["records"], round(rate, 3), time.time(),
+              run_id, *_owner()))
+
+
+def _close_run(run_id: int, status: str, started: float) -> bool:
+    """Record the run's final status, unless it is no longer ours (e.g. abandoned as stale)."""
+    with transaction() as conn:
+        closed = conn.execute(f"""
+            UPDATE delivery_sync_runs
+            SET status = ?, finished_at = ?, duration_ms = COALESCE(duration_ms, 0) + ?
+            WHERE {_OWNED}
+        """, (status, _now_iso(), round((time.perf_counter() - started) * 1000, 1),
+              run_id, *_owner())).rowcount
+    if not closed:
+        logger.warning(f"Delivery sync run {run_id} was taken over before it finished; not marking it {status}")
+    return bool(closed)
+
+
+# ─── Engine ──────────────────────────────────────────────────────────
+
+def run_delivery_sync(symbols, period_days: int = 365, trigger: str = "api",
+                      workers: int = DELIVERY_SYNC_WORKERS, fetcher=None, limiter=None,
+                      progress=None, resume: bool = True) -> dict:
+    """
+    Sync the last `period_days` of delivery data for `symbols`, fetching
+    only chunks missing from the coverage index.  Negatively cached
+    symbols are skipped until their TTL expires.
+
+    progress(done, total, result) is called from this thread as each symbol
+    finishes.  Raises DeliverySyncBusy if a sync is already running.
+
+    Returns: {"id", "status", "resumed", "symbols", "done", "requests",
+              "errors", "records", "fetched_days", "skipped_days",
+              "unavailable", "rate", "duration_ms", "results": {symbol: {...}}}
+    """
+    if not _run_lock.acquire(blocking=False):
+        raise DeliverySyncBusy("A delivery sync is already running")
+    try:
+        return _run(sorted(set(symbols)), period_days, trigger, workers,
+                    fetcher, limiter or default_limiter(), progress, resume)
+    finally:
+        _run_lock.release()
+
+
+def _run(symbols, period_days, trigger, workers, fetcher, limiter, progress, resume) -> dict:
+    started = time.perf_counter()
+    end = date.today()
+    start = end - timedelta(days=period_days)
+    run_id, finished, resumed = _open_run(symbols, start.isoformat(), period_days, trigger, resume)
+    beat = threading.Event()
+    threading.Thread(target=_heartbeat, args=(run_id, beat), name="delivery-sync-heartbeat", daemon=True).start()
+    try:
+        window_days = (end - start).days + 1
+        done = len(finished)
+
+        def finish(result: dict):
+            nonlocal done
+            _checkpoint_symbol(run_id, result, limiter.rate)
+            done += 1
+            if progress:
+                progress(done, len(symbols), result)
+
+        # Plan: one task per missing chunk; symbols with nothing to fetch finish now
+        pending = {}
+        tasks = []
+        for symbol in symbols:
+            if symbol in finished:
+                continue
+            result = {"symbol": symbol, "status": "ok", "reason": None, "requests": 0, "errors": 0,
+                      "records": 0, "fetched_days": 0, "skipped_days": window_days}
+            unavailable = get_unavailable(symbol)
+            if unavailable is not None:
+                finish({**result, "status": "unavailable", "reason": unavailable["reason"]})
+                continue
+            ranges = missing_ranges(symbol, start, end)
+            chunks = [chunk for a, b in ranges for chunk in nse_chunks(a, b)]
+            if not chunks:
+                finish({**result, "status": "up_to_date"})
+                continue
+            result["fetched_days"] = sum((b - a).days + 1 for a, b in ranges)
+            result["skipped_days"] = window_days - result["fetched_days"]
+            pending[symbol] = {**result, "chunks": len(chunks), "error": None}
+            tasks += [(symbol, a, b) for a, b in chunks]
+
+        throttled = set()   # symbols NSE blocked / rate-limited: their other chunks are skipped
+
+        def fetch(symbol: str, chunk_start: date, chunk_end: date) -> tuple:
+            if symbol in throttled:
+                return False, 0, None
+            limiter.acquire()
+            try:
+                rows = fill_chunk(symbol, chunk_start, chunk_end, fetcher)
+            except DeliveryFetchError as e:
+                if e.reason in ("blocked", "rate_limited"):
+                    throttled.add(symbol)
+                    limiter.backoff(NSE_THROTTLED_BACKOFF)
+                else:
+                    limiter.backoff(NSE_ERROR_BACKOFF)
+                return True, 0, e
+            if rows:
+                limiter.succeeded()
+            elif (chunk_end - chunk_start).days + 1 >= NSE_EMPTY_MIN_DAYS:
+                limiter.backoff(NSE_EMPTY_BACKOFF)
+            return True, rows, None
+
+        logger.info(
+            f"Delivery sync run {run_id} ({'resumed' if resumed else trigger}): "
+            f"{len(symbols) - len(finished)} symbol(s), {len(tasks)} chunk(s) to fetch"
+        )
+        pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="delivery-sync")
+        try:
+            futures = {pool.submit(fetch, *task): task[0] for task in tasks}
+            for future in as_completed(futures):
+                state = pending[futures[future]]
+                try:
+                    requested, rows, error = future.result()
+                except Exception as e:
+                    requested, rows, error = True, 0, DeliveryFetchError("error", str(e))
+                state["requests"] += requested
+                state["records"] += rows
+                if error is not None:
+                    state["errors"] += 1
+                    state["error"] = error
+                state["chunks"] -= 1
+                if state["chunks"] == 0:
+                    error = state.pop("error")
+                    del state["chunks"]
+                    settle_unavailable(state["symbol"], state["requests"], state["records"], error)
+                    if error is not None and not state["records"]:
+                        state.update(status="failed", reason=error.reason)
+                    finish(state)
+        except BaseException:
+            # e.g. Ctrl-C in the sync script: keep the checkpoints, resume next time
+            pool.shutdown(wait=True, cancel_futures=True)
+            _close_run(run_id, "interrupted", started)
+            logger.warning(f"Delivery sync run {run_id} interrupted at {done}/{len(symbols)} symbols")
+            raise
+        pool.shutdown()
+        _close_run(run_id, "completed", started)
+
+        summary = get_delivery_sync_run(run_id)
+        logger.info(
+            f"Delivery sync run {run_id} completed: {summary['requests']} request(s), "
+            f"{summary['records']} rows, {summary['errors']} error(s), final rate {limiter.rate:.2f}/s"
+        )
+        return {**summary, "resumed": resumed}
+    finally:
+        beat.set()
+
+
+# ─── Status ──────────────────────────────────────────────────────────
+
+def get_delivery_sync_run(run_id: int) -> dict:
+    """One run's totals plus its per-symbol results."""
+    conn = get_connection()
+    run = dict(conn.execute("SELECT * FROM delivery_sync_runs WHERE id = ?", (run_id,)).fetchone())
+    results = {r["symbol"]: dict(r) for r in conn.execute(
+        "SELECT * FROM delivery_sync_symbols WHERE run_id = ? ORDER BY symbol", (run_id,)
+    )}
+    for r in results.values():
+        del r["run_id"], r["symbol"]
+    return {
+        "id": run["id"],
+        "status": run["status"],
+        "period_days": run["period_days"],
+        "symbols": run["total"],
+        "done": run["done"],
+        "requests": run["requests"],
+        "errors": run["errors"],
+        "records": run["records"],
+        "fetched_days": sum(r["fetched_days"] for r in results.values()),
+        "skipped_days": sum(r["skipped_days"] for r in results.values()),
+        "unavailable": sum(1 for r in results.values() if r["status"] == "unavailable"),
+        "rate": run["rate"],
+        "duration_ms": run["duration_ms"],
+        "results": results,
+    }
+
+
+def get_delivery_sync_status(limit: int = 10) -> dict:
+    """Most recent sync runs, newest first, with progress (done / total)."""
+    rows = get_connection().execute("""
+        SELECT id, trigger, status, period_days, start_date, total, done, requests, errors,
+               records, rate, owner_pid, owner_host, started_at, finished_at, duration_ms
+        FROM delivery_sync_runs ORDER BY id DESC LIMIT ?
+    """, (limit,)).fetchall()
+    return {"running": _run_lock.locked(), "runs": [dict(r) for r in rows]}
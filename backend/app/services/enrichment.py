@@ -0,0 +1,174 @@
+"""
+Background sector enrichment.
+
+Request handlers resolve sectors locally (instruments table + sector_map)
+and enqueue whatever is still missing here; a small pool of worker
+threads looks those up on Yahoo Finance.  The queue is deduplicated, so a
+symbol is never fetched twice at once, and every failure is persisted in
+sector_enrichment: transient errors back off exponentially, symbols Yahoo
+has no sector for are negatively cached for NEGATIVE_TTL_SECONDS.
+"""
+
+import json
+import logging
+import queue
+import random
+import threading
+import time
+
+from backend.app.services.db import get_connection, transaction, update_instrument_sectors
+
+logger = logging.getLogger("tunefolio.enrichment")
+
+ENRICH_WORKERS = 2                      # concurrent Yahoo lookups
+RETRY_BASE_SECONDS = 60                 # first retry after ~1 min
+RETRY_MAX_SECONDS = 6 * 3600            # backoff cap
+NEGATIVE_TTL_SECONDS = 7 * 24 * 3600    # re-check "no data" symbols weekly
+
+_queue: queue.Queue = queue.Queue()
+_queued: set = set()                    # pairs queued or in flight
+_lock = threading.Lock()
+_workers: list = []
+_stop = threading.Event()
+
+
+# ─── Enqueue ─────────────────────────────────────────────────────────
+
+def _blocked_pairs(pairs: list) -> set:
+    """Pairs still inside their backoff / negative-cache window."""
+    if not pairs:
+        return set()
+    rows = get_connection().execute("""
+        SELECT e.symbol, e.exchange
+        FROM json_each(?) j
+        JOIN sector_enrichment e
+          ON e.symbol = json_extract(j.value, '$[0]')
+         AND e.exchange = json_extract(j.value, '$[1]')
+        WHERE e.next_attempt_at > ?
+    """, (json.dumps(pairs), time.time())).fetchall()
+    return {(r["symbol"], r["exchange"]) for r in rows}
+
+
+def enqueue_enrichment(pairs) -> int:
+    """
+    Queue (symbol, exchange) pairs for background lookup.  Pairs already
+    queued, in flight, backing off or negatively cached are skipped.
+
+    Returns: number of pairs newly queued
+    """
+    pairs = list(dict.fromkeys(pairs))
+    blocked = _blocked_pairs(pairs)
+
+    added = 0
+    with _lock:
+        for pair in pairs:
+            if pair in _queued or pair in blocked:
+                continue
+            _queued.add(pair)
+            _queue.put(pair)
+            added += 1
+    return added
+
+
+# ─── Worker ──────────────────────────────────────────────────────────
+
+def _record_failure(symbol: str, exchange: str, error: Exception, unavailable: bool) -> None:
+    with transaction() as conn:
+        row = conn.execute(
+            "SELECT attempts FROM sector_enrichment WHERE symbol = ? AND exchange = ?",
+            (symbol, exchange),
+        ).fetchone()
+        attempts = (row["attempts"] if row else 0) + 1
+
+        if unavailable:
+            status, delay = "unavailable", NEGATIVE_TTL_SECONDS
+        else:
+            status = "retry"
+            delay = min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+            delay *= random.uniform(0.8, 1.2)
+
+        conn.execute("""
+            INSERT OR REPLACE INTO sector_enrichment
+                (symbol, exchange, status, attempts, last_error, next_attempt_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (symbol, exchange, status, attempts, str(error)[:500], time.time() + delay))
+
+
+def _enrich_one(symbol: str, exchange: str) -> None:
+    from backend.app.services.instruments import NoSectorData, fetch_sector_industry
+
+    try:
+        sector, industry = fetch_sector_industry(symbol, exchange)
+    except NoSectorData as e:
+        # Yahoo answered but has no sector for this symbol; anything else
+        # (HTTP errors, throttled or HTML pages that fail to parse) is retried
+        _record_failure(symbol, exchange, e, unavailable=True)
+        logger.info(f"No sector data for {symbol}; cached as unavailable")
+        return
+    except Exception as e:
+        _record_failure(symbol, exchange, e, unavailable=False)
+        logger.warning(f"Sector lookup failed for {symbol}: {e}")
+        return
+
+    with transaction() as conn:
+        update_instrument_sectors([(symbol, exchange, sector, industry)])
+        conn.execute(
+            "DELETE FROM sector_enrichment WHERE symbol = ? AND exchange = ?",
+            (symbol, exchange),
+        )
+    logger.info(f"Enriched sector for {symbol}: {sector}")
+
+
+def _worker_loop() -> None:
+    while not _stop.is_set():
+        try:
+            pair = _queue.get(timeout=1)
+        except queue.Empty:
+            continue
+        try:
+            _enrich_one(*pair)
+        except Exception as e:
+            logger.error(f"Enrichment worker error for {pair}: {e}", exc_info=True)
+        finally:
+            with _lock:
+                _queued.discard(pair)
+            _queue.task_done()
+
+
+def start_enrichment_worker(workers: int = ENRICH_WORKERS) -> None:
+    """Start the worker threads and re-queue retries that are already due."""
+    if any(t.is_alive() for t in _workers):
+        return
+    _stop.clear()
+    _workers.clear()
+    for i in range(workers):
+        t = threading.Thread(target=_worker_loop, name=f"sector-enrich-{i}", daemon=True)
+        t.start()
+        _workers.append(t)
+
+    due = get_connection().execute(
+        "SELECT symbol, exchange FROM sector_enrichment WHERE status = 'retry' AND next_attempt_at <= ?",
+        (time.time(),),
+    ).fetchall()
+    enqueue_enrichment((r["symbol"], r["exchange"]) for r in due)
+    logger.info(f"Sector enrichment worker started ({workers} threads, {len(due)} retries due)")
+
+
+def stop_enrichment_worker(timeout: float = 5.0) -> None:
+    _stop.set()
+    for t in _workers:
+        t.join(timeout)
+    _workers.clear()
+
+
+def get_enrichment_status() -> dict:
+    rows = get_connection().execute(
+        "SELECT status, COUNT(*) AS n FROM sector_enrichment GROUP BY status"
+    ).fetchall()
+    with _lock:
+        queued = len(_queued)
+    return {
+        "running": any(t.is_alive() for t in _workers),
+        "queued": queued,
+        **{r["status"]: r["n"] for r in rows},
+    }
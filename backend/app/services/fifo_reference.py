@@ -0,0 +1,131 @@
+"""
+Reference FIFO engines for checking the production ones.
+
+legacy_fifo is the original list-of-dicts engine (buy_queue.pop(0)) the
+lot ledger and the vectorized engine replaced; deque_fifo is the ledger's
+own replay without the database.  Both take trade dicts already in FIFO
+order (lot_ledger.TRADE_ORDER) for a single account.  Used by the
+equivalence tests and by scripts/benchmark.py.
+"""
+
+from collections import defaultdict, deque
+
+import numpy as np
+
+from backend.app.services.lot_ledger import _replay
+
+FIFO_WINDOWS = {
+    "all": (None, None),
+    "FY2019-20": ("2019-04-01", "2020-03-31"),
+    "FY2022-23": ("2022-04-01", "2023-03-31"),
+    "since-2024": ("2024-01-01", None),
+}
+
+
+def legacy_fifo(trades: list, windows: dict) -> dict:
+    """The original list-of-dicts engine (buy_queue.pop(0)), once per window."""
+    symbol_trades = defaultdict(list)
+    for t in trades:
+        symbol_trades[t["symbol"]].append(t)
+
+    results = {}
+    for label, (fy_start, fy_end) in windows.items():
+        total_rpnl = 0.0
+        total_sells = 0
+        by_symbol = {}
+        for symbol, rows in symbol_trades.items():
+            buy_queue = []
+            symbol_rpnl = 0.0
+            qty_sold = 0.0
+            for t in rows:
+                qty = t["quantity"]
+                price = t["price"]
+                if t["trade_type"] == "buy":
+                    buy_queue.append({"qty_remaining": qty, "price": price})
+                    continue
+                in_window = not ((fy_start and t["trade_date"] < fy_start) or
+                                 (fy_end and t["trade_date"] > fy_end))
+                remaining = qty
+                sell_rpnl = 0.0
+                while remaining > 0.0001 and buy_queue:
+                    oldest = buy_queue[0]
+                    match_qty = min(remaining, oldest["qty_remaining"])
+                    sell_rpnl += (price - oldest["price"]) * match_qty
+                    oldest["qty_remaining"] -= match_qty
+                    remaining -= match_qty
+                    if oldest["qty_remaining"] <= 0.0001:
+                        buy_queue.pop(0)
+                if in_window:
+                    symbol_rpnl += sell_rpnl
+                    qty_sold += qty
+                    total_sells += 1
+            if qty_sold > 0:
+                by_symbol[symbol] = {"realised_pnl": round(symbol_rpnl, 2), "qty_sold": round(qty_sold, 2)}
+                total_rpnl += symbol_rpnl
+        results[label] = {
+            "total_realised_pnl": round(total_rpnl, 2),
+            "by_symbol": by_symbol,
+            "total_symbols_sold": len(by_symbol),
+            "total_sells": total_sells,
+        }
+    return results
+
+
+def deque_fifo(trades: list, windows: dict) -> dict:
+    """The lot ledger's deque-of-__slots__ replay, aggregated per window."""
+    symbol_trades = defaultdict(list)
+    for t in trades:
+        symbol_trades[t["symbol"]].append(t)
+
+    sells = []
+    for symbol, rows in symbol_trades.items():
+        symbol_sells, _, _ = _replay("", symbol, rows, deque(), 0)
+        sells.extend(symbol_sells)
+
+    results = {}
+    for label, (start, end) in windows.items():
+        per_symbol = defaultdict(lambda: [0.0, 0.0])
+        total_sells = 0
+        for _, _, symbol, sell_date, qty, _, _, pnl in sells:
+            if (start and sell_date < start) or (end and sell_date > end):
+                continue
+            per_symbol[symbol][0] += pnl
+            per_symbol[symbol][1] += qty
+            total_sells += 1
+        by_symbol = {
+            s: {"realised_pnl": round(v[0], 2), "qty_sold": round(v[1], 2)}
+            for s, v in per_symbol.items() if v[1] > 0
+        }
+        results[label] = {
+            "total_realised_pnl": round(sum(v[0] for v in per_symbol.values() if v[1] > 0), 2),
+            "by_symbol": by_symbol,
+            "total_symbols_sold": len(by_symbol),
+            "total_sells": total_sells,
+        }
+    return results
+
+
+def trades_to_arrays(trades: list) -> dict:
+    """Trade dicts (already in FIFO order) as fifo_vectorized column arrays, single account."""
+    return {
+        "symbol": np.array([t["symbol"] for t in trades], dtype=object),
+        "trade_date": np.array([t["trade_date"] for t in trades], dtype="U10"),
+        "trade_type": np.array([t["trade_type"] for t in trades], dtype="U4"),
+        "quantity": np.array([t["quantity"] for t in trades], dtype=np.float64),
+        "price": np.array([t["price"] for t in trades], dtype=np.float64),
+    }
+
+
+def same_results(a: dict, b: dict, tolerance: float = 0.011) -> bool:
+    """Equal up to float summation order (sub-paisa differences after rounding)."""
+    for label in a:
+        x, y = a[label], b[label]
+        if x["total_sells"] != y["total_sells"] or x["by_symbol"].keys() != y["by_symbol"].keys():
+            return False
+        if abs(x["total_realised_pnl"] - y["total_realised_pnl"]) > tolerance:
+            return False
+        for symbol, v in x["by_symbol"].items():
+            w = y["by_symbol"][symbol]
+            if abs(v["realised_pnl"] - w["realised_pnl"]) > tolerance or v["qty_sold"] != w["qty_sold"]:
+                return False
+    return True
@@ -0,0 +1,166 @@
+"""
+Array-backed FIFO realised P&L engine.
+
+Computes the same figures as the lot ledger straight from the trades
+table, without per-lot Python objects.  Trades are loaded into NumPy
+columns sorted by (account, symbol, chronological order) and each
+account's symbol is matched with cumulative quantities:
+
+    B[j]  cumulative bought quantity up to row j
+    S[j]  cumulative sold quantity up to row j
+    M[j]  cumulative *matched* quantity  = S[j] + min(0, min_{k<=j}(B[k] - S[k]))
+
+FIFO always consumes a prefix of the buy stream, so the cost of the units
+matched by sell j is C(M[j]) - C(M[j-1]), where C(q) is the cost of the
+first q bought units (piecewise linear → np.interp).  Sell quantity with no
+earlier buys left to match realises nothing, exactly as in the ledger.
+
+The ledger drops lot and sell residuals at or below
+lot_ledger.QTY_EPSILON, which the cumulative form can't express.  With
+whole-share quantities no such residual can arise, so symbols with any
+fractional quantity are replayed lot by lot instead (_replay_pnl) and
+both engines give the same figures either way.
+"""
+
+from collections import deque
+
+import numpy as np
+
+from backend.app.services.db import get_connection
+from backend.app.services.lot_ledger import QTY_EPSILON, TRADE_ORDER
+
+
+def load_trade_arrays(user_id: str = None) -> dict:
+    """Read the trades table (or one account's rows) into column arrays, sorted for FIFO matching."""
+    account = "WHERE user_id = ?" if user_id is not None else ""
+    rows = get_connection().execute(f"""
+        SELECT user_id, symbol, trade_date, trade_type, quantity, price
+        FROM trades
+        {account}
+        ORDER BY user_id, symbol, {TRADE_ORDER}
+    """, (user_id,) if user_id is not None else ()).fetchall()
+
+    return {
+        "user_id": np.array([r[0] for r in rows], dtype=object),
+        "symbol": np.array([r[1] for r in rows], dtype=object),
+        "trade_date": np.array([r[2] for r in rows], dtype="U10"),
+        "trade_type": np.array([r[3] for r in rows], dtype="U4"),
+        "quantity": np.array([r[4] for r in rows], dtype=np.float64),
+        "price": np.array([r[5] for r in rows], dtype=np.float64),
+    }
+
+
+def fifo_sell_pnl(quantity, price, is_buy, is_sell, starts, ends) -> np.ndarray:
+    """
+    Realised P&L per row (0 for non-sell rows) for trades grouped into
+    contiguous per-account, per-symbol segments [starts[i], ends[i]).
+    """
+    pnl = np.zeros(len(quantity), dtype=np.float64)
+    fractional = quantity != np.floor(quantity)
+
+    for s, e in zip(starts, ends):
+        q = quantity[s:e]
+        p = price[s:e]
+        buy = is_buy[s:e]
+        sell = is_sell[s:e]
+
+        if fractional[s:e].any():
+            pnl[s:e] = _replay_pnl(q, p, buy, sell)
+            continue
+
+        bought = np.cumsum(np.where(buy, q, 0.0))
+        sold = np.cumsum(np.where(sell, q, 0.0))
+        matched = sold + np.minimum(np.minimum.accumulate(bought - sold), 0.0)
+        matched_prev = np.concatenate(([0.0], matched[:-1]))
+
+        buy_idx = np.flatnonzero(buy & (q > 0))
+        if len(buy_idx) == 0:
+            continue
+        cum_qty = np.concatenate(([0.0], bought[buy_idx]))
+        cum_cost = np.concatenate(([0.0], np.cumsum(q[buy_idx] * p[buy_idx])))
+        cost = np.interp(matched, cum_qty, cum_cost)
+        cost_prev = np.concatenate(([0.0], cost[:-1]))
+
+        pnl[s:e] = np.where(sell, p * (matched - matched_prev) - (cost - cost_prev), 0.0)
+
+    return pnl
+
+
+def _replay_pnl(quantity, price, is_buy, is_sell) -> np.ndarray:
+    """One symbol's per-row P&L, matched lot by lot with the ledger's epsilon rules."""
+    pnl = np.zeros(len(quantity), dtype=np.float64)
+    lots = deque()  # [qty_remaining, price]
+
+    for i in range(len(quantity)):
+        if is_buy[i]:
+            lots.append([quantity[i], price[i]])
+        elif is_sell[i]:
+            remaining = quantity[i]
+            while remaining > QTY_EPSILON and lots:
+                oldest = lots[0]
+                match_qty = min(remaining, oldest[0])
+                pnl[i] += (price[i] - oldest[1]) * match_qty
+                oldest[0] -= match_qty
+                remaining -= match_qty
+                if oldest[0] <= QTY_EPSILON:
+                    lots.popleft()
+
+    return pnl
+
+
+def compute_realised_pnl_windows_vectorized(windows: dict, arrays: dict = None) -> dict:
+    """
+    Same contract as trades.compute_realised_pnl_windows, computed from the
+    raw trades (or pre-loaded `arrays`) instead of the persisted ledger.
+    Arrays without a "user_id" column are treated as a single account.
+    """
+    arrays = arrays if arrays is not None else load_trade_arrays()
+    symbol = arrays["symbol"]
+    user_id = arrays.get("user_id")
+    n = len(symbol)
+
+    if n:
+        boundary = symbol[1:] != symbol[:-1]
+        if user_id is not None:
+            boundary |= user_id[1:] != user_id[:-1]
+        change = np.flatnonzero(boundary) + 1
+        starts = np.concatenate(([0], change))
+        ends = np.concatenate((change, [n]))
+    else:
+        starts = ends = np.array([], dtype=np.int64)
+    # Segments are per account; the figures are summed per symbol
+    names, codes = np.unique(symbol.astype(str), return_inverse=True)
+
+    is_buy = arrays["trade_type"] == "buy"
+    is_sell = arrays["trade_type"] == "sell"
+    quantity = arrays["quantity"]
+    pnl = fifo_sell_pnl(quantity, arrays["price"], is_buy, is_sell, starts, ends)
+
+    results = {}
+    for label, (start, end) in windows.items():
+        mask = is_sell.copy()
+        if start:
+            mask &= arrays["trade_date"] >= start
+        if end:
+            mask &= arrays["trade_date"] <= end
+
+        sym_pnl = np.bincount(codes[mask], weights=pnl[mask], minlength=len(names))
+        sym_qty = np.bincount(codes[mask], weights=quantity[mask], minlength=len(names))
+
+        by_symbol = {}
+        total = 0.0
+        for i in np.flatnonzero(sym_qty > 0):
+            by_symbol[names[i]] = {
+                "realised_pnl": round(float(sym_pnl[i]), 2),
+                "qty_sold": round(float(sym_qty[i]), 2),
+            }
+            total += float(sym_pnl[i])
+
+        results[label] = {
+            "total_realised_pnl": round(total, 2),
+            "by_symbol": by_symbol,
+            "total_symbols_sold": len(by_symbol),
+            "total_sells": int(mask.sum()),
+        }
+
+    return results
@@ -1,9 +1,9 @@
 import yfinance as yf
-from backend.app.services.db import (
-    get_connection,
-    get_instrument,
-    update_instrument_sector
-)
+from backend.app.services.db import get_instruments, update_instrument_sectors
+
+
+class NoSectorData(Exception):
+    """Yahoo answered, but has no sector / industry for the symbol."""
 
 
 def _yahoo_symbol(symbol: str, exchange: str) -> str:
@@ -27,46 +27,45 @@ def fetch_sector_industry(symbol: str, exchange: str) -> tuple[str, str]:
     industry = info.get("industry")
 
     if not sector or not industry:
-        raise ValueError(f"Sector data unavailable for {symbol}")
+        raise NoSectorData(f"Sector data unavailable for {symbol}")
 
     return sector, industry
 
 
-def enrich_instrument_if_missing(symbol: str, exchange: str):
+def resolve_sectors(pairs) -> dict:
     """
-    Fetch sector/industry only if missing in DB.
-    Falls back to sector_map, then Yahoo Finance. Never crashes the request.
+    Sector for each (symbol, exchange) pair, in a constant number of queries
+    and without network calls.
+
+    Reads all instruments in one batch, fills gaps from the hardcoded
+    sector map (persisted in one batch update) and hands anything still
+    missing to the background enrichment worker.
+
+    Returns: {(symbol, exchange): sector or None}; None means pending
     """
-    instrument = get_instrument(symbol, exchange)
-
-    if instrument and instrument["sector"] and instrument["industry"]:
-        return instrument
-
-    # Try hardcoded sector map first (fast, no network)
-    try:
-        from backend.app.services.sector_map import get_sector_info
-        info = get_sector_info(symbol)
-        if info.get("sector") and info["sector"] != "Unknown":
-            update_instrument_sector(
-                symbol=symbol,
-                exchange=exchange,
-                sector=info["sector"],
-                industry=info.get("industry", "Unknown")
-            )
-            return get_instrument(symbol, exchange)
-    except Exception:
-        pass
-
-    # Fall back to Yahoo Finance (slow, may fail)
-    try:
-        sector, industry = fetch_sector_industry(symbol, exchange)
-        update_instrument_sector(
-            symbol=symbol,
-            exchange=exchange,
-            sector=sector,
-            industry=industry
-        )
-        return get_instrument(symbol, exchange)
-    except Exception:
-        # If all enrichment fails, return instrument as-is (sector=None)
-        return instrument
+    from backend.app.services.enrichment import enqueue_enrichment
+    from backend.app.services.sector_map import get_sector_info
+
+    pairs = list(dict.fromkeys(pairs))
+    instruments = get_instruments(pairs)
+
+    sectors = {}
+    updates = []
+    missing = []
+    for symbol, exchange in pairs:
+        instrument = instruments.get((symbol, exchange))
+        sector = instrument["sector"] if instrument and instrument["sector"] else None
+
+        if not sector:
+            info = get_sector_info(symbol)
+            if info.get("sector") and info["sector"] != "Unknown":
+                sector = info["sector"]
+                updates.append((symbol, exchange, sector, info.get("industry", "Unknown")))
+            else:
+                missing.append((symbol, exchange))
+
+        sectors[(symbol, exchange)] = sector
+
+    update_instrument_sectors(updates)
+    enqueue_enrichment(missing)
+    return sectors
@@ -0,0 +1,211 @@
+"""
+Persistent state for the background scheduler.
+
+SQLiteJobStore keeps APScheduler jobs in the app database (scheduler_jobs)
+so schedules and their next run times survive restarts; runs missed while
+the process was down are then caught up or skipped according to each
+job's misfire_grace_time / coalesce.  It mirrors APScheduler's
+SQLAlchemyJobStore on the app's own connection handling, without the
+SQLAlchemy dependency.
+
+job_runs records every run (start, end, duration, outcome, result size)
+and every missed run, keeping the last JOB_RUNS_KEEP per job;
+get_job_duration_stats() / get_recent_job_failures() summarise it for the
+status endpoint.
+"""
+
+import json
+import logging
+import math
+import pickle
+import sqlite3
+
+from apscheduler.job import Job
+from apscheduler.jobstores.base import BaseJobStore, ConflictingIdError, JobLookupError
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+
+from backend.app.services.db import get_connection, transaction
+
+logger = logging.getLogger("tunefolio.job_store")
+
+JOB_STATS_WINDOW = 50   # most recent completed runs per job for p50/p95
+JOB_RUNS_KEEP = 500     # job_runs rows kept per job; older ones are pruned
+
+
+class SQLiteJobStore(BaseJobStore):
+    """APScheduler job store backed by the scheduler_jobs table."""
+
+    def __init__(self, pickle_protocol: int = pickle.HIGHEST_PROTOCOL):
+        super().__init__()
+        self.pickle_protocol = pickle_protocol
+
+    def lookup_job(self, job_id):
+        row = get_connection().execute(
+            "SELECT job_state FROM scheduler_jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return self._reconstitute_job(row["job_state"]) if row else None
+
+    def get_due_jobs(self, now):
+        return self._get_jobs("WHERE next_run_time <= ?", (datetime_to_utc_timestamp(now),))
+
+    def get_next_run_time(self):
+        row = get_connection().execute("""
+            SELECT next_run_time FROM scheduler_jobs
+            WHERE next_run_time IS NOT NULL
+            ORDER BY next_run_time LIMIT 1
+        """).fetchone()
+        return utc_timestamp_to_datetime(row["next_run_time"]) if row else None
+
+    def get_all_jobs(self):
+        jobs = self._get_jobs()
+        self._fix_paused_jobs_sorting(jobs)
+        return jobs
+
+    def add_job(self, job):
+        try:
+            with transaction() as conn:
+                conn.execute(
+                    "INSERT INTO scheduler_jobs (id, next_run_time, job_state) VALUES (?, ?, ?)",
+                    (job.id, datetime_to_utc_timestamp(job.next_run_time), self._dump(job)),
+                )
+        except sqlite3.IntegrityError:
+            raise ConflictingIdError(job.id)
+
+    def update_job(self, job):
+        with transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE scheduler_jobs SET next_run_time = ?, job_state = ? WHERE id = ?",
+                (datetime_to_utc_timestamp(job.next_run_time), self._dump(job), job.id),
+            )
+        if cursor.rowcount == 0:
+            raise JobLookupError(job.id)
+
+    def remove_job(self, job_id):
+        with transaction() as conn:
+            cursor = conn.execute("DELETE FROM scheduler_jobs WHERE id = ?", (job_id,))
+        if cursor.rowcount == 0:
+            raise JobLookupError(job_id)
+
+    def remove_all_jobs(self):
+        with transaction() as conn:
+            conn.execute("DELETE FROM scheduler_jobs")
+
+    def _dump(self, job) -> bytes:
+        return pickle.dumps(job.__getstate__(), self.pickle_protocol)
+
+    def _reconstitute_job(self, job_state):
+        job_state = pickle.loads(job_state)
+        job_state["jobstore"] = self
+        job = Job.__new__(Job)
+        job.__setstate__(job_state)
+        job._scheduler = self._scheduler
+        job._jobstore_alias = self._alias
+        return job
+
+    def _get_jobs(self, where: str = "", params: tuple = ()) -> list:
+        jobs = []
+        failed = []
+        rows = get_connection().execute(
+            f"SELECT id, job_state FROM scheduler_jobs {where} ORDER BY next_run_time", params
+        ).fetchall()
+        for row in rows:
+            try:
+                jobs.append(self._reconstitute_job(row["job_state"]))
+            except BaseException:
+                # e.g. the job's function was renamed or removed
+                self._logger.exception(f'Unable to restore job "{row["id"]}" -- removing it')
+                failed.append(row["id"])
+
+        if failed:
+            with transaction() as conn:
+                conn.executemany("DELETE FROM scheduler_jobs WHERE id = ?", [(i,) for i in failed])
+        return jobs
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__}>"
+
+
+# ─── Run History ─────────────────────────────────────────────────────
+
+def payload_size(result) -> int | None:
+    if result is None:
+        return None
+    try:
+        return len(json.dumps(result, default=str))
+    except (TypeError, ValueError):
+        return None
+
+
+def record_job_run(job_id: str, outcome: str, error: str = None, scheduled_at: str = None,
+                   started_at: str = None, finished_at: str = None,
+                   duration_ms: float = None, payload_bytes: int = None) -> None:
+    """
+    Append a job_runs row and prune the job's history to its last
+    JOB_RUNS_KEEP rows.  Never raises: history must not break a job.
+    """
+    try:
+        with transaction() as conn:
+            conn.execute("""
+                INSERT INTO job_runs (
+                    job_id, outcome, error, scheduled_at, started_at,
+                    finished_at, duration_ms, payload_bytes
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                job_id, outcome, error[:500] if error else None, scheduled_at,
+                started_at, finished_at, duration_ms, payload_bytes,
+            ))
+            # Both lookups walk idx_job_runs_job (job_id, id)
+            conn.execute("""
+                DELETE FROM job_runs
+                WHERE job_id = :job_id AND id <= (
+                    SELECT id FROM job_runs WHERE job_id = :job_id
+                    ORDER BY id DESC LIMIT 1 OFFSET :keep
+                )
+            """, {"job_id": job_id, "keep": JOB_RUNS_KEEP})
+    except Exception as e:
+        logger.error(f"Could not record run of {job_id}: {e}")
+
+
+def _percentile(sorted_values: list, p: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    return sorted_values[max(0, math.ceil(p * len(sorted_values)) - 1)]
+
+
+def get_job_duration_stats(window: int = JOB_STATS_WINDOW) -> dict:
+    """Per job: run count, p50/p95/max duration (ms) over its last `window` completed runs."""
+    rows = get_connection().execute("""
+        SELECT job_id, duration_ms FROM (
+            SELECT job_id, duration_ms,
+                   ROW_NUMBER() OVER (PARTITION BY job_id ORDER BY id DESC) AS rn
+            FROM job_runs
+            WHERE outcome != 'missed' AND duration_ms IS NOT NULL
+        )
+        WHERE rn <= ?
+    """, (window,)).fetchall()
+
+    durations = {}
+    for r in rows:
+        durations.setdefault(r["job_id"], []).append(r["duration_ms"])
+
+    stats = {}
+    for job_id, values in sorted(durations.items()):
+        values.sort()
+        stats[job_id] = {
+            "runs": len(values),
+            "p50_ms": round(_percentile(values, 0.50), 1),
+            "p95_ms": round(_percentile(values, 0.95), 1),
+            "max_ms": round(values[-1], 1),
+        }
+    return stats
+
+
+def get_recent_job_failures(limit: int = 10) -> list:
+    """The last `limit` runs that failed, raised or were missed, newest first."""
+    rows = get_connection().execute("""
+        SELECT job_id, outcome, error, scheduled_at, started_at, finished_at, duration_ms
+        FROM job_runs
+        WHERE outcome IN ('failed', 'error', 'missed')
+        ORDER BY id DESC
+        LIMIT ?
+    """, (limit,)).fetchall()
+    return [dict(r) for r in rows]
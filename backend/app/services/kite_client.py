@@ -0,0 +1,228 @@
+"""
+Shared HTTP clients for the Kite Connect API.
+
+One pooled requests.Session (keep-alive) serves background threads and
+the scheduler; async route handlers lease one of POOL_SIZE single-
+connection httpx.AsyncClients per call, with the same policy
+(akite_get / akite_post).  Every call gets a
+per-endpoint (connect, read) timeout and passes through a client-side
+token bucket sized to Kite's documented limit of 10 requests/second for
+non-quote endpoints.  Idempotent GETs are retried on connection errors,
+timeouts and 429/5xx responses with jittered exponential backoff; POSTs
+are never retried.  Sync and async calls draw from the same bucket.
+
+KITE_API_ROOT can point the client at a local stand-in server.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import asynccontextmanager
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("tunefolio.kite_client")
+
+KITE_API_ROOT = os.getenv("KITE_API_ROOT", "https://api.kite.trade")
+
+POOL_SIZE = 10
+RATE_LIMIT_PER_SEC = 10       # Kite: 10 req/s for everything except quote/historical
+RATE_LIMIT_BURST = 10
+
+DEFAULT_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+TIMEOUTS = {
+    "/portfolio/holdings": (3.05, 10),
+    "/user/margins/equity": (3.05, 10),
+    "/trades": (3.05, 15),
+    "/session/token": (3.05, 10),
+}
+
+MAX_RETRIES = 2               # extra attempts after the first, GETs only
+RETRY_BACKOFF_BASE = 0.25     # seconds; doubled per attempt, ±50% jitter
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Token bucket: `rate` tokens/second, up to `burst` banked."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token (possibly borrowing ahead); returns seconds to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self) -> None:
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+_async_clients: list = []
+_async_idle: asyncio.LifoQueue | None = None
+_bucket = TokenBucket(RATE_LIMIT_PER_SEC, RATE_LIMIT_BURST)
+
+
+def get_session() -> requests.Session:
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def close_session() -> None:
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+@asynccontextmanager
+async def lease_async_client():
+    """
+    Borrow a pooled async client for one request.
+
+    Each client holds a single keep-alive connection and the idle queue is
+    the pool: httpcore rescans every connection in a pool on each request
+    event, which at POOL_SIZE connections per client more than doubled the
+    CPU spent per request.  LIFO keeps the most recently used connections
+    warm.  Created on first use inside the running event loop.
+    """
+    global _async_idle
+    if _async_idle is None:
+        _async_idle = asyncio.LifoQueue()
+        ssl_context = httpx.create_ssl_context()  # CA bundle loaded once, not per client
+        for _ in range(POOL_SIZE):
+            client = httpx.AsyncClient(
+                verify=ssl_context,
+                limits=httpx.Limits(max_connections=1, max_keepalive_connections=1),
+            )
+            _async_clients.append(client)
+            _async_idle.put_nowait(client)
+    idle = _async_idle
+    client = await idle.get()
+    try:
+        yield client
+    finally:
+        idle.put_nowait(client)
+
+
+async def aclose_async_client() -> None:
+    global _async_idle
+    _async_idle = None
+    while _async_clients:
+        await _async_clients.pop().aclose()
+
+
+def _httpx_timeout(path: str) -> httpx.Timeout:
+    connect, read = TIMEOUTS.get(path, DEFAULT_TIMEOUT)
+    # Pool wait is bounded too, so a saturated pool fails instead of hanging
+    return httpx.Timeout(read, connect=connect, pool=read)
+
+
+def auth_headers(access_token: str, api_key: str = None) -> dict:
+    api_key = api_key or os.getenv("KITE_API_KEY")
+    return {"Authorization": f"token {api_key}:{access_token}", "X-Kite-Version": "3"}
+
+
+def _backoff(attempt: int) -> float:
+    return RETRY_BACKOFF_BASE * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+def kite_get(path: str, access_token: str, api_key: str = None, params: dict = None) -> requests.Response:
+    """
+    GET `path` (e.g. "/portfolio/holdings").  Returns the final Response;
+    raises requests.RequestException only if every attempt failed to connect.
+    """
+    url = f"{KITE_API_ROOT}{path}"
+    headers = auth_headers(access_token, api_key)
+    timeout = TIMEOUTS.get(path, DEFAULT_TIMEOUT)
+
+    for attempt in range(MAX_RETRIES + 1):
+        _bucket.acquire()
+        try:
+            response = get_session().get(url, headers=headers, params=params, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            logger.warning(f"GET {path} failed ({e.__class__.__name__}), retrying")
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                return response
+            logger.warning(f"GET {path} returned HTTP {response.status_code}, retrying")
+        time.sleep(_backoff(attempt))
+
+
+def kite_post(path: str, data: dict) -> requests.Response:
+    """POST form data to `path`.  Not retried (not idempotent)."""
+    _bucket.acquire()
+    return get_session().post(
+        f"{KITE_API_ROOT}{path}",
+        data=data,
+        headers={"X-Kite-Version": "3"},
+        timeout=TIMEOUTS.get(path, DEFAULT_TIMEOUT),
+    )
+
+
+# ─── Async ───────────────────────────────────────────────────────────
+
+async def akite_get(path: str, access_token: str, api_key: str = None, params: dict = None) -> httpx.Response:
+    """Async kite_get: same timeouts, rate limit and retry policy."""
+    url = f"{KITE_API_ROOT}{path}"
+    headers = auth_headers(access_token, api_key)
+    timeout = _httpx_timeout(path)
+
+    for attempt in range(MAX_RETRIES + 1):
+        await _bucket.acquire_async()
+        try:
+            async with lease_async_client() as client:
+                response = await client.get(url, headers=headers, params=params, timeout=timeout)
+        except httpx.TransportError as e:
+            if attempt == MAX_RETRIES:
+                raise
+            logger.warning(f"GET {path} failed ({e.__class__.__name__}), retrying")
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                return response
+            logger.warning(f"GET {path} returned HTTP {response.status_code}, retrying")
+        await asyncio.sleep(_backoff(attempt))
+
+
+async def akite_post(path: str, data: dict) -> httpx.Response:
+    """Async kite_post.  Not retried."""
+    await _bucket.acquire_async()
+    async with lease_async_client() as client:
+        return await client.post(
+            f"{KITE_API_ROOT}{path}",
+            data=data,
+            headers={"X-Kite-Version": "3"},
+            timeout=_httpx_timeout(path),
+        )
@@ -0,0 +1,254 @@
+"""
+Lot ledger: a persisted FIFO view of the trades table.
+
+Every trade is applied once, in chronological order per account and
+symbol: buys open lots, sells consume the account's oldest open lots and
+record one ledger_matches row per allocation.  New trades are applied on
+top of the stored open lots; a trade dated before the last one applied
+for its account and symbol (a back-dated tradebook import) triggers a
+rebuild of that account's symbol only.  Realised P&L for any date window
+is then an indexed aggregate over ledger_sells, summed across accounts.
+"""
+
+import logging
+from collections import defaultdict, deque
+
+from backend.app.services.db import bulk_insert, get_connection, transaction
+
+logger = logging.getLogger("tunefolio.lot_ledger")
+
+QTY_EPSILON = 0.0001  # residual quantities at or below this count as zero
+
+# Chronological order within an account's symbol; at identical timestamps
+# buys apply before sells, then insertion order.
+TRADE_ORDER = "trade_date, COALESCE(order_execution_time, ''), trade_type, id"
+
+_TRADE_COLUMNS_SQL = """
+    SELECT id, user_id, symbol, trade_date, COALESCE(order_execution_time, '') AS exec_time,
+           trade_type, quantity, price
+    FROM trades
+"""
+
+LOT_COLUMNS = ["buy_trade_id", "user_id", "symbol", "seq", "trade_date", "qty_remaining", "price"]
+SELL_COLUMNS = [
+    "sell_trade_id", "user_id", "symbol", "sell_date", "quantity", "matched_qty", "price", "realised_pnl",
+]
+MATCH_COLUMNS = [
+    "sell_trade_id", "buy_trade_id", "user_id", "symbol", "sell_date", "buy_date",
+    "quantity", "buy_price", "sell_price", "realised_pnl",
+]
+
+
+class _Lot:
+    __slots__ = ("trade_id", "seq", "trade_date", "qty_remaining", "price")
+
+    def __init__(self, trade_id, seq, trade_date, qty_remaining, price):
+        self.trade_id = trade_id
+        self.seq = seq
+        self.trade_date = trade_date
+        self.qty_remaining = qty_remaining
+        self.price = price
+
+
+def _chrono_key(trade) -> tuple:
+    return (trade["trade_date"], trade["exec_time"], trade["trade_type"], trade["id"])
+
+
+# ─── FIFO Replay ─────────────────────────────────────────────────────
+
+def _replay(user_id: str, symbol: str, trades: list, lots: deque, next_seq: int) -> tuple:
+    """
+    Apply chronologically ordered trades to `lots` (mutated in place).
+
+    Returns: (sell_rows, match_rows, next_seq)
+    """
+    sells = []
+    matches = []
+
+    for t in trades:
+        qty = float(t["quantity"])
+        price = float(t["price"])
+
+        if t["trade_type"] == "buy":
+            lots.append(_Lot(t["id"], next_seq, t["trade_date"], qty, price))
+            next_seq += 1
+
+        elif t["trade_type"] == "sell":
+            sell_qty_remaining = qty
+            matched_qty = 0.0
+            sell_rpnl = 0.0
+
+            while sell_qty_remaining > QTY_EPSILON and lots:
+                oldest = lots[0]
+                match_qty = min(sell_qty_remaining, oldest.qty_remaining)
+                pnl = (price - oldest.price) * match_qty
+
+                matches.append((
+                    t["id"], oldest.trade_id, user_id, symbol, t["trade_date"], oldest.trade_date,
+                    match_qty, oldest.price, price, pnl,
+                ))
+                sell_rpnl += pnl
+                matched_qty += match_qty
+
+                oldest.qty_remaining -= match_qty
+                sell_qty_remaining -= match_qty
+
+                if oldest.qty_remaining <= QTY_EPSILON:
+                    lots.popleft()
+
+            # Unmatched quantity (no earlier buys on record) realises nothing
+            sells.append((t["id"], user_id, symbol, t["trade_date"], qty, matched_qty, price, sell_rpnl))
+
+    return sells, matches, next_seq
+
+
+def _apply(conn, user_id: str, symbol: str, trades: list, state) -> None:
+    """Replay `trades` on top of the account's stored open lots for the symbol and persist."""
+    lots = deque(
+        _Lot(r["buy_trade_id"], r["seq"], r["trade_date"], r["qty_remaining"], r["price"])
+        for r in conn.execute("""
+            SELECT buy_trade_id, seq, trade_date, qty_remaining, price
+            FROM ledger_lots WHERE user_id = ? AND symbol = ? ORDER BY seq
+        """, (user_id, symbol))
+    )
+    next_seq = state["next_seq"] if state else 0
+    max_trade_id = state["max_trade_id"] if state else 0
+
+    sells, matches, next_seq = _replay(user_id, symbol, trades, lots, next_seq)
+
+    conn.execute("DELETE FROM ledger_lots WHERE user_id = ? AND symbol = ?", (user_id, symbol))
+    bulk_insert("ledger_lots", LOT_COLUMNS, (
+        (lot.trade_id, user_id, symbol, lot.seq, lot.trade_date, lot.qty_remaining, lot.price)
+        for lot in lots
+    ))
+    bulk_insert("ledger_sells", SELL_COLUMNS, sells, conflict="REPLACE")
+    bulk_insert("ledger_matches", MATCH_COLUMNS, matches, conflict="REPLACE")
+
+    last = trades[-1]
+    conn.execute("""
+        INSERT OR REPLACE INTO ledger_state (
+            user_id, symbol, last_trade_date, last_exec_time, last_trade_type,
+            last_trade_id, max_trade_id, next_seq, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    """, (
+        user_id, symbol, last["trade_date"], last["exec_time"], last["trade_type"], last["id"],
+        max(max_trade_id, max(t["id"] for t in trades)), next_seq,
+    ))
+
+
+def _clear_symbol(conn, user_id: str, symbol: str) -> None:
+    for table in ("ledger_lots", "ledger_sells", "ledger_matches", "ledger_state"):
+        conn.execute(f"DELETE FROM {table} WHERE user_id = ? AND symbol = ?", (user_id, symbol))
+
+
+def _rebuild_symbol(conn, user_id: str, symbol: str) -> None:
+    _clear_symbol(conn, user_id, symbol)
+    trades = conn.execute(
+        f"{_TRADE_COLUMNS_SQL} WHERE user_id = ? AND symbol = ? ORDER BY {TRADE_ORDER}", (user_id, symbol)
+    ).fetchall()
+    if trades:
+        _apply(conn, user_id, symbol, trades, None)
+
+
+# ─── Public API ──────────────────────────────────────────────────────
+
+def _watermark(conn) -> int:
+    """Highest trades.id already applied to the ledger."""
+    return conn.execute("SELECT COALESCE(MAX(max_trade_id), 0) FROM ledger_state").fetchone()[0]
+
+
+def is_ledger_stale() -> bool:
+    conn = get_connection()
+    latest = conn.execute("SELECT COALESCE(MAX(id), 0) FROM trades").fetchone()[0]
+    return latest > _watermark(conn)
+
+
+def refresh_ledger() -> dict:
+    """
+    Apply trades inserted since the last refresh.  Cheap no-op when the
+    ledger is current, so read paths call it unconditionally.
+
+    Returns: {"trades_applied": int, "symbols_updated": int, "symbols_rebuilt": int}
+    """
+    summary = {"trades_applied": 0, "symbols_updated": 0, "symbols_rebuilt": 0}
+    if not is_ledger_stale():
+        return summary
+
+    with transaction() as conn:
+        new_trades = conn.execute(
+            f"{_TRADE_COLUMNS_SQL} WHERE id > ? ORDER BY user_id, symbol, {TRADE_ORDER}",
+            (_watermark(conn),),
+        ).fetchall()
+
+        by_symbol = defaultdict(list)
+        for t in new_trades:
+            by_symbol[t["user_id"], t["symbol"]].append(t)
+
+        for (user_id, symbol), trades in by_symbol.items():
+            state = conn.execute(
+                "SELECT * FROM ledger_state WHERE user_id = ? AND symbol = ?", (user_id, symbol)
+            ).fetchone()
+            last_key = (
+                (state["last_trade_date"], state["last_exec_time"],
+                 state["last_trade_type"], state["last_trade_id"])
+                if state else None
+            )
+
+            if last_key and _chrono_key(trades[0]) < last_key:
+                # Back-dated trade: the stored lots are no longer a valid prefix
+                _rebuild_symbol(conn, user_id, symbol)
+                summary["symbols_rebuilt"] += 1
+            else:
+                _apply(conn, user_id, symbol, trades, state)
+                summary["symbols_updated"] += 1
+
+        summary["trades_applied"] = len(new_trades)
+
+    logger.info(f"Lot ledger refreshed: {summary}")
+    return summary
+
+
+def rebuild_ledger() -> dict:
+    """Drop and rebuild the whole ledger from the trades table."""
+    with transaction() as conn:
+        for table in ("ledger_lots", "ledger_sells", "ledger_matches", "ledger_state"):
+            conn.execute(f"DELETE FROM {table}")
+        return refresh_ledger()
+
+
+def get_realised_by_window(windows: dict, user_id: str = None) -> list:
+    """
+    Aggregate ledger_sells for several sell-date windows in one query.
+
+    `windows` maps label → (start, end), inclusive ISO dates; either bound
+    may be None.  Windows may overlap.  Rows: label, symbol, realised_pnl,
+    qty_sold, sells — for `user_id`'s sells, or summed over every account
+    when it is None; ordered by label then symbol.
+    """
+    refresh_ledger()
+    if not windows:
+        return []
+
+    values = ", ".join("(?, ?, ?)" for _ in windows)
+    params = []
+    for label, (start, end) in windows.items():
+        params.extend([label, start or "0000-00-00", end or "9999-99-99"])
+    account = ""
+    if user_id is not None:
+        account = "WHERE s.user_id = ?"
+        params.append(user_id)
+
+    return get_connection().execute(f"""
+        WITH windows (label, start_date, end_date) AS (VALUES {values})
+        SELECT w.label AS label,
+               s.symbol AS symbol,
+               SUM(s.realised_pnl) AS realised_pnl,
+               SUM(s.quantity) AS qty_sold,
+               COUNT(*) AS sells
+        FROM windows w
+        JOIN ledger_sells s
+          ON s.sell_date >= w.start_date AND s.sell_date <= w.end_date
+        {account}
+        GROUP BY w.label, s.symbol
+        ORDER BY w.label, s.symbol
+    """, params).fetchall()
@@ -1,23 +1,171 @@
 import logging
+import time
+from datetime import datetime
+from functools import wraps
+
 import pytz
+from apscheduler.events import EVENT_JOB_MISSED
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 
+from backend.app.services.job_store import SQLiteJobStore, payload_size, record_job_run
+
 logger = logging.getLogger("tunefolio.scheduler")
 
 IST = pytz.timezone("Asia/Kolkata")
 
 _scheduler: BackgroundScheduler | None = None
 
-
+# Jobs live in SQLite (job_store.py), so a run missed while the process was
+# down is still due on restart: it runs if it is no later than its
+# misfire_grace_time, otherwise it is skipped (and logged in job_runs).
+# coalesce=True collapses several missed runs into one.
+TRADE_SYNC_GRACE_SECONDS = 4 * 3600          # a late sync is still worth running
+SNAPSHOT_SOD_GRACE_SECONDS = 40 * 60         # 8:35 → 9:15, before the open
+SNAPSHOT_EOD_GRACE_SECONDS = 7 * 3600        # 16:35 → 23:35
+
+
+def _tracked(fn):
+    """
+    Record every run of a scheduled job in job_runs (start, end, duration,
+    outcome, result size) and never let an exception reach APScheduler.
+    The wrapped function takes the job id as its first argument.
+    """
+    @wraps(fn)
+    def run(job_id: str, *args):
+        started_at = datetime.now(IST).isoformat()
+        started = time.perf_counter()
+        result, outcome, error = None, "ok", None
+        try:
+            result = fn(*args)
+            if isinstance(result, dict) and result.get("status") in ("failed", "error"):
+                outcome, error = "failed", result.get("reason") or result.get("error")
+        except Exception as e:
+            outcome, error = "error", str(e)
+            logger.error(f"Scheduled job {job_id} failed: {e}", exc_info=True)
+
+        record_job_run(
+            job_id, outcome, error,
+            started_at=started_at,
+            finished_at=datetime.now(IST).isoformat(),
+            duration_ms=round((time.perf_counter() - started) * 1000, 1),
+            payload_bytes=payload_size(result),
+        )
+    return run
+
+
+@_tracked
 def _run_trade_sync():
-    """Wrapper that catches all exceptions so APScheduler never kills the job."""
-    try:
-        from backend.app.services.trade_sync import sync_trades_from_kite
-        result = sync_trades_from_kite()
-        logger.info(f"Scheduled trade sync result: {result}")
-    except Exception as e:
-        logger.error(f"Scheduled trade sync failed: {e}", exc_info=True)
+    from backend.app.services.trade_sync import sync_all_accounts
+    result = sync_all_accounts(trigger="scheduled")
+    logger.info(f"Scheduled trade sync run {result['id']}: {result['status']}")
+    return result
+
+
+@_tracked
+def _run_snapshot(snapshot_type: str, trigger: str = "scheduled"):
+    from backend.app.services.snapshots import capture_holdings_snapshots
+    return capture_holdings_snapshots(snapshot_type, trigger=trigger)
+
+
+def _on_job_missed(event):
+    logger.warning(f"Scheduled job {event.job_id} missed its {event.scheduled_run_time} run")
+    record_job_run(event.job_id, "missed", scheduled_at=event.scheduled_run_time.isoformat())
+
+
+# ─── Job Definitions ─────────────────────────────────────────────────
+
+def _job_specs() -> list:
+    return [
+        {
+            "id": "trade_sync_morning",
+            "name": "Trade sync (8:30 AM IST)",
+            "func": _run_trade_sync,
+            "args": [],
+            "trigger": CronTrigger(hour=8, minute=30, day_of_week="mon-fri", timezone=IST),
+            "misfire_grace_time": TRADE_SYNC_GRACE_SECONDS,
+        },
+        {
+            "id": "trade_sync_evening",
+            "name": "Trade sync (6:00 PM IST)",
+            "func": _run_trade_sync,
+            "args": [],
+            "trigger": CronTrigger(hour=18, minute=0, day_of_week="mon-fri", timezone=IST),
+            "misfire_grace_time": TRADE_SYNC_GRACE_SECONDS,
+        },
+        # Holdings snapshots, independent of user traffic
+        {
+            "id": "snapshot_sod",
+            "name": "Holdings snapshot SOD (8:35 AM IST)",
+            "func": _run_snapshot,
+            "args": ["SOD"],
+            "trigger": CronTrigger(hour=8, minute=35, day_of_week="mon-fri", timezone=IST),
+            "misfire_grace_time": SNAPSHOT_SOD_GRACE_SECONDS,
+        },
+        {
+            "id": "snapshot_eod",
+            "name": "Holdings snapshot EOD (4:35 PM IST)",
+            "func": _run_snapshot,
+            "args": ["EOD"],
+            "trigger": CronTrigger(hour=16, minute=35, day_of_week="mon-fri", timezone=IST),
+            "misfire_grace_time": SNAPSHOT_EOD_GRACE_SECONDS,
+        },
+    ]
+
+
+def _ensure_job(spec: dict) -> bool:
+    """
+    Keep a stored job whose definition is unchanged, so its pending (possibly
+    missed) next_run_time survives the restart; otherwise (re)create it.
+
+    Returns: True if the job was newly created
+    """
+    args = [spec["id"], *spec["args"]]
+    stored = _scheduler.get_job(spec["id"])
+    if (
+        stored is not None
+        and stored.func is spec["func"]
+        and list(stored.args) == args
+        and str(stored.trigger) == str(spec["trigger"])
+        and stored.misfire_grace_time == spec["misfire_grace_time"]
+        and stored.name == spec["name"]
+    ):
+        return False
+
+    _scheduler.add_job(
+        spec["func"],
+        trigger=spec["trigger"],
+        args=args,
+        id=spec["id"],
+        name=spec["name"],
+        misfire_grace_time=spec["misfire_grace_time"],
+        coalesce=True,
+        max_instances=1,
+        replace_existing=True,
+    )
+    return True
+
+
+def _catch_up_snapshots(snapshot_types: list):
+    """
+    Run a snapshot now if its window is open and today's has not succeeded.
+    Only needed for jobs with no stored state (fresh database or changed
+    schedule); stored jobs catch up through their misfire policy.
+    """
+    from backend.app.services.snapshots import snapshot_captured, snapshot_window_open
+
+    now = datetime.now(IST)
+    for snapshot_type in snapshot_types:
+        if snapshot_window_open(snapshot_type, now) and not snapshot_captured(snapshot_type, now.date().isoformat()):
+            job_id = f"snapshot_{snapshot_type.lower()}_catch_up"
+            _scheduler.add_job(
+                _run_snapshot,
+                args=[job_id, snapshot_type, "catch_up"],
+                id=job_id,
+                name=f"{snapshot_type} snapshot catch-up",
+                replace_existing=True,
+            )
+            logger.info(f"Queued {snapshot_type} snapshot catch-up")
 
 
 def start_scheduler():
@@ -27,28 +175,29 @@ def start_scheduler():
         logger.warning("Scheduler already running, skipping start")
         return
 
-    _scheduler = BackgroundScheduler(timezone=IST)
+    _scheduler = BackgroundScheduler(timezone=IST, jobstores={"default": SQLiteJobStore()})
+    _scheduler.add_listener(_on_job_missed, EVENT_JOB_MISSED)
 
-    # 8:30 AM IST, Monday-Friday
-    _scheduler.add_job(
-        _run_trade_sync,
-        trigger=CronTrigger(hour=8, minute=30, day_of_week="mon-fri", timezone=IST),
-        id="trade_sync_morning",
-        name="Trade sync (8:30 AM IST)",
-        replace_existing=True,
-    )
+    # Paused until the stored jobs are reconciled, so nothing fires early
+    _scheduler.start(paused=True)
 
-    # 6:00 PM IST, Monday-Friday
-    _scheduler.add_job(
-        _run_trade_sync,
-        trigger=CronTrigger(hour=18, minute=0, day_of_week="mon-fri", timezone=IST),
-        id="trade_sync_evening",
-        name="Trade sync (6:00 PM IST)",
-        replace_existing=True,
-    )
+    specs = _job_specs()
+    created = {spec["id"] for spec in specs if _ensure_job(spec)}
 
-    _scheduler.start()
-    logger.info("Trade sync scheduler started (8:30 AM + 6:00 PM IST, Mon-Fri)")
+    # Drop stored jobs that are no longer defined (one-off catch-ups excepted)
+    known = {spec["id"] for spec in specs}
+    for job in _scheduler.get_jobs():
+        if job.id not in known and not job.id.endswith("_catch_up"):
+            job.remove()
+            logger.info(f"Removed obsolete scheduled job {job.id}")
+
+    _catch_up_snapshots([t for t in ("SOD", "EOD") if f"snapshot_{t.lower()}" in created])
+
+    _scheduler.resume()
+    logger.info(
+        f"Scheduler started (trade sync 8:30 AM + 6:00 PM, snapshots 8:35 AM + 4:35 PM IST, Mon-Fri; "
+        f"{len(specs) - len(created)} job(s) restored from the job store)"
+    )
 
 
 def stop_scheduler():
@@ -70,6 +219,7 @@ def get_scheduler_status() -> dict:
             "id": job.id,
             "name": job.name,
             "next_run": job.next_run_time.isoformat() if job.next_run_time else None,
+            "misfire_grace_seconds": job.misfire_grace_time,
         })
 
     return {"running": True, "jobs": jobs}
@@ -0,0 +1,339 @@
+"""
+Scheduled SOD/EOD holdings snapshots, persisted through a write-behind queue.
+
+The scheduler calls capture_holdings_snapshots() once per window.  It
+fetches holdings for every active Zerodha account concurrently (latest
+session per user) and hands the snapshots to the write-behind queue: a
+single writer thread drains it and persists up to MAX_BATCH snapshots per
+transaction (db.write_holdings_snapshots).  Snapshots are deduplicated in
+memory per (day, SOD/EOD, account) — the first one of a window wins,
+exactly as the DB-side check does.  Every run lands in snapshot_runs with
+its duration and row counts.  Request handlers never write snapshots.
+
+Durability: a capture returns as soon as its snapshots are queued; the
+writer records the run once they are committed (or have failed), so a
+run recorded as "ok" is on disk.  stop_snapshot_writer() (app shutdown)
+writes out anything still queued.  If the process dies with snapshots
+queued, they are lost, but their run was never recorded, so the startup
+catch-up captures the window again while it is still open.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from datetime import time as dtime
+
+from backend.app.services.db import IST, get_active_accounts, get_connection, transaction, write_holdings_snapshots
+
+logger = logging.getLogger("tunefolio.snapshots")
+
+# IST windows in which a snapshot of each type is still meaningful
+SNAPSHOT_WINDOWS = {
+    "SOD": (dtime(8, 30), dtime(9, 15)),        # before the market opens
+    "EOD": (dtime(16, 30), dtime(23, 59, 59)),  # after close, prices settled
+}
+FETCH_WORKERS = 4                               # concurrent Kite holdings calls
+MAX_BATCH = 64                                  # snapshots per transaction
+
+_queue: queue.Queue = queue.Queue()
+_seen: set = set()                      # (day, type, user_id) queued or written by this process
+_lock = threading.Lock()
+_writer: threading.Thread | None = None
+_stop = threading.Event()
+_stats = {"enqueued": 0, "deduped": 0, "written": 0, "batches": 0, "errors": 0}
+
+
+# ─── Write-behind queue ──────────────────────────────────────────────
+
+class _Ticket:
+    """Outcome of one enqueue call, filled in by the writer as its snapshots land."""
+
+    def __init__(self, pending: int, on_done=None):
+        self.pending = pending
+        self.written = {"snapshots": 0, "rows": 0}
+        self.errors = []
+        self.on_done = on_done
+        self.done = threading.Event()
+
+    def _settle(self, written: dict = None, error: Exception = None) -> bool:
+        """One snapshot written (or failed); True once none are pending.  Call with _lock held."""
+        if error is not None:
+            self.errors.append(str(error))
+        else:
+            self.written["snapshots"] += written["snapshots"]
+            self.written["rows"] += written["rows"]
+        self.pending -= 1
+        return not self.pending
+
+    def _complete(self) -> None:
+        """Run the completion callback, then set `done`.  Call without _lock."""
+        try:
+            if self.on_done is not None:
+                self.on_done(self)
+        except Exception as e:
+            logger.error(f"Snapshot completion callback failed: {e}", exc_info=True)
+        finally:
+            self.done.set()
+
+
+def enqueue_holdings_snapshots(snapshots, on_done=None) -> _Ticket:
+    """
+    Queue (snapshot_date, snapshot_type, snapshot_at, user_id, holdings)
+    tuples for the writer.  A (day, type, account) already queued or
+    written by this process is skipped.  Never touches the DB.
+
+    Returns: a ticket whose `on_done(ticket)` runs (on the writer thread,
+    or here if nothing was queued) and whose `done` event is then set once
+    every snapshot queued by this call is committed or has failed
+    """
+    fresh = []
+    with _lock:
+        for snapshot in snapshots:
+            key = snapshot[:2] + snapshot[3:4]
+            if key in _seen:
+                _stats["deduped"] += 1
+                continue
+            # Only today's windows can still be hit; drop older keys
+            _seen.difference_update([k for k in _seen if k[0] < key[0]])
+            _seen.add(key)
+            fresh.append(snapshot)
+        _stats["enqueued"] += len(fresh)
+
+    ticket = _Ticket(len(fresh), on_done)
+    if not fresh:
+        ticket._complete()
+        return ticket
+    for snapshot in fresh:
+        _queue.put((snapshot, ticket))
+    _ensure_writer()
+    return ticket
+
+
+def _drain(first) -> list:
+    batch = [first]
+    while len(batch) < MAX_BATCH:
+        try:
+            batch.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+
+def _write(batch: list) -> None:
+    completed = []
+    try:
+        with transaction():
+            results = [write_holdings_snapshots([snapshot]) for snapshot, _ in batch]
+    except Exception as e:
+        logger.error(f"Snapshot write failed ({len(batch)} queued): {e}", exc_info=True)
+        with _lock:
+            _stats["errors"] += 1
+            for snapshot, ticket in batch:
+                # Let a later capture in the same window try again
+                _seen.discard(snapshot[:2] + snapshot[3:4])
+                if ticket._settle(error=e):
+                    completed.append(ticket)
+    else:
+        with _lock:
+            _stats["written"] += sum(r["snapshots"] for r in results)
+            _stats["batches"] += 1
+            for (_, ticket), written in zip(batch, results):
+                if ticket._settle(written):
+                    completed.append(ticket)
+    finally:
+        # Before task_done, so flush_snapshots() also waits for the callbacks
+        for ticket in completed:
+            ticket._complete()
+        for _ in batch:
+            _queue.task_done()
+
+
+def _writer_loop() -> None:
+    while not _stop.is_set():
+        try:
+            first = _queue.get(timeout=1)
+        except queue.Empty:
+            continue
+        _write(_drain(first))
+
+
+def _ensure_writer() -> None:
+    global _writer
+    with _lock:
+        if _writer is None or not _writer.is_alive():
+            _stop.clear()
+            _writer = threading.Thread(target=_writer_loop, name="snapshot-writer", daemon=True)
+            _writer.start()
+
+
+def start_snapshot_writer() -> None:
+    _ensure_writer()
+    logger.info("Snapshot writer started")
+
+
+def flush_snapshots() -> None:
+    """Block until everything queued so far has been written and its runs recorded."""
+    _queue.join()
+
+
+def stop_snapshot_writer(timeout: float = 5.0) -> None:
+    """Stop the writer and write out anything still queued."""
+    global _writer
+    _stop.set()
+    if _writer is not None:
+        _writer.join(timeout)
+        _writer = None
+
+    pending = []
+    while True:
+        try:
+            pending.append(_queue.get_nowait())
+        except queue.Empty:
+            break
+    if pending:
+        _write(pending)
+        logger.info(f"Flushed {len(pending)} queued snapshot(s) on shutdown")
+
+
+def get_snapshot_writer_status() -> dict:
+    with _lock:
+        return {
+            "running": _writer is not None and _writer.is_alive(),
+            "queued": _queue.qsize(),
+            **_stats,
+        }
+
+
+# ─── Scheduled capture ───────────────────────────────────────────────
+
+def snapshot_window_open(snapshot_type: str, now_ist: datetime = None) -> bool:
+    now_ist = now_ist or datetime.now(IST)
+    start, end = SNAPSHOT_WINDOWS[snapshot_type]
+    return now_ist.weekday() < 5 and start <= now_ist.time() <= end
+
+
+def snapshot_captured(snapshot_type: str, snapshot_date: str) -> bool:
+    """True if a run for this day/type already succeeded for every account (manual runs cover one)."""
+    return get_connection().execute("""
+        SELECT 1 FROM snapshot_runs
+        WHERE snapshot_date = ? AND snapshot_type = ? AND status = 'ok' AND trigger != 'manual'
+        LIMIT 1
+    """, (snapshot_date, snapshot_type)).fetchone() is not None
+
+
+def _fetch_all(accounts: list) -> tuple:
+    """Holdings per user_id, fetched concurrently.  Returns (holdings, errors)."""
+    from backend.app.services.zerodha_holdings import fetch_holdings_for_token
+
+    holdings, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(accounts)),
+                            thread_name_prefix="snapshot-fetch") as pool:
+        futures = {pool.submit(fetch_holdings_for_token, a["access_token"]): a for a in accounts}
+        for future in as_completed(futures):
+            user_id = futures[future]["user_id"]
+            try:
+                holdings[user_id] = future.result()
+            except Exception as e:
+                errors[user_id] = str(getattr(e, "detail", e))
+    return holdings, errors
+
+
+def _record_run(run: dict) -> None:
+    with transaction() as conn:
+        conn.execute("""
+            INSERT INTO snapshot_runs (
+                snapshot_date, snapshot_type, trigger, status, accounts, accounts_failed,
+                snapshots_written, rows_written, duration_ms, error, started_at, finished_at
+            ) VALUES (
+                :snapshot_date, :snapshot_type, :trigger, :status, :accounts, :accounts_failed,
+                :snapshots_written, :rows_written, :duration_ms, :error, :started_at, :finished_at
+            )
+        """, run)
+
+
+def _close_run(run: dict, errors: dict, started: float, ticket: _Ticket = None) -> None:
+    """Fill in a capture's write results and record it (the writer's completion callback)."""
+    written = ticket.written if ticket else {"snapshots": 0, "rows": 0}
+    write_error = ticket.errors[0] if ticket and ticket.errors else None
+    if write_error:
+        logger.error(f"{run['snapshot_type']} snapshot write failed: {write_error}")
+
+    if not run["accounts"]:
+        status = "skipped"
+    elif write_error or ticket is None:
+        status = "failed"
+    elif errors:
+        status = "partial"
+    else:
+        status = "ok"
+
+    run.update(
+        status=status,
+        snapshots_written=written["snapshots"],
+        rows_written=written["rows"],
+        duration_ms=round((time.perf_counter() - started) * 1000, 1),
+        error=write_error or ("; ".join(f"{u}: {e}" for u, e in errors.items())[:500] or None),
+        finished_at=datetime.now(IST).isoformat(),
+    )
+    _record_run(run)
+    logger.info(
+        f"{run['snapshot_type']} snapshot ({run['trigger']}): {status}, {run['snapshots_written']}/"
+        f"{run['accounts']} accounts, {run['rows_written']} rows in {run['duration_ms']}ms"
+    )
+
+
+def capture_holdings_snapshots(snapshot_type: str, trigger: str = "scheduled",
+                               now_ist: datetime = None, user_id: str = None) -> dict:
+    """
+    Snapshot holdings for every active account (or only `user_id`'s) and
+    hand them to the writer, which records the run once they are
+    committed.  Accounts already snapshotted for this day/type are
+    skipped, so reruns (catch-up, manual) only fill gaps.
+
+    Returns: the run as a dict; status "queued" while the writer still
+    holds its snapshots, otherwise the snapshot_runs row as recorded
+    """
+    if snapshot_type not in SNAPSHOT_WINDOWS:
+        raise ValueError(f"Unknown snapshot type: {snapshot_type}")
+
+    now_ist = now_ist or datetime.now(IST)
+    started = time.perf_counter()
+    accounts = [a for a in get_active_accounts() if user_id is None or a["user_id"] == user_id]
+
+    holdings, errors = _fetch_all(accounts) if accounts else ({}, {})
+    run = {
+        "snapshot_date": now_ist.date().isoformat(),
+        "snapshot_type": snapshot_type,
+        "trigger": trigger,
+        "status": "queued",
+        "accounts": len(accounts),
+        "accounts_failed": len(errors),
+        "snapshots_written": 0,
+        "rows_written": 0,
+        "duration_ms": None,
+        "error": None,
+        "started_at": now_ist.isoformat(),
+        "finished_at": None,
+    }
+    if not holdings:
+        _close_run(run, errors, started)
+        return run
+
+    queued = dict(run)  # the writer fills in `run` from its own thread
+    ticket = enqueue_holdings_snapshots(
+        ((now_ist.date().isoformat(), snapshot_type, now_ist.isoformat(), user_id, h)
+         for user_id, h in holdings.items()),
+        on_done=lambda ticket: _close_run(run, errors, started, ticket),
+    )
+    return run if ticket.done.is_set() else queued
+
+
+def get_snapshot_status(limit: int = 20) -> dict:
+    """Writer counters and the most recent snapshot runs, newest first."""
+    rows = get_connection().execute(
+        "SELECT * FROM snapshot_runs ORDER BY id DESC LIMIT ?", (limit,)
+    ).fetchall()
+    return {"writer": get_snapshot_writer_status(), "runs": [dict(r) for r in rows]}
@@ -1,87 +1,219 @@
 import os
+import time
 import logging
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-from backend.app.services.db import get_any_active_access_token, get_connection
+from backend.app.services.db import (
+    bulk_insert,
+    get_active_accounts,
+    get_connection,
+    insert_trades,
+    transaction,
+)
+from backend.app.services.kite_client import kite_get
+from backend.app.services.analytics import refresh_analytics
+from backend.app.services.zerodha_holdings import invalidate_session_cache
 
 logger = logging.getLogger("tunefolio.trade_sync")
 
 KITE_API_KEY = os.getenv("KITE_API_KEY")
 
+SYNC_ACCOUNT_COLUMNS = ["run_id", "user_id", "session_id", "status", "reason", "fetched", "inserted", "latency_ms"]
 
-def sync_trades_from_kite(access_token: str = None) -> dict:
+
+SYNC_WORKERS = 4  # concurrent accounts; all share kite_client's rate limiter
+
+
+def sync_trades_from_kite(access_token: str, user_id: str,
+                          session_id: str = None, trigger: str = "manual") -> dict:
     """
-    Fetch today's trades from Kite API and insert into the trades table.
-    Idempotent: uses INSERT OR IGNORE on UNIQUE(trade_id, symbol, trade_date, exchange).
+    Fetch today's trades for one account and insert into the trades table.
+    Idempotent: uses INSERT OR IGNORE on UNIQUE(user_id, trade_id, symbol, trade_date, exchange).
 
     Args:
-        access_token: Optional. If not provided, fetches the most recent active token.
+        access_token: The account's Kite token.
+        user_id: The Zerodha user the token belongs to; every fill is
+                 stored under it, so it is required.
 
     Returns:
         dict with status, inserted count, total fetched, and timestamp.
     """
-    token = access_token or get_any_active_access_token()
+    if not user_id:
+        raise ValueError("Trade sync needs the account's user_id")
 
-    if not token:
-        logger.info("Trade sync skipped: no active access token")
+    if not access_token:
+        logger.info(f"Trade sync skipped for {user_id}: no active access token")
         return {"status": "skipped", "reason": "no_token", "timestamp": _now_iso()}
 
-    api_key = KITE_API_KEY or os.getenv("KITE_API_KEY")
-    if not api_key:
-        logger.warning("Trade sync skipped: KITE_API_KEY not set")
-        return {"status": "skipped", "reason": "no_api_key", "timestamp": _now_iso()}
+    run = _sync_accounts(
+        [{"user_id": user_id, "session_id": session_id, "access_token": access_token}], trigger,
+    )
+    if run["status"] == "skipped" and run["reason"]:
+        return {"status": "skipped", "reason": run["reason"], "timestamp": _now_iso()}
+
+    outcome = run["accounts"][0]
+    if outcome["status"] != "ok":
+        return {"status": outcome["status"], "reason": outcome["reason"], "timestamp": _now_iso()}
+    return {
+        "status": "ok",
+        "fetched": outcome["fetched"],
+        "inserted": outcome["inserted"],
+        "timestamp": _now_iso(),
+    }
 
-    headers = {"Authorization": f"token {api_key}:{token}"}
 
+def sync_all_accounts(trigger: str = "scheduled") -> dict:
+    """
+    Sync every active, non-expired account (latest session per Zerodha
+    user) concurrently.  Returns the recorded run, with per-account outcomes.
+    """
+    accounts = get_active_accounts()
+    if not accounts:
+        logger.info("Trade sync skipped: no active accounts")
+    return _sync_accounts(accounts, trigger)
+
+
+# ─── Multi-Account Sync ──────────────────────────────────────────────
+
+def _fetch_account(account: dict, api_key: str) -> dict:
+    """Today's trades for one account.  Never raises; the outcome says what happened."""
+    outcome = {
+        "user_id": account["user_id"],
+        "session_id": account["session_id"],
+        "status": "error",
+        "reason": None,
+        "fetched": 0,
+        "inserted": 0,
+        "latency_ms": None,
+        "trades": [],
+    }
+    started = time.perf_counter()
     try:
-        resp = requests.get("https://api.kite.trade/trades", headers=headers, timeout=15)
+        resp = kite_get("/trades", account["access_token"], api_key=api_key)
     except requests.RequestException as e:
-        logger.error(f"Trade sync HTTP error: {e}")
-        return {"status": "error", "reason": str(e), "timestamp": _now_iso()}
+        logger.error(f"Trade sync HTTP error for {account['user_id']}: {e}")
+        outcome["reason"] = str(e)[:500]
+        return outcome
+    finally:
+        outcome["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
 
     if resp.status_code == 403:
-        logger.info("Trade sync skipped: token expired (403)")
-        return {"status": "skipped", "reason": "token_expired", "timestamp": _now_iso()}
-
-    if resp.status_code != 200:
-        logger.error(f"Trade sync failed: HTTP {resp.status_code}")
-        return {"status": "error", "reason": f"http_{resp.status_code}", "timestamp": _now_iso()}
-
-    trades = resp.json().get("data", [])
+        logger.info(f"Trade sync skipped for {account['user_id']}: token expired (403)")
+        outcome.update(status="skipped", reason="token_expired")
+    elif resp.status_code != 200:
+        logger.error(f"Trade sync failed for {account['user_id']}: HTTP {resp.status_code}")
+        outcome["reason"] = f"http_{resp.status_code}"
+    else:
+        outcome["trades"] = resp.json().get("data", [])
+        outcome.update(status="ok", fetched=len(outcome["trades"]))
+    return outcome
+
+
+def _sync_accounts(accounts: list, trigger: str) -> dict:
+    started_at = _now_iso()
+    started = time.perf_counter()
+    run = {"trigger": trigger, "status": "skipped", "reason": None, "accounts": []}
 
-    if not trades:
-        logger.info("Trade sync: 0 trades returned from Kite API")
-        return {"status": "ok", "fetched": 0, "inserted": 0, "timestamp": _now_iso()}
+    api_key = KITE_API_KEY or os.getenv("KITE_API_KEY")
+    if accounts and not api_key:
+        logger.warning("Trade sync skipped: KITE_API_KEY not set")
+        run["reason"] = "no_api_key"
+        accounts = []
 
-    inserted = _insert_trades(trades)
+    outcomes = []
+    if accounts:
+        with ThreadPoolExecutor(max_workers=min(SYNC_WORKERS, len(accounts)),
+                                thread_name_prefix="trade-sync") as pool:
+            outcomes = list(pool.map(lambda a: _fetch_account(a, api_key), accounts))
 
-    logger.info(f"Trade sync complete: {inserted} new trades inserted (fetched {len(trades)})")
-    return {
-        "status": "ok",
-        "fetched": len(trades),
-        "inserted": inserted,
-        "timestamp": _now_iso(),
-    }
+    # One write transaction for every account's fills
+    inserted = 0
+    fetched = [o for o in outcomes if o["trades"]]
+    if fetched:
+        with transaction():
+            for o in fetched:
+                o["inserted"] = _insert_trades(o["trades"], o["user_id"])
+        inserted = sum(o["inserted"] for o in fetched)
+    if inserted:
+        # Ledger + summary tables, so reads don't fall back to live computation
+        run["analytics"] = refresh_analytics()
+        # Holdings may have changed with the new fills
+        invalidate_session_cache()
+
+    failed = sum(1 for o in outcomes if o["status"] == "error")
+    if outcomes:
+        run["status"] = "failed" if failed == len(outcomes) else "partial" if failed else "ok"
+    run.update(
+        accounts=[{k: v for k, v in o.items() if k != "trades"} for o in outcomes],
+        accounts_failed=failed,
+        fetched=sum(o["fetched"] for o in outcomes),
+        inserted=inserted,
+        duration_ms=round((time.perf_counter() - started) * 1000, 1),
+        started_at=started_at,
+        finished_at=_now_iso(),
+    )
+    run["id"] = _record_run(run)
+
+    logger.info(
+        f"Trade sync ({trigger}) {run['status']}: {len(outcomes)} account(s), "
+        f"{inserted} new trades inserted (fetched {run['fetched']}) in {run['duration_ms']}ms"
+    )
+    return run
+
+
+def _record_run(run: dict) -> int:
+    with transaction() as conn:
+        run_id = conn.execute("""
+            INSERT INTO trade_sync_runs (
+                trigger, status, reason, accounts, accounts_failed,
+                fetched, inserted, duration_ms, started_at, finished_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            run["trigger"], run["status"], run["reason"], len(run["accounts"]), run["accounts_failed"],
+            run["fetched"], run["inserted"], run["duration_ms"], run["started_at"], run["finished_at"],
+        )).lastrowid
+        bulk_insert("trade_sync_accounts", SYNC_ACCOUNT_COLUMNS, (
+            (run_id, *(o[c] for c in SYNC_ACCOUNT_COLUMNS[1:])) for o in run["accounts"]
+        ))
+    return run_id
 
 
-def _insert_trades(trades: list) -> int:
-    """Map Kite API trade objects to the trades table and INSERT OR IGNORE."""
+def get_sync_history(limit: int = 10) -> list:
+    """Most recent sync runs, newest first, each with its per-account outcomes."""
     conn = get_connection()
-    cursor = conn.cursor()
-    inserted = 0
-
+    runs = [dict(r) for r in conn.execute(
+        "SELECT * FROM trade_sync_runs ORDER BY id DESC LIMIT ?", (limit,)
+    ).fetchall()]
+    if not runs:
+        return []
+
+    by_run = {r["id"]: r for r in runs}
+    for r in runs:
+        r["by_account"] = []
+    for row in conn.execute(f"""
+        SELECT * FROM trade_sync_accounts
+        WHERE run_id IN ({", ".join("?" * len(by_run))})
+        ORDER BY user_id
+    """, list(by_run)).fetchall():
+        account = dict(row)
+        by_run[account.pop("run_id")]["by_account"].append(account)
+    return runs
+
+
+def _insert_trades(trades: list, user_id: str) -> int:
+    """
+    Map one account's Kite API trade objects to the trades table and
+    INSERT OR IGNORE.  Rows are tagged with the account's user_id so FIFO
+    matching never crosses accounts.
+    """
+    rows = []
     for t in trades:
         fill_ts = t.get("fill_timestamp", "")
         trade_date = fill_ts[:10] if fill_ts else datetime.now().strftime("%Y-%m-%d")
 
-        cursor.execute("""
-            INSERT OR IGNORE INTO trades (
-                symbol, isin, trade_date, exchange, segment, series,
-                trade_type, auction, quantity, price,
-                trade_id, order_id, order_execution_time, source_file
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
+        rows.append((
             t.get("tradingsymbol"),
             None,                                           # isin (not in Kite trades response)
             trade_date,
@@ -96,14 +228,10 @@ def _insert_trades(trades: list) -> int:
             str(t.get("order_id", "")),
             fill_ts,
             "kite_api_sync",
+            user_id,
         ))
 
-        if cursor.rowcount > 0:
-            inserted += 1
-
-    conn.commit()
-    conn.close()
-    return inserted
+    return insert_trades(rows)["inserted"]
 
 
 def _now_iso() -> str:
@@ -3,17 +3,43 @@ Trades service: CSV tradebook import, FIFO realised P&L engine, FY helpers.
 """
 
 import csv
-from collections import defaultdict
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
 
-from backend.app.services.db import get_connection, DB_PATH
+from backend.app.services.db import (
+    DB_PATH,
+    get_connection,
+    insert_trades,
+    transaction,
+)
+from backend.app.services.lot_ledger import TRADE_ORDER, get_realised_by_window, refresh_ledger
+
+logger = logging.getLogger("tunefolio.trades")
 
 DATA_DIR = DB_PATH.parent  # backend/data/
 
+# Zerodha exports tradebooks as tradebook-<CLIENT_ID>-<SEGMENT>.csv
+TRADEBOOK_GLOB = "tradebook-*-EQ*.csv"
+_TRADEBOOK_CLIENT = re.compile(r"tradebook-([^-]+)-")
+PARALLEL_MIN_BYTES = 4 * 1024 * 1024   # below this, pool start-up costs more than it saves
+IMPORT_WORKERS = min(4, os.cpu_count() or 1)
+
 
 # ─── Date Normalization ──────────────────────────────────────────────
 
+@lru_cache(maxsize=8192)
 def normalize_trade_date(date_str: str) -> str:
     """Convert trade_date from CSV to YYYY-MM-DD ISO format.
 
@@ -39,60 +65,258 @@ def normalize_trade_date(date_str: str) -> str:
 
 # ─── CSV Import ──────────────────────────────────────────────────────
 
-def import_tradebooks() -> dict:
+def import_tradebooks(data_dir: Path = None, pattern: str = TRADEBOOK_GLOB,
+                      force: bool = False) -> dict:
     """
-    Parse all tradebook CSVs from backend/data/ and INSERT OR IGNORE
-    into the trades table.  Idempotent — re-running inserts 0 new rows.
-
-    Returns: {filename: rows_inserted, ...}
+    Import tradebook CSVs from backend/data/ into the trades table
+    (INSERT OR IGNORE — idempotent).
+
+    Files already recorded in import_manifest with the same size and mtime,
+    or the same content hash, are skipped without being parsed.  New or
+    changed files are split into line-aligned chunks parsed in a process
+    pool when there is enough work, otherwise streamed in-process.  Either
+    way each parsed batch is inserted in its own short transaction, so the
+    write lock is never held while parsing, and the file's manifest row is
+    recorded last.  A file interrupted part-way has no manifest row and is
+    simply imported again (the inserted rows are ignored as duplicates).
+
+    Returns: {filename: {"status", "rows", "inserted", "ignored", "errors",
+                         "seconds", "rows_per_sec"}, ...}
     """
-    csv_files = sorted(DATA_DIR.glob("tradebook-QX1480-EQ*.csv"))
-    conn = get_connection()
-    cursor = conn.cursor()
+    data_dir = data_dir or DATA_DIR
+    csv_files = sorted(data_dir.glob(pattern))
     summary = {}
 
-    for csv_path in csv_files:
-        filename = csv_path.name
-        inserted = 0
-        with open(csv_path, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                iso_date = normalize_trade_date(row["trade_date"])
-                try:
-                    cursor.execute("""
-                        INSERT OR IGNORE INTO trades (
-                            symbol, isin, trade_date, exchange, segment,
-                            series, trade_type, auction, quantity, price,
-                            trade_id, order_id, order_execution_time, source_file
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        row["symbol"].strip(),
-                        row["isin"].strip(),
-                        iso_date,
-                        row["exchange"].strip(),
-                        row.get("segment", "").strip(),
-                        row.get("series", "").strip(),
-                        row["trade_type"].strip().lower(),
-                        row.get("auction", "").strip().lower(),
-                        float(row["quantity"]),
-                        float(row["price"]),
-                        str(row["trade_id"]).strip(),
-                        str(row.get("order_id", "")).strip(),
-                        row.get("order_execution_time", "").strip(),
-                        filename,
-                    ))
-                    if cursor.rowcount > 0:
-                        inserted += 1
-                except Exception as e:
-                    print(f"Skipping row in {filename}: {e}")
-                    continue
-        summary[filename] = inserted
-
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    manifest = {r["file_name"]: r for r in conn.execute("SELECT * FROM import_manifest")}
+    by_hash = {r["sha256"]: r for r in manifest.values()}
+
+    pending = []
+    for path in csv_files:
+        stat = path.stat()
+        entry = manifest.get(path.name)
+        if not force and entry and entry["size_bytes"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            summary[path.name] = _unchanged_summary(entry["row_count"])
+            continue
+
+        digest = _file_sha256(path)
+        if not force and entry and entry["sha256"] == digest:
+            # Touched (new mtime, same content): keep the recorded import
+            _touch_manifest(path, stat)
+            summary[path.name] = _unchanged_summary(entry["row_count"])
+            continue
+        if not force and digest in by_hash:
+            # Same content under a new name: its rows are already in
+            source = by_hash[digest]
+            _record_manifest(path, stat, digest, source["row_count"], inserted=0, errors=0, seconds=0.0)
+            summary[path.name] = _unchanged_summary(source["row_count"])
+            continue
+
+        pending.append((path, stat, digest))
+
+    total_bytes = sum(stat.st_size for _, stat, _ in pending)
+    if total_bytes >= PARALLEL_MIN_BYTES:
+        offsets = {path: _chunk_offsets(path) for path, _, _ in pending}
+        parsed = _parse_chunks_in_pool([(path, chunk) for path, chunks in offsets.items() for chunk in chunks])
+        try:
+            for path, stat, digest in pending:
+                errors = []
+                batches = _pooled_batches(len(offsets[path]), parsed, errors)
+                summary[path.name] = _ingest_file(path, stat, digest, batches, errors)
+        finally:
+            parsed.close()
+    else:
+        for path, stat, digest in pending:
+            errors = []
+            batches = _batched(_read_tradebook_rows(path, errors))
+            summary[path.name] = _ingest_file(path, stat, digest, batches, errors)
+
+    if any(s["inserted"] for s in summary.values()):
+        refresh_ledger()
+
     return summary
 
 
+def _unchanged_summary(row_count: int) -> dict:
+    return {"status": "unchanged", "rows": row_count, "inserted": 0, "ignored": 0,
+            "errors": 0, "seconds": 0.0, "rows_per_sec": None}
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _batched(rows, size: int = None):
+    """Lists of up to `size` rows from a row iterator."""
+    size = size or IMPORT_BATCH_ROWS
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def _ingest_file(path: Path, stat, digest: str, batches, errors: list) -> dict:
+    """
+    Insert one file's rows, batch by batch, then record it in the manifest.
+    `batches` parses lazily; each batch is fully parsed before its insert
+    transaction opens.  Timing covers parsing.
+    """
+    start = time.perf_counter()
+    result = {"inserted": 0, "ignored": 0}
+    for batch in batches:
+        batch_result = insert_trades(batch)
+        result["inserted"] += batch_result["inserted"]
+        result["ignored"] += batch_result["ignored"]
+    row_count = result["inserted"] + result["ignored"]
+    seconds = time.perf_counter() - start
+    _record_manifest(path, stat, digest, row_count, result["inserted"], len(errors), seconds)
+
+    rate = round(row_count / seconds) if seconds > 0 else None
+    logger.info(
+        f"Imported {path.name}: {result['inserted']}/{row_count} new rows, "
+        f"{len(errors)} errors, {seconds:.3f}s ({rate} rows/sec)"
+    )
+    return {
+        "status": "imported",
+        "rows": row_count,
+        "inserted": result["inserted"],
+        "ignored": result["ignored"],
+        "errors": len(errors),
+        "seconds": round(seconds, 3),
+        "rows_per_sec": rate,
+    }
+
+
+def _record_manifest(path: Path, stat, digest: str, row_count: int, inserted: int,
+                     errors: int, seconds: float):
+    with transaction() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO import_manifest (
+                file_name, sha256, size_bytes, mtime, row_count,
+                inserted, errors, duration_ms, imported_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (path.name, digest, stat.st_size, stat.st_mtime, row_count,
+              inserted, errors, round(seconds * 1000, 1)))
+
+
+def _touch_manifest(path: Path, stat):
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE import_manifest SET size_bytes = ?, mtime = ? WHERE file_name = ?",
+            (stat.st_size, stat.st_mtime, path.name),
+        )
+
+
+# ─── Chunked Parsing ─────────────────────────────────────────────────
+#
+# Large imports are split into ~IMPORT_CHUNK_BYTES pieces ending on line
+# boundaries.  Pool workers parse one chunk each; the parent inserts chunks
+# in file order as they come back, with at most IMPORT_CHUNKS_IN_FLIGHT
+# parsed or parsing at a time, so memory stays bounded however large the
+# files are.  The pool uses the spawn start method: forking the server
+# process while its scheduler, enrichment and DB-executor threads hold
+# locks can deadlock the child.
+
+IMPORT_CHUNK_BYTES = 1024 * 1024
+IMPORT_BATCH_ROWS = 5000            # rows per insert transaction when streaming in-process
+IMPORT_CHUNKS_IN_FLIGHT = 2 * IMPORT_WORKERS
+
+
+def _chunk_offsets(path: Path, chunk_bytes: int = None) -> list:
+    """[(start, end, first_line), ...] byte ranges of the data rows, each ending on a newline."""
+    chunk_bytes = chunk_bytes or IMPORT_CHUNK_BYTES
+    chunks = []
+    with open(path, "rb") as f:
+        f.readline()                                    # header
+        start, line = f.tell(), 2
+        while True:
+            block = f.read(chunk_bytes) + f.readline()  # extend to the end of the line
+            if not block:
+                break
+            chunks.append((start, start + len(block), line))
+            start += len(block)
+            line += block.count(b"\n")
+    return chunks
+
+
+def _parse_chunks_in_pool(chunks: list):
+    """Yield (rows, errors) for each (path, (start, end, first_line)) chunk, in order."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=IMPORT_WORKERS, mp_context=context) as pool:
+        in_flight = deque()
+        for path, (start, end, first_line) in chunks:
+            in_flight.append(pool.submit(_parse_tradebook_chunk, str(path), start, end, first_line))
+            if len(in_flight) >= IMPORT_CHUNKS_IN_FLIGHT:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+
+def _pooled_batches(n_chunks: int, parsed, errors: list):
+    """The next `n_chunks` chunks' rows, one list per chunk, from the pool's in-order result stream."""
+    for _ in range(n_chunks):
+        rows, chunk_errors = next(parsed)
+        errors.extend(chunk_errors)
+        yield rows
+
+
+def _parse_tradebook_chunk(path: str, start: int, end: int, first_line: int) -> tuple:
+    """Process-pool worker: parse bytes [start, end) of a tradebook.  Returns (rows, errors)."""
+    path = Path(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        header = next(csv.reader([f.readline()]))
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+
+    errors = []
+    reader = csv.DictReader(io.StringIO(text, newline=""), fieldnames=header)
+    rows = list(_tradebook_rows(reader, path.name, errors, first_line - 1))
+    return rows, errors
+
+
+def _read_tradebook_rows(csv_path: Path, errors: list):
+    """Yield trades-table tuples from one tradebook CSV; bad rows go to `errors`."""
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        yield from _tradebook_rows(csv.DictReader(f), csv_path.name, errors)
+
+
+def tradebook_user_id(filename: str) -> str:
+    """Zerodha client id from a tradebook file name ('' if it doesn't follow the pattern)."""
+    match = _TRADEBOOK_CLIENT.match(filename)
+    return match.group(1) if match else ""
+
+
+def _tradebook_rows(reader: csv.DictReader, filename: str, errors: list, line_offset: int = 0):
+    user_id = tradebook_user_id(filename)
+    for row in reader:
+        try:
+            yield (
+                row["symbol"].strip(),
+                row["isin"].strip(),
+                normalize_trade_date(row["trade_date"]),
+                row["exchange"].strip(),
+                row.get("segment", "").strip(),
+                row.get("series", "").strip(),
+                row["trade_type"].strip().lower(),
+                row.get("auction", "").strip().lower(),
+                float(row["quantity"]),
+                float(row["price"]),
+                str(row["trade_id"]).strip(),
+                str(row.get("order_id", "")).strip(),
+                row.get("order_execution_time", "").strip(),
+                filename,
+                user_id,
+            )
+        except Exception as e:
+            errors.append(f"line {line_offset + reader.line_num}: {e}")
+            logger.warning(f"Skipping row in {filename}: {e}")
+            continue
+
+
 # ─── Financial Year Helpers ──────────────────────────────────────────
 
 def get_fy_bounds(fy_label: str = None) -> tuple:
@@ -112,38 +336,50 @@ def get_fy_bounds(fy_label: str = None) -> tuple:
     return (f"{start_year}-04-01", f"{start_year + 1}-03-31")
 
 
-def get_available_fys() -> list:
-    """Return sorted list of FY labels that have sell trades."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
+def fy_label_for_year(start_year: int) -> str:
+    """2025 → 'FY2025-26'."""
+    return f"FY{start_year}-{str(start_year + 1)[-2:]}"
+
+
+def get_available_fys(user_id: str = None) -> list:
+    """Return sorted list of FY labels that have sell trades (in `user_id`'s account, if given)."""
+    account = "AND user_id = ?" if user_id is not None else ""
+    rows = get_connection().execute(f"""
         SELECT DISTINCT trade_date FROM trades
-        WHERE trade_type = 'sell'
+        WHERE trade_type = 'sell' {account}
         ORDER BY trade_date ASC
-    """)
-    rows = cursor.fetchall()
-    conn.close()
+    """, (user_id,) if user_id is not None else ()).fetchall()
 
     fys = set()
     for row in rows:
         d = datetime.strptime(row["trade_date"], "%Y-%m-%d")
         fy_start = d.year if d.month >= 4 else d.year - 1
-        fys.add(f"FY{fy_start}-{str(fy_start + 1)[-2:]}")
+        fys.add(fy_label_for_year(fy_start))
 
     return sorted(fys)
 
 
-# ─── FIFO Realised P&L Engine ────────────────────────────────────────
+# ─── FIFO Realised P&L ───────────────────────────────────────────────
 
-def compute_realised_pnl(fy_start: str = None, fy_end: str = None) -> dict:
+def compute_realised_pnl_windows(windows: dict, engine: str = "ledger", user_id: str = None) -> dict:
     """
-    Compute realised P&L using FIFO method across all symbols.
+    Realised P&L for several sell-date windows at once, using FIFO
+    matching within each account: `user_id`'s account, or summed across
+    accounts per symbol when it is None.
+
+    engine="ledger" (default) reads the persisted lot ledger (see
+    lot_ledger.py) and answers all windows with one indexed query;
+    engine="vectorized" recomputes from the raw trades with the NumPy
+    engine in fifo_vectorized.py.
 
-    Even when filtering by FY, ALL historical buys are loaded because
-    a stock bought in FY2020-21 may be sold in FY2025-26.  The FY
-    window filters *sells* only.
+    Buys from any earlier period are matched — a stock bought in FY2020-21
+    may be sold in FY2025-26.  Windows filter *sells* only.
 
-    Returns:
+    Args:
+        windows: {label: (start_date, end_date)}, inclusive ISO dates;
+                 either bound may be None (open-ended).
+
+    Returns: {label: result} where each result is
         {
             "total_realised_pnl": float,
             "by_symbol": {"SYM": {"realised_pnl": float, "qty_sold": float}},
@@ -151,176 +387,141 @@ def compute_realised_pnl(fy_start: str = None, fy_end: str = None) -> dict:
             "total_sells": int
         }
     """
-    conn = get_connection()
-    cursor = conn.cursor()
+    if engine == "vectorized":
+        from backend.app.services.fifo_vectorized import compute_realised_pnl_windows_vectorized, load_trade_arrays
+        return compute_realised_pnl_windows_vectorized(windows, load_trade_arrays(user_id))
+    if engine != "ledger":
+        raise ValueError(f"Unknown realised P&L engine: {engine}")
+
+    return aggregate_realised(get_realised_by_window(windows, user_id), windows)
 
-    # Load ALL trades, ordered chronologically per symbol
-    cursor.execute("""
-        SELECT symbol, isin, trade_date, trade_type, quantity, price,
-               order_execution_time, exchange, trade_id
-        FROM trades
-        ORDER BY symbol, trade_date ASC, order_execution_time ASC
-    """)
-    rows = cursor.fetchall()
-    conn.close()
 
-    # Group by symbol (pool across exchanges — Indian tax treatment)
-    symbol_trades = defaultdict(list)
+def aggregate_realised(rows, labels) -> dict:
+    """
+    Fold (label, symbol, realised_pnl, qty_sold, sells) rows into the
+    compute_realised_pnl_windows result shape, one result per label.
+    """
+    totals = {label: {"pnl": 0.0, "sells": 0, "by_symbol": {}} for label in labels}
+
     for row in rows:
-        symbol_trades[row["symbol"]].append(dict(row))
-
-    total_rpnl = 0.0
-    total_sells = 0
-    by_symbol = {}
-
-    for symbol, trades in symbol_trades.items():
-        buy_queue = []  # FIFO: [{qty_remaining, price, date}, ...]
-        symbol_rpnl = 0.0
-        qty_sold = 0.0
-
-        for t in trades:
-            qty = float(t["quantity"])
-            price = float(t["price"])
-
-            if t["trade_type"] == "buy":
-                buy_queue.append({
-                    "qty_remaining": qty,
-                    "price": price,
-                    "date": t["trade_date"],
-                })
-
-            elif t["trade_type"] == "sell":
-                # Is this sell within the requested FY window?
-                sell_in_window = True
-                if fy_start and t["trade_date"] < fy_start:
-                    sell_in_window = False
-                if fy_end and t["trade_date"] > fy_end:
-                    sell_in_window = False
-
-                sell_qty_remaining = qty
-                sell_rpnl = 0.0
-
-                while sell_qty_remaining > 0.0001 and buy_queue:
-                    oldest = buy_queue[0]
-                    match_qty = min(sell_qty_remaining, oldest["qty_remaining"])
-                    pnl = (price - oldest["price"]) * match_qty
-
-                    if sell_in_window:
-                        sell_rpnl += pnl
-
-                    oldest["qty_remaining"] -= match_qty
-                    sell_qty_remaining -= match_qty
-
-                    if oldest["qty_remaining"] <= 0.0001:
-                        buy_queue.pop(0)
-
-                if sell_in_window:
-                    symbol_rpnl += sell_rpnl
-                    qty_sold += qty
-                    total_sells += 1
-
-        if qty_sold > 0:
-            by_symbol[symbol] = {
-                "realised_pnl": round(symbol_rpnl, 2),
-                "qty_sold": round(qty_sold, 2),
+        acc = totals[row["label"]]
+        acc["sells"] += row["sells"]
+        if row["qty_sold"] > 0:
+            acc["by_symbol"][row["symbol"]] = {
+                "realised_pnl": round(row["realised_pnl"], 2),
+                "qty_sold": round(row["qty_sold"], 2),
             }
-            total_rpnl += symbol_rpnl
+            acc["pnl"] += row["realised_pnl"]
 
     return {
-        "total_realised_pnl": round(total_rpnl, 2),
-        "by_symbol": by_symbol,
-        "total_symbols_sold": len(by_symbol),
-        "total_sells": total_sells,
+        label: {
+            "total_realised_pnl": round(acc["pnl"], 2),
+            "by_symbol": acc["by_symbol"],
+            "total_symbols_sold": len(acc["by_symbol"]),
+            "total_sells": acc["sells"],
+        }
+        for label, acc in totals.items()
     }
 
 
-# ─── Historical Holdings (Fully Exited Positions) ─────────────────────
+def compute_realised_pnl(fy_start: str = None, fy_end: str = None) -> dict:
+    """Realised P&L for a single sell-date window (see compute_realised_pnl_windows)."""
+    return compute_realised_pnl_windows({"window": (fy_start, fy_end)})["window"]
 
-def compute_historical_holdings(current_symbols: list = None, fy_start: str = None, fy_end: str = None) -> list:
-    """
-    Find all symbols that were fully exited (total buy qty == total sell qty)
-    and are NOT in the current holdings list.
 
-    Returns list of dicts with avg buy/sell prices, total P&L, dates.
-    """
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT symbol, trade_date, trade_type, quantity, price, exchange, isin
+# ─── Historical Holdings (Fully Exited Positions) ─────────────────────
+
+# Per-account position aggregates over the covering trades index, one row
+# per (user_id, symbol) not in the :exclude JSON list.  Shared by
+# compute_historical_holdings and analytics.refresh_analytics
+# (symbol_trade_stats), so both report the same exited positions.
+# ACCOUNT_POSITION_STATS_SQL is the same for the :user_id account only,
+# seeking into the index instead of scanning every account.
+def _position_stats_sql(account: str) -> str:
+    return f"""
+    WITH positions AS MATERIALIZED (
+        SELECT user_id, symbol,
+               SUM(CASE WHEN trade_type = 'buy' THEN quantity ELSE 0 END) AS buy_qty,
+               SUM(CASE WHEN trade_type = 'sell' THEN quantity ELSE 0 END) AS sell_qty,
+               SUM(CASE WHEN trade_type = 'buy' THEN quantity * price ELSE 0 END) AS buy_value,
+               SUM(CASE WHEN trade_type = 'sell' THEN quantity * price ELSE 0 END) AS sell_value,
+               COUNT(*) AS num_trades,
+               MIN(CASE WHEN trade_type = 'buy' THEN trade_date END) AS first_buy_date,
+               MAX(CASE WHEN trade_type = 'sell' THEN trade_date END) AS last_sell_date
         FROM trades
-        ORDER BY symbol, trade_date ASC, order_execution_time ASC
-    """)
-    rows = cursor.fetchall()
-    conn.close()
+        WHERE symbol NOT IN (SELECT value FROM json_each(:exclude)) {account}
+        GROUP BY user_id, symbol
+    )
+    SELECT p.*,
+           (SELECT exchange FROM trades x INDEXED BY idx_trades_user_symbol_chrono
+            WHERE x.user_id = p.user_id AND x.symbol = p.symbol
+            ORDER BY {TRADE_ORDER} LIMIT 1) AS exchange,
+           (SELECT isin FROM trades x INDEXED BY idx_trades_user_symbol_chrono
+            WHERE x.user_id = p.user_id AND x.symbol = p.symbol AND x.trade_type = 'buy'
+              AND x.isin IS NOT NULL AND x.isin != ''
+            ORDER BY {TRADE_ORDER} LIMIT 1) AS isin,
+           p.buy_qty > 0 AND ABS(p.buy_qty - p.sell_qty) <= 0.01 AS exited
+    FROM positions p
+"""
 
-    current_set = set(current_symbols or [])
 
-    # Group by symbol
-    symbol_trades = defaultdict(list)
-    for row in rows:
-        symbol_trades[row["symbol"]].append(dict(row))
+POSITION_STATS_SQL = _position_stats_sql("")
+ACCOUNT_POSITION_STATS_SQL = _position_stats_sql("AND user_id = :user_id")
 
-    results = []
-    for symbol, trades in symbol_trades.items():
-        if symbol in current_set:
-            continue
+def compute_historical_holdings(current_symbols: list = None, fy_start: str = None, fy_end: str = None,
+                                user_id: str = None) -> list:
+    """
+    Find all symbols that an account fully exited (total buy qty == total
+    sell qty) and that are NOT in the current holdings list.  Positions are
+    per account: only `user_id`'s, or every account's when it is None (a
+    symbol exited in two accounts then yields two rows).
 
-        total_buy_qty = 0.0
-        total_sell_qty = 0.0
-        total_buy_value = 0.0
-        total_sell_value = 0.0
-        num_trades = 0
-        first_buy_date = None
-        last_sell_date = None
-        exchange = trades[0]["exchange"] if trades else "NSE"
-        isin = None
-
-        for t in trades:
-            qty = float(t["quantity"])
-            price = float(t["price"])
-            num_trades += 1
-
-            if t["trade_type"] == "buy":
-                total_buy_qty += qty
-                total_buy_value += qty * price
-                if not first_buy_date:
-                    first_buy_date = t["trade_date"]
-                if not isin and t.get("isin"):
-                    isin = t["isin"]
-            elif t["trade_type"] == "sell":
-                total_sell_qty += qty
-                total_sell_value += qty * price
-                last_sell_date = t["trade_date"]
-
-        # Only include fully exited positions
-        if abs(total_buy_qty - total_sell_qty) > 0.01:
-            continue
-        if total_buy_qty == 0:
-            continue
+    Aggregated in SQL (one GROUP BY over the covering trades index); the
+    current-holdings exclusion and the FY filter on last_sell_date are
+    applied in the query, so only exited symbols come back to Python.
 
-        # FY filter: only include positions exited within the FY window
-        if fy_start and last_sell_date and last_sell_date < fy_start:
-            continue
-        if fy_end and last_sell_date and last_sell_date > fy_end:
-            continue
+    Returns list of dicts with avg buy/sell prices, total P&L, dates.
+    """
+    stats_sql = ACCOUNT_POSITION_STATS_SQL if user_id is not None else POSITION_STATS_SQL
+    rows = get_connection().execute(f"""
+        SELECT * FROM ({stats_sql})
+        WHERE exited
+          AND (:fy_start IS NULL OR last_sell_date IS NULL OR last_sell_date >= :fy_start)
+          AND (:fy_end IS NULL OR last_sell_date IS NULL OR last_sell_date <= :fy_end)
+        ORDER BY symbol, user_id
+    """, {
+        "exclude": json.dumps(list(current_symbols or [])),
+        "user_id": user_id,
+        "fy_start": fy_start,
+        "fy_end": fy_end,
+    }).fetchall()
+
+    return [historical_row(r) for r in rows]
+
+
+def historical_row(r) -> dict:
+    """One exited position from aggregate columns (buy/sell qty and value, dates, exchange, isin)."""
+    total_buy_qty = r["buy_qty"]
+    total_sell_qty = r["sell_qty"]
+    total_buy_value = r["buy_value"]
+    total_sell_value = r["sell_value"]
+
+    avg_buy = round(total_buy_value / total_buy_qty, 2)
+    avg_sell = round(total_sell_value / total_sell_qty, 2) if total_sell_qty else 0
+    total_pnl = round(total_sell_value - total_buy_value, 2)
 
-        avg_buy = round(total_buy_value / total_buy_qty, 2)
-        avg_sell = round(total_sell_value / total_sell_qty, 2) if total_sell_qty else 0
-        total_pnl = round(total_sell_value - total_buy_value, 2)
-
-        results.append({
-            "symbol": symbol,
-            "exchange": exchange,
-            "isin": isin,
-            "avg_buy_price": avg_buy,
-            "avg_sell_price": avg_sell,
-            "total_qty_traded": round(total_buy_qty + total_sell_qty, 2),
-            "total_invested": round(total_buy_value, 2),
-            "total_proceeds": round(total_sell_value, 2),
-            "total_pnl": total_pnl,
-            "num_trades": num_trades,
-            "first_buy_date": first_buy_date,
-            "last_sell_date": last_sell_date,
-        })
-
-    return results
+    return {
+        "user_id": r["user_id"],
+        "symbol": r["symbol"],
+        "exchange": r["exchange"] or "NSE",
+        "isin": r["isin"],
+        "avg_buy_price": avg_buy,
+        "avg_sell_price": avg_sell,
+        "total_qty_traded": round(total_buy_qty + total_sell_qty, 2),
+        "total_invested": round(total_buy_value, 2),
+        "total_proceeds": round(total_sell_value, 2),
+        "total_pnl": total_pnl,
+        "num_trades": r["num_trades"],
+        "first_buy_date": r["first_buy_date"],
+        "last_sell_date": r["last_sell_date"],
+    }
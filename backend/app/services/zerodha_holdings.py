@@ -1,97 +1,132 @@
-import os
-import time
+import httpx
 import requests
 from fastapi import HTTPException
-from backend.app.services.db import get_active_access_token, save_holdings_snapshot
+from backend.app.services.cache import SingleFlightCache
+from backend.app.services.db import get_active_access_token, run_db
+from backend.app.services.kite_client import akite_get, kite_get
 
-# Per-session cache: keyed by session_id so different users don't share data
-_holdings_cache = {}
-_margins_cache = {}
-CACHE_TTL = 30  # seconds
+CACHE_TTL = 30                          # seconds
+CACHE_STALE_TTL = 120                   # serve up to this long past TTL while refreshing
+CACHE_MAX_SESSIONS = 128                # LRU-evicted beyond this many sessions
+CACHE_MAX_BYTES = 32 * 1024 * 1024      # per cache
 
+# Per-session cache: keyed by session_id so different users don't share data.
+# Concurrent misses for a session share one Kite call.
+_holdings_cache = SingleFlightCache(
+    "holdings", CACHE_TTL, CACHE_STALE_TTL,
+    max_entries=CACHE_MAX_SESSIONS, max_bytes=CACHE_MAX_BYTES,
+)
+_margins_cache = SingleFlightCache(
+    "margins", CACHE_TTL, CACHE_STALE_TTL,
+    max_entries=CACHE_MAX_SESSIONS, max_bytes=CACHE_MAX_BYTES,
+)
 
-def fetch_zerodha_holdings(session_id: str = None):
-    now = time.time()
 
-    # Return cached data if fresh (per session)
-    cache_key = session_id or "__global__"
-    if cache_key in _holdings_cache:
-        entry = _holdings_cache[cache_key]
-        if entry["data"] and (now - entry["timestamp"]) < CACHE_TTL:
-            return entry["data"]
+def invalidate_session_cache(session_id: str = None):
+    """Drop cached Kite data for one session (logout), or for all sessions."""
+    for cache in (_holdings_cache, _margins_cache):
+        cache.invalidate(session_id)
+
 
-    access_token = get_active_access_token(session_id)
+HOLDINGS_PATH = "/portfolio/holdings"
+MARGINS_PATH = "/user/margins/equity"
 
+
+def _require_token(access_token: str | None) -> str:
     if not access_token:
         raise HTTPException(
             status_code=401,
             detail="No active Zerodha session found"
         )
+    return access_token
 
-    KITE_API_KEY = os.getenv("KITE_API_KEY")
-
-    headers = {
-        "Authorization": f"token {KITE_API_KEY}:{access_token}"
-    }
-
-    response = requests.get(
-        "https://api.kite.trade/portfolio/holdings",
-        headers=headers
-    )
 
+def _response_data(response, what: str):
+    """Kite `data` payload; works for requests and httpx responses alike."""
     if response.status_code != 200:
         raise HTTPException(
             status_code=response.status_code,
-            detail="Failed to fetch Zerodha holdings"
+            detail=f"Failed to fetch Zerodha {what}"
         )
+    return response.json()["data"]
+
+
+def _transport_error(what: str, e: Exception) -> HTTPException:
+    return HTTPException(
+        status_code=504,
+        detail=f"Zerodha {what} request failed: {e.__class__.__name__}"
+    )
+
+
+# ─── Sync (scheduler, background threads, sync routes) ───────────────
 
-    holdings = response.json()["data"]
+def fetch_zerodha_holdings(session_id: str = None):
+    cache_key = session_id or "__global__"
+    return _holdings_cache.get(cache_key, lambda: _load_holdings(session_id))
 
-    # Persist snapshot
-    save_holdings_snapshot(holdings)
 
-    # Update per-session cache
-    _holdings_cache[cache_key] = {"data": holdings, "timestamp": now}
+def _load_holdings(session_id: str = None):
+    return fetch_holdings_for_token(_require_token(get_active_access_token(session_id)))
 
-    return holdings
+
+def fetch_holdings_for_token(access_token: str):
+    """Uncached holdings for one access token (scheduled snapshots)."""
+    try:
+        response = kite_get(HOLDINGS_PATH, access_token)
+    except requests.RequestException as e:
+        raise _transport_error("holdings", e)
+
+    return _response_data(response, "holdings")
 
 
 def fetch_zerodha_margins(session_id: str = None):
-    now = time.time()
+    cache_key = session_id or "__global__"
+    return _margins_cache.get(cache_key, lambda: _load_margins(session_id))
+
 
+def _load_margins(session_id: str = None):
+    access_token = _require_token(get_active_access_token(session_id))
+
+    try:
+        response = kite_get(MARGINS_PATH, access_token)
+    except requests.RequestException as e:
+        raise _transport_error("margins", e)
+
+    return _response_data(response, "margins")
+
+
+# ─── Async (async routes) ────────────────────────────────────────────
+#
+# Same caches as the sync path, so sync and async callers coalesce onto
+# one upstream call; DB work runs on the DB executor.
+
+async def afetch_zerodha_holdings(session_id: str = None):
     cache_key = session_id or "__global__"
-    if cache_key in _margins_cache:
-        entry = _margins_cache[cache_key]
-        if entry["data"] and (now - entry["timestamp"]) < CACHE_TTL:
-            return entry["data"]
+    return await _holdings_cache.aget(cache_key, lambda: _aload_holdings(session_id))
 
-    access_token = get_active_access_token(session_id)
 
-    if not access_token:
-        raise HTTPException(
-            status_code=401,
-            detail="No active Zerodha session found"
-        )
+async def _aload_holdings(session_id: str = None):
+    access_token = _require_token(await run_db(get_active_access_token, session_id))
 
-    KITE_API_KEY = os.getenv("KITE_API_KEY")
+    try:
+        response = await akite_get(HOLDINGS_PATH, access_token)
+    except httpx.TransportError as e:
+        raise _transport_error("holdings", e)
 
-    headers = {
-        "Authorization": f"token {KITE_API_KEY}:{access_token}"
-    }
+    return _response_data(response, "holdings")
 
-    response = requests.get(
-        "https://api.kite.trade/user/margins/equity",
-        headers=headers
-    )
 
-    if response.status_code != 200:
-        raise HTTPException(
-            status_code=response.status_code,
-            detail="Failed to fetch Zerodha margins"
-        )
+async def afetch_zerodha_margins(session_id: str = None):
+    cache_key = session_id or "__global__"
+    return await _margins_cache.aget(cache_key, lambda: _aload_margins(session_id))
+
 
-    margins = response.json()["data"]
+async def _aload_margins(session_id: str = None):
+    access_token = _require_token(await run_db(get_active_access_token, session_id))
 
-    _margins_cache[cache_key] = {"data": margins, "timestamp": now}
+    try:
+        response = await akite_get(MARGINS_PATH, access_token)
+    except httpx.TransportError as e:
+        raise _transport_error("margins", e)
 
-    return margins
+    return _response_data(response, "margins")
@@ -8,18 +8,6 @@ const API_BASE = window.location.hostname === "127.0.0.1" || window.location.hos
 
 const FETCH_OPTS = { credentials: "include" };
 
-async function fetchRealisedPnl() {
-  const res = await fetch(`${API_BASE}/portfolio/realised-pnl`, FETCH_OPTS);
-  if (!res.ok) return null;  // Non-critical; degrade gracefully
-  return res.json();
-}
-
-async function fetchMargins() {
-  const res = await fetch(`${API_BASE}/portfolio/margins`, FETCH_OPTS);
-  if (!res.ok) return null;  // Non-critical; degrade gracefully
-  return res.json();
-}
-
 async function fetchHistoricalHoldings(fy = "") {
   const fyParam = fy ? `?fy=${fy}` : "";
   const res = await fetch(`${API_BASE}/portfolio/historical-holdings${fyParam}`, FETCH_OPTS);
@@ -27,8 +15,10 @@ async function fetchHistoricalHoldings(fy = "") {
   return res.json();
 }
 
-async function fetchHoldings() {
-  const res = await fetch(`${API_BASE}/portfolio/holdings`, FETCH_OPTS);
+// Holdings, realised P&L and margins in one round trip; realised_pnl /
+// margins come back null (see `errors`) if only those panels failed
+async function fetchDashboard(fields = "holdings,realised_pnl,margins") {
+  const res = await fetch(`${API_BASE}/portfolio/dashboard?fields=${fields}`, FETCH_OPTS);
   if (!res.ok) {
     if (res.status === 401 || res.status === 403) {
       // Session expired or invalid — redirect to re-login
@@ -1280,7 +1270,8 @@ async function renderHoldings() {
   console.log("renderHoldings called");
 
   try {
-    const res = await fetchHoldings();
+    const dashboard = await fetchDashboard();
+    const res = dashboard.holdings;
 
     if (!res || !Array.isArray(res.data)) {
       throw new Error("Invalid holdings response shape");
@@ -1368,7 +1359,7 @@ async function renderHoldings() {
 
     /* -------- REALISED P&L KPIs -------- */
     try {
-      const rpnl = await fetchRealisedPnl();
+      const rpnl = dashboard.realised_pnl;
       if (rpnl) {
         const ytdEl = document.getElementById("kpi-realised-ytd");
         ytdEl.innerText = formatINR(rpnl.ytd.realised_pnl);
@@ -1385,18 +1376,18 @@ async function renderHoldings() {
         }
       }
     } catch (e) {
-      console.warn("Realised P&L fetch failed:", e);
+      console.warn("Realised P&L render failed:", e);
     }
 
     /* -------- CASH AVAILABLE KPI -------- */
     try {
-      const margins = await fetchMargins();
+      const margins = dashboard.margins;
       if (margins) {
         const cashEl = document.getElementById("kpi-cash");
         cashEl.innerText = formatINR(margins.net);
       }
     } catch (e) {
-      console.warn("Margins fetch failed:", e);
+      console.warn("Margins render failed:", e);
     }
 
   } catch (err) {
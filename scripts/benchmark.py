@@ -0,0 +1,652 @@
+"""
+TuneFolio Benchmarks
+====================
+Micro-benchmarks for the backend's hot paths, run against a throwaway
+SQLite database (the real backend/data/tunefolio.db is never touched).
+
+Usage:
+    python scripts/benchmark.py bulk                 # per-row vs bulk writes
+    python scripts/benchmark.py bulk --rows 200000
+    python scripts/benchmark.py parse                # iterrows vs vectorized NSE parsing, 50 symbols x 6y
+    python scripts/benchmark.py delivery-sync        # sequential vs pooled sync + resume, NSE stand-in
+    python scripts/benchmark.py fifo                 # FIFO engines, 1M trades / 5k symbols
+    python scripts/benchmark.py load                 # sync vs async routes, mock Kite, 200 clients
+    python scripts/benchmark.py load --path /portfolio/holdings --latency 0.2
+"""
+import sys
+import os
+import argparse
+import asyncio
+import random
+import socket
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.services import db
+
+
+def use_scratch_db(directory: str) -> Path:
+    """Point the db module at an empty database inside `directory`."""
+    db.close_connections()
+    db.DB_PATH = Path(directory) / "bench.db"
+    db.run_migrations()
+    return db.DB_PATH
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _report(label: str, rows: int, seconds: float):
+    print(f"  {label:28s} {rows:>9,d} rows  {seconds:8.3f}s  {rows / seconds:>12,.0f} rows/sec")
+
+
+# ─── Bulk writes ─────────────────────────────────────────────────────
+
+def _delivery_rows(n: int) -> list:
+    symbols = [f"SYM{i:03d}" for i in range(50)]
+    start = date(2020, 1, 1)
+    rows = []
+    for i in range(n):
+        d = start + timedelta(days=i // len(symbols))
+        rows.append((
+            symbols[i % len(symbols)], d.isoformat(),
+            random.randint(1_000, 1_000_000), random.randint(100, 500_000), 0,
+            round(random.uniform(5, 95), 2), 1,
+            100.0, 99.0, 101.0, 98.0,
+        ))
+    return rows
+
+
+_DELIVERY_SQL = (
+    f"INSERT OR REPLACE INTO delivery_cache ({', '.join(db.DELIVERY_CACHE_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(db.DELIVERY_CACHE_COLUMNS))})"
+)
+
+
+def _legacy_insert(rows: list):
+    """The original write path: new connection per symbol, one execute per row."""
+    import sqlite3
+    by_symbol = {}
+    for row in rows:
+        by_symbol.setdefault(row[0], []).append(row)
+    for symbol_rows in by_symbol.values():
+        conn = sqlite3.connect(db.DB_PATH)
+        for row in symbol_rows:
+            conn.execute(_DELIVERY_SQL, row)
+        conn.commit()
+        conn.close()
+
+
+def _per_row_insert(rows: list):
+    """Pooled connection and one transaction, but still one execute per row."""
+    conn = db.get_connection()
+    with db.transaction():
+        for row in rows:
+            conn.execute(_DELIVERY_SQL, row)
+
+
+def bench_bulk(args):
+    rows = _delivery_rows(args.rows)
+    print(f"delivery_cache writes ({args.rows:,d} rows, 50 symbols)")
+    print("=" * 72)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_scratch_db(tmp)
+        _report("legacy per-row, per-symbol", len(rows), _timed(lambda: _legacy_insert(rows)))
+
+        db.get_connection().execute("DELETE FROM delivery_cache")
+        _report("per-row execute", len(rows), _timed(lambda: _per_row_insert(rows)))
+
+        db.get_connection().execute("DELETE FROM delivery_cache")
+        _report("bulk_insert (executemany)", len(rows), _timed(
+            lambda: db.bulk_insert("delivery_cache", db.DELIVERY_CACHE_COLUMNS, rows, conflict="REPLACE")
+        ))
+
+        result = {}
+        _report("bulk_insert re-run (IGNORE)", len(rows), _timed(
+            lambda: result.update(db.bulk_insert("delivery_cache", db.DELIVERY_CACHE_COLUMNS, rows))
+        ))
+        print(f"  re-run counts: {result}")
+        db.close_connections()
+
+
+# ─── NSE delivery parsing ────────────────────────────────────────────
+
+def _nse_frames(n_symbols: int, years: int, start=date(2020, 1, 1)) -> dict:
+    """
+    Per symbol, one frame per yearly chunk shaped like nselib's
+    price_volume_and_deliverable_position_data: quantities numeric, some
+    price columns as comma-formatted strings, a few "-" cells (nselib's
+    fillna) and a repeated row per chunk.
+    """
+    import pandas as pd
+
+    frames = {}
+    for s in range(n_symbols):
+        symbol = f"SYM{s:03d}"
+        frames[symbol] = []
+        price = random.uniform(50, 5_000)
+        for y in range(years):
+            days = [start + timedelta(days=365 * y + i) for i in range(365)]
+            days = [d for d in days if d.weekday() < 5]
+            rows = []
+            for d in days:
+                prev, price = price, max(1.0, price * random.uniform(0.97, 1.03))
+                traded = random.randint(1_000, 5_000_000)
+                delivered = random.randint(0, traded)
+                rows.append({
+                    "Symbol": symbol, "Series": "EQ", "Date": d.strftime("%d-%b-%Y"),
+                    "PrevClose": round(prev, 2),
+                    "OpenPrice": f"{prev * 1.001:,.2f}",
+                    "HighPrice": f"{max(prev, price) * 1.01:,.2f}",
+                    "LowPrice": f"{min(prev, price) * 0.99:,.2f}",
+                    "ClosePrice": f"{price:,.2f}",
+                    "TotalTradedQuantity": traded,
+                    "DeliverableQty": delivered,
+                    "%DlyQttoTradedQty": "-" if random.random() < 0.002 else round(100 * delivered / traded, 4),
+                })
+            rows.append(dict(rows[len(rows) // 2]))
+            frames[symbol].append(pd.DataFrame(rows))
+    return frames
+
+
+def _legacy_parse(df) -> list:
+    """The original per-row parse: iterrows, per-cell comma stripping, one dict per row."""
+    import pandas as pd
+
+    def safe_float(val):
+        if val is None or (isinstance(val, float) and pd.isna(val)):
+            return 0.0
+        if isinstance(val, str):
+            return float(val.replace(",", ""))
+        return float(val)
+
+    def safe_int(val):
+        if val is None or (isinstance(val, float) and pd.isna(val)):
+            return 0
+        if isinstance(val, str):
+            return int(float(val.replace(",", "")))
+        return int(val)
+
+    results = []
+    for _, row in df.iterrows():
+        try:
+            total_traded = safe_int(row.get("TotalTradedQuantity", 0))
+            delivered = safe_int(row.get("DeliverableQty", 0))
+            close_price = safe_float(row.get("ClosePrice", 0))
+            prev_close = safe_float(row.get("PrevClose", 0))
+            results.append({
+                "date": str(row["Date"]),
+                "total_traded_qty": total_traded,
+                "delivered_qty": delivered,
+                "not_delivered_qty": max(total_traded - delivered, 0),
+                "delivery_pct": round(safe_float(row.get("%DlyQttoTradedQty", 0)), 2),
+                "price_up": close_price >= prev_close,
+                "close_price": close_price,
+                "open_price": safe_float(row.get("OpenPrice", 0)),
+                "high_price": safe_float(row.get("HighPrice", 0)),
+                "low_price": safe_float(row.get("LowPrice", 0)),
+            })
+        except (ValueError, KeyError, TypeError):
+            continue
+    return results
+
+
+def _legacy_delivery(frames: dict, write: bool):
+    """Parse every chunk, de-duplicate in a set, strptime sort, save_delivery_cache."""
+    from datetime import datetime
+    for symbol, chunks in frames.items():
+        all_results = [r for df in chunks for r in _legacy_parse(df)]
+        seen, unique = set(), []
+        for r in all_results:
+            if r["date"] not in seen:
+                seen.add(r["date"])
+                unique.append(r)
+        unique.sort(key=lambda x: datetime.strptime(x["date"], "%d-%b-%Y"))
+        if write:
+            db.save_delivery_cache(symbol, unique)
+
+
+def _vectorized_delivery(frames: dict, write: bool):
+    from backend.app.services.delivery import delivery_rows, parse_delivery_frame
+    for symbol, chunks in frames.items():
+        for df in chunks:
+            parsed = parse_delivery_frame(df)
+            if write:
+                db.bulk_insert("delivery_cache", db.DELIVERY_CACHE_COLUMNS,
+                               delivery_rows(symbol, parsed), conflict="REPLACE")
+
+
+def _cached_rows() -> list:
+    cols = ", ".join(db.DELIVERY_CACHE_COLUMNS)
+    return [tuple(r) for r in db.get_connection().execute(
+        f"SELECT {cols} FROM delivery_cache ORDER BY symbol, trade_date"
+    )]
+
+
+def bench_parse(args):
+    frames = _nse_frames(args.symbols, args.years)
+    n_rows = sum(len(df) for chunks in frames.values() for df in chunks)
+    print(f"NSE delivery frames ({args.symbols} symbols x {args.years} yearly chunks, {n_rows:,d} rows)")
+    print("=" * 72)
+
+    _report("legacy iterrows parse", n_rows, _timed(lambda: _legacy_delivery(frames, write=False)))
+    _report("vectorized parse", n_rows, _timed(lambda: _vectorized_delivery(frames, write=False)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_scratch_db(tmp)
+        _report("legacy parse + save", n_rows, _timed(lambda: _legacy_delivery(frames, write=True)))
+        legacy = _cached_rows()
+
+        db.get_connection().execute("DELETE FROM delivery_cache")
+        _report("vectorized + bulk insert", n_rows, _timed(lambda: _vectorized_delivery(frames, write=True)))
+        vectorized = _cached_rows()
+        db.close_connections()
+
+    mismatched = sum(1 for a, b in zip(legacy, vectorized) if a != b)
+    print(f"  cached rows: legacy {len(legacy):,d}, vectorized {len(vectorized):,d}, "
+          f"mismatched {mismatched + abs(len(legacy) - len(vectorized)):,d}")
+
+
+# ─── Delivery sync engine ────────────────────────────────────────────
+
+def _nse_stand_in(latency: float, error_rate: float, empty_symbols: set):
+    """
+    Local stand-in for nselib's price_volume_and_deliverable_position_data:
+    business-day rows for the requested range after `latency` seconds, a
+    "429 Too Many Requests" failure with probability `error_rate`, nothing
+    for `empty_symbols`.
+    """
+    import pandas as pd
+    from datetime import datetime
+
+    calls = {"count": 0}
+    lock = threading.Lock()
+
+    def fetch(symbol: str, from_date: str, to_date: str):
+        with lock:
+            calls["count"] += 1
+            fail = random.random() < error_rate
+        time.sleep(latency)
+        if fail:
+            raise Exception("Resource not available MSG: 429 Too Many Requests")
+        if symbol in empty_symbols:
+            return pd.DataFrame()
+        start = datetime.strptime(from_date, "%d-%m-%Y").date()
+        end = min(datetime.strptime(to_date, "%d-%m-%Y").date(), date.today() - timedelta(days=1))
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        return pd.DataFrame([{
+            "Date": d.strftime("%d-%b-%Y"), "PrevClose": 100.0, "OpenPrice": 100.0,
+            "HighPrice": 102.0, "LowPrice": 99.0, "ClosePrice": "101.00",
+            "TotalTradedQuantity": 10_000, "DeliverableQty": 4_000, "%DlyQttoTradedQty": 40.0,
+        } for d in days if d.weekday() < 5])
+
+    return fetch, calls
+
+
+def bench_delivery_sync(args):
+    from backend.app.services.delivery_sync import AdaptiveTokenBucket, run_delivery_sync
+
+    symbols = [f"SYM{i:03d}" for i in range(args.symbols)]
+    empty = set(symbols[::10])
+    period_days = 365 * args.years
+    print(f"Delivery sync ({args.symbols} symbols x {args.years}y, {len(empty)} without data, "
+          f"stand-in latency {args.latency * 1000:.0f}ms, error rate {args.error_rate:.0%})")
+    print("=" * 72)
+
+    def limiter():
+        return AdaptiveTokenBucket(args.max_rate / 2, 4, 0.5, args.max_rate, step=args.max_rate / 20)
+
+    def run(label: str, **kwargs) -> dict:
+        fetch, calls = _nse_stand_in(args.latency, args.error_rate, empty)
+        started = time.perf_counter()
+        try:
+            result = run_delivery_sync(symbols, period_days, trigger="bench", fetcher=fetch,
+                                       limiter=kwargs.pop("limiter", None) or limiter(), **kwargs)
+        except KeyboardInterrupt:
+            result = None
+        seconds = time.perf_counter() - started
+        if result is None:
+            print(f"  {label:28s} interrupted after {calls['count']:>5,d} requests  {seconds:7.2f}s")
+        else:
+            print(f"  {label:28s} {calls['count']:>5,d} requests  {result['records']:>9,d} rows  "
+                  f"{seconds:7.2f}s  rate {result['rate'] or 0:5.2f}/s  errors {result['errors']}")
+        return result
+
+    for workers in (1, args.workers):
+        with tempfile.TemporaryDirectory() as tmp:
+            use_scratch_db(tmp)
+            run(f"{workers} worker(s)", workers=workers)
+            run(f"{workers} worker(s), re-run", workers=workers)
+            db.close_connections()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        use_scratch_db(tmp)
+
+        def interrupt_halfway(done, total, result):
+            if done == total // 2:
+                raise KeyboardInterrupt
+
+        run("interrupted at 50%", workers=args.workers, progress=interrupt_halfway)
+        resumed = run("resumed", workers=args.workers)
+        print(f"  resumed run {resumed['id']}: {resumed['resumed']}, {resumed['done']}/{resumed['symbols']} symbols")
+        db.close_connections()
+
+
+# ─── FIFO engines ────────────────────────────────────────────────────
+
+def _synthetic_book(n_trades: int, n_symbols: int, start=date(2015, 1, 1)) -> list:
+    """
+    Trades as dicts sorted by (symbol, date, id).  Each symbol accumulates
+    many small buys and sells in larger blocks, so buy queues get long.
+    """
+    trades = []
+    per_symbol = max(n_trades // n_symbols, 1)
+    trade_id = 0
+    for s in range(n_symbols):
+        symbol = f"SYM{s:05d}"
+        price = random.uniform(20, 2000)
+        day = start
+        for _ in range(per_symbol):
+            trade_id += 1
+            day += timedelta(days=random.randint(0, 3))
+            price = max(1.0, price * random.uniform(0.97, 1.03))
+            is_buy = random.random() < 0.7
+            trades.append({
+                "id": trade_id,
+                "symbol": symbol,
+                "trade_date": day.isoformat(),
+                "trade_type": "buy" if is_buy else "sell",
+                "quantity": float(random.randint(1, 20) if is_buy else random.randint(1, 60)),
+                "price": round(price, 2),
+            })
+    return trades
+
+
+def bench_fifo(args):
+    from backend.app.services.fifo_reference import (
+        FIFO_WINDOWS, deque_fifo, legacy_fifo, same_results, trades_to_arrays,
+    )
+    from backend.app.services.fifo_vectorized import compute_realised_pnl_windows_vectorized
+
+    print(f"Generating {args.trades:,d} trades across {args.symbols:,d} symbols...")
+    book = _synthetic_book(args.trades, args.symbols)
+    print(f"FIFO realised P&L, {len(FIFO_WINDOWS)} windows")
+    print("=" * 72)
+
+    results = {}
+    if not args.skip_legacy:
+        start = time.perf_counter()
+        results["legacy"] = legacy_fifo(book, FIFO_WINDOWS)
+        _report("legacy pop(0), per window", len(book), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    results["deque"] = deque_fifo(book, FIFO_WINDOWS)
+    _report("deque of __slots__ lots", len(book), time.perf_counter() - start)
+
+    start = time.perf_counter()
+    arrays = trades_to_arrays(book)
+    load = time.perf_counter() - start
+    start = time.perf_counter()
+    results["vectorized"] = compute_realised_pnl_windows_vectorized(FIFO_WINDOWS, arrays)
+    _report("vectorized (NumPy)", len(book), time.perf_counter() - start)
+    print(f"  (array construction: {load:.3f}s)")
+
+    reference = results.get("legacy", results["deque"])
+    for name, result in results.items():
+        print(f"  {name:12s} matches reference: {same_results(reference, result)}")
+
+
+# ─── Load test: sync vs async routes ─────────────────────────────────
+#
+# The mock Kite server and each app variant run under uvicorn in their own
+# processes (as they would in production); the load generator runs here.
+# The mock answers after --latency seconds.  Caches are disabled and every
+# client has its own session, so each request reaches the mock.  The
+# client-side Kite rate limiter is lifted (the mock has no limit).
+
+LOAD_HOLDINGS = [
+    {"tradingsymbol": f"LOAD{i:02d}", "exchange": "NSE", "isin": None,
+     "average_price": 100.0 + i, "quantity": 10, "last_price": 110.0 + i, "pnl": 100.0}
+    for i in range(25)
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _process_cpu(pid: int) -> float:
+    """CPU seconds (user + system) used so far by `pid`; Linux /proc only, 0.0 elsewhere."""
+    try:
+        fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+    except OSError:
+        return 0.0
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _wait_for_port(port: int, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise SystemExit(f"server on port {port} did not start")
+
+
+def _mock_kite_app(latency: float):
+    from fastapi import FastAPI
+
+    app = FastAPI()
+
+    @app.get("/portfolio/holdings")
+    async def holdings():
+        await asyncio.sleep(latency)
+        return {"status": "success", "data": LOAD_HOLDINGS}
+
+    @app.get("/user/margins/equity")
+    async def margins():
+        await asyncio.sleep(latency)
+        return {"status": "success", "data": {"net": 50_000.0, "available": {"cash": 50_000.0}}}
+
+    return app
+
+
+def _sync_app():
+    """The pre-async handlers: sync `def` routes on the threadpool, same panels as the async routes."""
+    from fastapi import FastAPI, Request
+    from backend.app.services.dashboard import (
+        holdings_panel, overview_panel, resolve_state_sectors, trade_counts,
+    )
+    from backend.app.services.zerodha_holdings import fetch_zerodha_holdings
+
+    app = FastAPI()
+
+    @app.get("/portfolio/overview")
+    def overview(request: Request):
+        return overview_panel(fetch_zerodha_holdings(request.cookies.get("tf_session")))
+
+    @app.get("/portfolio/holdings")
+    def holdings(request: Request):
+        holdings = fetch_zerodha_holdings(request.cookies.get("tf_session"))
+        counts = trade_counts()
+        sectors = resolve_state_sectors(holdings, [])
+        return holdings_panel(holdings, sectors, counts)
+
+    return app
+
+
+def _async_app():
+    from fastapi import FastAPI
+    from backend.app.routes.portfolio import router
+
+    app = FastAPI()
+    app.include_router(router)
+    return app
+
+
+def _serve_mock(port: int, latency: float):
+    import uvicorn
+    uvicorn.run(_mock_kite_app(latency), host="127.0.0.1", port=port, log_level="warning")
+
+
+def _serve_app(kind: str, port: int, db_path: str, kite_root: str, pool: int):
+    """Child process: point the backend at the scratch DB and mock Kite, then serve."""
+    import logging
+    import uvicorn
+    from backend.app.services import kite_client, zerodha_holdings
+
+    logging.disable(logging.WARNING)
+    os.environ.setdefault("KITE_API_KEY", "bench")
+    db.DB_PATH = Path(db_path)
+    kite_client.KITE_API_ROOT = kite_root
+    kite_client.POOL_SIZE = pool
+    kite_client._bucket = kite_client.TokenBucket(1e9, 1e9)
+    for cache in (zerodha_holdings._holdings_cache, zerodha_holdings._margins_cache):
+        cache.ttl = cache.stale_ttl = 0
+    if kind == "sync":
+        # requests opens throwaway connections past pool_maxsize instead of
+        # waiting; block, so both servers are held to `pool` Kite connections
+        from requests.adapters import HTTPAdapter
+        kite_client.get_session().mount("http://", HTTPAdapter(pool_maxsize=pool, pool_block=True))
+
+    app = _sync_app() if kind == "sync" else _async_app()
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+async def _drive(url: str, sessions: list, total: int, concurrency: int) -> tuple:
+    """Send `total` GETs from `concurrency` clients; returns (latencies, errors, seconds)."""
+    import httpx
+
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def client(i: int):
+        nonlocal errors
+        cookies = {"tf_session": sessions[i % len(sessions)]}
+        async with httpx.AsyncClient(cookies=cookies, timeout=120) as http:
+            for _ in remaining:
+                start = time.perf_counter()
+                response = await http.get(url)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def bench_load(args):
+    import multiprocessing
+
+    ctx = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = use_scratch_db(tmp)
+        sessions = [db.save_zerodha_session(f"U{i}", f"token{i}") for i in range(args.concurrency)]
+        db.upsert_instruments_from_holdings(LOAD_HOLDINGS)
+        db.update_instrument_sectors([(h["tradingsymbol"], "NSE", "Technology", "Software") for h in LOAD_HOLDINGS])
+        db.close_connections()
+
+        mock_port = _free_port()
+        mock = ctx.Process(target=_serve_mock, args=(mock_port, args.latency), daemon=True)
+        mock.start()
+        _wait_for_port(mock_port)
+
+        print(f"{args.path}: {args.requests:,d} requests, {args.concurrency} concurrent clients, "
+              f"mock Kite latency {args.latency * 1000:.0f}ms, Kite pool {args.pool}")
+        print("=" * 72)
+
+        results = {}
+        try:
+            for kind in ("sync", "async"):
+                port = _free_port()
+                server = ctx.Process(
+                    target=_serve_app,
+                    args=(kind, port, str(db_path), f"http://127.0.0.1:{mock_port}", args.pool),
+                    daemon=True,
+                )
+                server.start()
+                _wait_for_port(port)
+                url = f"http://127.0.0.1:{port}{args.path}"
+
+                asyncio.run(_drive(url, sessions, args.concurrency, args.concurrency))  # warm-up
+                cpu = _process_cpu(server.pid)
+                latencies, errors, seconds = asyncio.run(
+                    _drive(url, sessions, args.requests, args.concurrency)
+                )
+                # The driver, mock and server share the machine; server CPU
+                # per request is the figure that doesn't depend on the others
+                cpu_ms = (_process_cpu(server.pid) - cpu) / args.requests * 1000
+                server.terminate()
+                server.join()
+
+                cuts = statistics.quantiles(latencies, n=100)
+                results[kind] = len(latencies) / seconds
+                print(f"  {kind:6s} {results[kind]:8.1f} req/s   p50 {cuts[49] * 1000:7.1f}ms   "
+                      f"p95 {cuts[94] * 1000:7.1f}ms   p99 {cuts[98] * 1000:7.1f}ms   "
+                      f"server cpu {cpu_ms:.2f}ms/req   errors {errors}")
+        finally:
+            mock.terminate()
+
+        print(f"  async / sync throughput: {results['async'] / results['sync']:.1f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description="TuneFolio backend benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    bulk = sub.add_parser("bulk", help="per-row vs executemany writes")
+    bulk.add_argument("--rows", type=int, default=100_000)
+    bulk.set_defaults(func=bench_bulk)
+
+    parse = sub.add_parser("parse", help="iterrows vs vectorized NSE delivery parsing")
+    parse.add_argument("--symbols", type=int, default=50)
+    parse.add_argument("--years", type=int, default=6)
+    parse.set_defaults(func=bench_parse)
+
+    dsync = sub.add_parser("delivery-sync", help="delivery sync engine against a local NSE stand-in")
+    dsync.add_argument("--symbols", type=int, default=30)
+    dsync.add_argument("--years", type=int, default=6)
+    dsync.add_argument("--workers", type=int, default=8)
+    dsync.add_argument("--latency", type=float, default=0.05, help="stand-in response delay (s)")
+    dsync.add_argument("--error-rate", type=float, default=0.02)
+    dsync.add_argument("--max-rate", type=float, default=100.0, help="limiter ceiling (req/s)")
+    dsync.set_defaults(func=bench_delivery_sync)
+
+    fifo = sub.add_parser("fifo", help="FIFO realised P&L engines on a synthetic book")
+    fifo.add_argument("--trades", type=int, default=1_000_000)
+    fifo.add_argument("--symbols", type=int, default=5_000)
+    fifo.add_argument("--skip-legacy", action="store_true")
+    fifo.set_defaults(func=bench_fifo)
+
+    load = sub.add_parser("load", help="sync vs async portfolio routes against a mock Kite")
+    load.add_argument("--path", default="/portfolio/overview",
+                      choices=["/portfolio/overview", "/portfolio/holdings"])
+    load.add_argument("--requests", type=int, default=4_000)
+    load.add_argument("--concurrency", type=int, default=200)
+    load.add_argument("--latency", type=float, default=0.1, help="mock Kite response delay (s)")
+    load.add_argument("--pool", type=int, default=20, help="Kite client connection pool size")
+    load.set_defaults(func=bench_load)
+
+    args = parser.parse_args()
+    random.seed(42)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
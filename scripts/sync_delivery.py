@@ -9,6 +9,11 @@ Usage:
     python scripts/sync_delivery.py              # sync 1 year data
     python scripts/sync_delivery.py --period 3m  # sync 3 months
 
+Only date ranges missing from the coverage index are fetched, so a daily run is
+one small request per symbol.  Requests run in parallel (--workers) under an
+adaptive rate limit.  Interrupt with Ctrl-C and run the same command again to
+resume where it stopped (--fresh starts over).
+
 After syncing, the DB file (backend/data/tunefolio.db) needs to be
 accessible by the Render deployment. Options:
     1. Push DB to repo (simple, works for personal use)
@@ -20,26 +25,21 @@ To use the API endpoint instead:
 import sys
 import os
 import argparse
-import time
 
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from backend.app.services.db import (
-    create_delivery_cache_table,
-    get_connection
+    get_connection,
+    run_migrations
 )
-from backend.app.services.delivery import fetch_and_cache_delivery
+from backend.app.services.delivery_sync import DELIVERY_SYNC_WORKERS, DeliverySyncBusy, run_delivery_sync
 
 
 def get_all_symbols_from_db():
     """Get all unique symbols from the instruments table (any exchange).
     NSE delivery data may exist even for stocks Zerodha lists as BSE."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT symbol FROM instruments")
-    rows = cursor.fetchall()
-    conn.close()
+    rows = get_connection().execute("SELECT DISTINCT symbol FROM instruments").fetchall()
     return [row["symbol"] for row in rows]
 
 
@@ -47,13 +47,17 @@ def main():
     parser = argparse.ArgumentParser(description="Sync delivery data from NSE")
     parser.add_argument("--period", default="1y", choices=["3m", "6m", "1y"],
                         help="Period to sync (default: 1y)")
+    parser.add_argument("--workers", type=int, default=DELIVERY_SYNC_WORKERS,
+                        help=f"Concurrent NSE requests (default: {DELIVERY_SYNC_WORKERS})")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Start a new run instead of resuming an interrupted one")
     args = parser.parse_args()
 
     period_map = {"1y": 365, "6m": 180, "3m": 90}
     period_days = period_map[args.period]
 
-    # Ensure table exists
-    create_delivery_cache_table()
+    # Ensure schema is up to date
+    run_migrations()
 
     # Get symbols (all exchanges — NSE data may exist for BSE-listed stocks too)
     symbols = get_all_symbols_from_db()
@@ -65,29 +69,34 @@ def main():
     print(f"Syncing delivery data for {len(symbols)} symbols ({args.period})...")
     print("=" * 60)
 
-    success = 0
-    failed = 0
-
-    for i, sym in enumerate(symbols, 1):
-        try:
-            data = fetch_and_cache_delivery(sym, period_days)
-            count = len(data)
-            status = f"{count} records" if count > 0 else "no data"
-            print(f"  [{i}/{len(symbols)}] {sym:20s} -> {status}")
-            if count > 0:
-                success += 1
-            else:
-                failed += 1
-        except Exception as e:
-            print(f"  [{i}/{len(symbols)}] {sym:20s} -> ERROR: {e}")
-            failed += 1
-
-        # Small delay to avoid NSE rate limiting
-        if i < len(symbols):
-            time.sleep(1)
+    def report(done: int, total: int, result: dict):
+        status = f"{result['records']} records" if result["records"] > 0 else "no data"
+        if result["status"] == "unavailable":
+            status = f"skipped: {result['reason']}"
+        elif result["status"] == "up_to_date":
+            status = "up to date"
+        elif result["status"] == "failed":
+            status = f"ERROR: {result['reason']}"
+        print(f"  [{done}/{total}] {result['symbol']:20s} -> {status} "
+              f"(fetched {result['fetched_days']}d, skipped {result['skipped_days']}d)")
+
+    try:
+        run = run_delivery_sync(symbols, period_days, trigger="script", workers=args.workers,
+                                progress=report, resume=not args.fresh)
+    except KeyboardInterrupt:
+        print("\nInterrupted — run the same command again to resume.")
+        return
+    except DeliverySyncBusy as e:
+        print(f"{e}; try again once it has finished.")
+        return
 
+    failed = sum(1 for r in run["results"].values() if r["status"] in ("failed", "unavailable"))
     print("=" * 60)
-    print(f"Done. Success: {success}, Failed/Empty: {failed}, Total: {len(symbols)}")
+    if run["resumed"]:
+        print(f"Resumed run {run['id']}.")
+    print(f"Done. {run['requests']} requests, {run['records']} records, "
+          f"Failed/Unavailable: {failed}, Total: {run['symbols']} "
+          f"(final rate {run['rate'] or 0:.2f} req/s)")
 
 
 if __name__ == "__main__":
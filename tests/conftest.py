@@ -0,0 +1,40 @@
+"""
+Shared fixtures: every test gets a freshly migrated scratch database
+(the real backend/data/tunefolio.db is never touched).
+"""
+
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from backend.app.services import db
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    """This thread's connection to a migrated, empty database."""
+    db.close_connections()
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "test.db")
+    db.run_migrations()
+    yield db.get_connection()
+    db.close_connections()
+
+
+@contextmanager
+def traced(conn):
+    """Collect the (parameter-expanded) SQL statements run on `conn`."""
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        yield statements
+    finally:
+        conn.set_trace_callback(None)
+
+
+def query_plan(conn, sql: str) -> list:
+    """EXPLAIN QUERY PLAN detail lines for `sql`."""
+    return [row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
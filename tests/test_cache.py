@@ -0,0 +1,99 @@
+"""
+SingleFlightCache: a cancelled leader hands the load to a waiter, and the
+LRU, size and TTL bounds evict what they should.
+"""
+
+import asyncio
+
+import pytest
+
+from backend.app.services import cache as cache_module
+from backend.app.services.cache import SingleFlightCache
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    return clock
+
+
+def _fill(cache, *keys):
+    for key in keys:
+        cache.get(key, lambda key=key: key)
+
+
+def test_cancelled_lead_load_is_taken_over_by_a_waiter():
+    cache = SingleFlightCache("test-cancel", ttl=60)
+    calls = []
+
+    async def slow_loader():
+        calls.append("slow")
+        await asyncio.sleep(10)
+
+    async def fast_loader():
+        calls.append("fast")
+        return "value"
+
+    async def scenario():
+        lead = asyncio.create_task(cache.aget("k", slow_loader))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(cache.aget("k", fast_loader)) for _ in range(3)]
+        await asyncio.sleep(0)
+
+        lead.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await lead
+        # One waiter reloads; the others share its result
+        return await asyncio.wait_for(asyncio.gather(*waiters), timeout=1)
+
+    assert asyncio.run(scenario()) == ["value"] * 3
+    assert calls == ["slow", "fast"]
+    assert cache.stats()["load_errors"] == 0
+    assert cache.get("k", lambda: "reloaded") == "value"
+
+
+def test_least_recently_used_entry_is_evicted_first(clock):
+    cache = SingleFlightCache("test-lru", ttl=60, max_entries=2)
+    _fill(cache, "a", "b")
+    cache.get("a", lambda: "unused")     # a is now the most recent
+    _fill(cache, "c")
+
+    assert list(cache._entries) == ["a", "c"]
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_are_evicted_to_fit_max_bytes(clock):
+    cache = SingleFlightCache("test-bytes", ttl=60, max_bytes=30)
+    for key in ("a", "b", "c"):
+        cache.get(key, lambda: "x" * 10)  # 12 bytes encoded
+
+    stats = cache.stats()
+    assert list(cache._entries) == ["b", "c"]
+    assert (stats["bytes"], stats["evictions"]) == (24, 1)
+
+    # A value larger than the whole budget is returned but not stored
+    assert cache.get("big", lambda: "x" * 40) == "x" * 40
+    assert list(cache._entries) == ["b", "c"]
+
+
+def test_entries_past_ttl_plus_stale_expire_on_write(clock):
+    cache = SingleFlightCache("test-ttl", ttl=10, stale_ttl=5)
+    _fill(cache, "old")
+    clock.now += 12
+    _fill(cache, "new")
+    assert list(cache._entries) == ["old", "new"]   # stale, still served
+
+    clock.now += 4                       # old is 16s old: past ttl + stale
+    _fill(cache, "newer")
+    assert list(cache._entries) == ["new", "newer"]
+    assert cache.stats()["expirations"] == 1
+    assert cache.get("old", lambda: "reloaded") == "reloaded"
@@ -0,0 +1,124 @@
+"""
+Delivery data read path: what an empty answer means, how the coverage
+index merges fetched ranges, and which ranges it says are still missing.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app.routes import portfolio
+from backend.app.services import db, delivery
+
+
+def test_covered_period_without_rows_is_no_data(conn, monkeypatch):
+    def no_request(*args):
+        raise AssertionError("covered range fetched again")
+
+    monkeypatch.setattr(delivery.capital_market, "price_volume_and_deliverable_position_data", no_request)
+    today = date.today()
+    db.add_delivery_coverage("SMEONLY", (today - timedelta(days=400)).isoformat(),
+                             (today - timedelta(days=1)).isoformat())
+    # The "empty" negative entry has expired; the coverage still stands
+    with db.transaction():
+        conn.execute("""
+            INSERT INTO delivery_unavailable (symbol, reason, attempts, retry_at)
+            VALUES ('SMEONLY', 'empty', 1, 0)
+        """)
+
+    result = delivery.fetch_delivery_data("SMEONLY", 365)
+    assert result == {"status": "no_data", "reason": "empty", "retry_at": None, "data": []}
+
+
+def test_failed_lookup_is_reported_as_an_error(conn, monkeypatch):
+    def broken(symbol, period_days):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(delivery, "fetch_delivery_data", broken)
+    app = FastAPI()
+    app.include_router(portfolio.router)
+
+    body = TestClient(app).get("/portfolio/delivery-data?symbol=INFY").json()
+    assert (body["status"], body["reason"], body["count"]) == ("no_data", "error", 0)
+
+
+def _d(day: str) -> date:
+    """'01-05' → 2024-01-05."""
+    return date.fromisoformat(f"2024-{day}")
+
+
+@pytest.mark.parametrize("covered, window, missing", [
+    ([], ("01-01", "01-10"), [("01-01", "01-10")]),
+    ([("01-01", "01-10")], ("01-01", "01-10"), []),
+    ([("01-01", "01-31")], ("01-05", "01-10"), []),                          # window inside coverage
+    ([("01-05", "01-10")], ("01-01", "01-10"), [("01-01", "01-04")]),        # gap at the start
+    ([("01-01", "01-05")], ("01-01", "01-10"), [("01-06", "01-10")]),        # gap at the end
+    ([("01-04", "01-06")], ("01-01", "01-10"), [("01-01", "01-03"), ("01-07", "01-10")]),
+    ([("01-01", "01-03"), ("01-07", "01-10")], ("01-01", "01-10"), [("01-04", "01-06")]),
+    ([("01-01", "01-03"), ("01-05", "01-05")], ("01-02", "01-08"), [("01-04", "01-04"), ("01-06", "01-08")]),
+    ([("01-09", "01-20")], ("01-01", "01-10"), [("01-01", "01-08")]),        # coverage runs past the end
+    ([("01-20", "01-31")], ("01-01", "01-10"), [("01-01", "01-10")]),        # coverage outside the window
+])
+def test_missing_ranges(conn, covered, window, missing):
+    with db.transaction():
+        conn.executemany(
+            "INSERT INTO delivery_coverage (symbol, start_date, end_date) VALUES ('INFY', ?, ?)",
+            [(_d(start).isoformat(), _d(end).isoformat()) for start, end in covered],
+        )
+        # Another symbol's coverage never counts
+        conn.execute("""
+            INSERT INTO delivery_coverage (symbol, start_date, end_date)
+            VALUES ('TCS', '2023-01-01', '2024-12-31')
+        """)
+
+    assert delivery.missing_ranges("INFY", _d(window[0]), _d(window[1])) == [
+        (_d(start), _d(end)) for start, end in missing
+    ]
+
+
+@pytest.mark.parametrize("existing, added, merged", [
+    ([("01-01", "01-05")], ("01-06", "01-10"), [("01-01", "01-10")]),        # adjacent after
+    ([("01-06", "01-10")], ("01-01", "01-05"), [("01-01", "01-10")]),        # adjacent before
+    ([("01-01", "01-05")], ("01-04", "01-10"), [("01-01", "01-10")]),        # overlapping
+    ([("01-01", "01-10")], ("01-03", "01-05"), [("01-01", "01-10")]),        # inside an existing one
+    ([("01-03", "01-05")], ("01-01", "01-10"), [("01-01", "01-10")]),        # swallows an existing one
+    ([("01-01", "01-03"), ("01-07", "01-10")], ("01-04", "01-06"), [("01-01", "01-10")]),  # bridges two
+    ([("01-01", "01-05")], ("01-07", "01-10"), [("01-01", "01-05"), ("01-07", "01-10")]),  # one-day gap
+])
+def test_add_delivery_coverage_merges(conn, existing, added, merged):
+    for start, end in existing:
+        db.add_delivery_coverage("INFY", _d(start).isoformat(), _d(end).isoformat())
+    db.add_delivery_coverage("TCS", "2024-01-01", "2024-01-31")
+
+    db.add_delivery_coverage("INFY", _d(added[0]).isoformat(), _d(added[1]).isoformat())
+
+    assert db.get_delivery_coverage("INFY", "2023-01-01", "2024-12-31") == [
+        (_d(start).isoformat(), _d(end).isoformat()) for start, end in merged
+    ]
+    assert db.get_delivery_coverage("TCS", "2023-01-01", "2024-12-31") == [("2024-01-01", "2024-01-31")]
+
+
+def test_merged_coverage_counts_cached_rows_once(conn):
+    def cache(*days):
+        with db.transaction():
+            conn.executemany("INSERT OR REPLACE INTO delivery_cache (symbol, trade_date) VALUES ('INFY', ?)",
+                             [(_d(day).isoformat(),) for day in days])
+
+    def rows():
+        return [r[0] for r in conn.execute("SELECT rows FROM delivery_coverage WHERE symbol = 'INFY'")]
+
+    cache("01-01", "01-02", "01-03", "01-04", "01-05")
+    db.add_delivery_coverage("INFY", "2024-01-01", "2024-01-05")
+    assert rows() == [5]
+
+    # Refetching days already covered adds no rows
+    cache("01-03", "01-04", "01-05")
+    db.add_delivery_coverage("INFY", "2024-01-03", "2024-01-05")
+    assert rows() == [5]
+
+    # An overlapping fetch counts only the new days
+    cache("01-04", "01-05", "01-08", "01-09")
+    db.add_delivery_coverage("INFY", "2024-01-04", "2024-01-10")
+    assert rows() == [7]
@@ -0,0 +1,129 @@
+"""
+run_delivery_sync against a stand-in NSE fetcher: resuming interrupted
+runs, run ownership, and how blocked answers steer the limiter.
+"""
+
+import os
+import socket
+import time
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from backend.app.services import delivery_sync
+from backend.app.services.delivery import get_unavailable
+from backend.app.services.delivery_sync import AdaptiveTokenBucket, DeliverySyncBusy, run_delivery_sync
+
+PERIOD_DAYS = 800   # three NSE chunks per symbol
+
+
+def _nse(blocked=()):
+    """nselib stand-in: weekday rows for any range; an HTML-page frame for `blocked` symbols."""
+    calls = []
+
+    def fetch(symbol, from_date, to_date):
+        calls.append((symbol, from_date, to_date))
+        if symbol in blocked:
+            return pd.DataFrame({"<html>": ["Access Denied"]})
+        start = datetime.strptime(from_date, "%d-%m-%Y").date()
+        end = min(datetime.strptime(to_date, "%d-%m-%Y").date(), date.today() - timedelta(days=1))
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        return pd.DataFrame([{
+            "Date": d.strftime("%d-%b-%Y"), "PrevClose": 100.0, "OpenPrice": 100.0,
+            "HighPrice": 102.0, "LowPrice": 99.0, "ClosePrice": "101.00",
+            "TotalTradedQuantity": 10_000, "DeliverableQty": 4_000, "%DlyQttoTradedQty": 40.0,
+        } for d in days if d.weekday() < 5])
+
+    return fetch, calls
+
+
+def _limiter(rate: float = 4.0) -> AdaptiveTokenBucket:
+    # A deep burst, so acquire() never sleeps
+    return AdaptiveTokenBucket(rate, 10_000, 0.1, 4.0)
+
+
+def _insert_run(conn, status: str, owner_pid: int, updated_at: float, symbols='["AAA"]') -> int:
+    start_date = (date.today() - timedelta(days=PERIOD_DAYS)).isoformat()
+    return conn.execute("""
+        INSERT INTO delivery_sync_runs (
+            trigger, status, period_days, start_date, symbols, total, started_at,
+            owner_pid, owner_host, updated_at
+        ) VALUES ('script', ?, ?, ?, ?, 1, '2024-01-01T00:00:00', ?, ?, ?)
+    """, (status, PERIOD_DAYS, start_date, symbols, owner_pid, socket.gethostname(), updated_at)).lastrowid
+
+
+def test_interrupted_run_resumes_without_refetching(conn):
+    fetch, calls = _nse()
+
+    def stop_after_first_symbol(done, total, result):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        run_delivery_sync(["AAA", "BBB", "CCC"], PERIOD_DAYS, trigger="script", workers=1,
+                          fetcher=fetch, limiter=_limiter(), progress=stop_after_first_symbol)
+    run = conn.execute("SELECT id, status, done FROM delivery_sync_runs").fetchone()
+    assert (run["status"], run["done"]) == ("interrupted", 1)
+    first_calls = list(calls)
+
+    result = run_delivery_sync(["CCC", "BBB", "AAA"], PERIOD_DAYS, trigger="script", workers=1,
+                               fetcher=fetch, limiter=_limiter())
+    assert (result["id"], result["resumed"], result["status"]) == (run["id"], True, "completed")
+    assert set(result["results"]) == {"AAA", "BBB", "CCC"}
+
+    resumed_calls = calls[len(first_calls):]
+    assert not any(symbol == "AAA" for symbol, _, _ in resumed_calls)
+    # Chunks cached before the interrupt are not requested again
+    assert not set(first_calls) & set(resumed_calls)
+    assert len(calls) == 9
+
+
+def test_limiter_backs_off_on_blocked_answers(conn):
+    fetch, _ = _nse(blocked={"BLOCKED"})
+    limiter = _limiter()
+
+    run_delivery_sync(["AAA"], PERIOD_DAYS, workers=1, fetcher=fetch, limiter=limiter)
+    assert limiter.rate == 4.0          # rows at the ceiling keep it there
+
+    run_delivery_sync(["BLOCKED"], PERIOD_DAYS, workers=1, fetcher=fetch, limiter=limiter)
+    assert limiter.rate == pytest.approx(4.0 * delivery_sync.NSE_THROTTLED_BACKOFF)
+
+
+def test_blocked_symbol_skips_its_remaining_chunks(conn):
+    fetch, calls = _nse(blocked={"BLOCKED"})
+
+    result = run_delivery_sync(["AAA", "BLOCKED"], PERIOD_DAYS, workers=1, fetcher=fetch, limiter=_limiter())
+
+    assert [c[0] for c in calls].count("BLOCKED") == 1
+    assert [c[0] for c in calls].count("AAA") == 3
+    blocked = result["results"]["BLOCKED"]
+    assert (blocked["status"], blocked["reason"], blocked["requests"]) == ("failed", "blocked", 1)
+    assert get_unavailable("BLOCKED")["reason"] == "blocked"
+
+
+def test_run_with_a_live_owner_is_left_alone(conn):
+    run_id = _insert_run(conn, "running", os.getppid(), time.time())
+    fetch, calls = _nse()
+
+    with pytest.raises(DeliverySyncBusy):
+        run_delivery_sync(["AAA"], PERIOD_DAYS, fetcher=fetch, limiter=_limiter())
+    assert calls == []
+    assert conn.execute("SELECT status FROM delivery_sync_runs WHERE id = ?", (run_id,)).fetchone()[0] == "running"
+
+
+def test_stale_run_is_resumed_and_other_orphans_abandoned(conn):
+    stale = _insert_run(conn, "running", os.getppid(), time.time() - delivery_sync.RUN_STALE_SECONDS - 1)
+    orphan = _insert_run(conn, "running", os.getpid(), time.time(), symbols='["ZZZ"]')
+    fetch, _ = _nse()
+
+    result = run_delivery_sync(["AAA"], PERIOD_DAYS, fetcher=fetch, limiter=_limiter())
+    assert (result["id"], result["resumed"], result["status"]) == (stale, True, "completed")
+    statuses = dict(conn.execute("SELECT id, status FROM delivery_sync_runs").fetchall())
+    assert statuses == {stale: "completed", orphan: "abandoned"}
+
+
+def test_close_keeps_an_abandoned_status(conn):
+    run_id = _insert_run(conn, "abandoned", os.getpid(), time.time())
+
+    assert not delivery_sync._close_run(run_id, "completed", time.perf_counter())
+    assert conn.execute("SELECT status FROM delivery_sync_runs WHERE id = ?", (run_id,)).fetchone()[0] == "abandoned"
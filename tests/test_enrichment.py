@@ -0,0 +1,30 @@
+"""
+Sector enrichment: only a definite "no sector" answer is negatively cached.
+"""
+
+import json
+
+from backend.app.services import enrichment, instruments
+
+
+def _status(conn, symbol: str) -> str:
+    return conn.execute("SELECT status FROM sector_enrichment WHERE symbol = ?", (symbol,)).fetchone()[0]
+
+
+def test_no_sector_answer_is_cached_as_unavailable(conn, monkeypatch):
+    def no_sector(symbol, exchange):
+        raise instruments.NoSectorData(f"Sector data unavailable for {symbol}")
+
+    monkeypatch.setattr(instruments, "fetch_sector_industry", no_sector)
+    enrichment._enrich_one("SMEONLY", "BSE")
+    assert _status(conn, "SMEONLY") == "unavailable"
+
+
+def test_unparseable_response_is_retried(conn, monkeypatch):
+    def throttled(symbol, exchange):
+        # What a throttled HTML page looks like to a JSON parser (a ValueError subclass)
+        raise json.JSONDecodeError("Expecting value", "<html>Too Many Requests</html>", 0)
+
+    monkeypatch.setattr(instruments, "fetch_sector_industry", throttled)
+    enrichment._enrich_one("INFY", "NSE")
+    assert _status(conn, "INFY") == "retry"
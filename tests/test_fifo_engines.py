@@ -0,0 +1,170 @@
+"""
+FIFO engine equivalence on randomized books.
+
+The original list-of-dicts engine (fifo_reference.legacy_fifo) is
+the reference.  The lot ledger (through the database), its deque replay
+and the vectorized engine must agree with it on every generated book:
+partial fills, sells larger than the open lots, fractional quantities and
+buys and sells sharing a timestamp.
+"""
+
+import random
+
+import pytest
+
+from backend.app.services import db
+from backend.app.services.analytics import (
+    get_exited_positions, get_realised_pnl_by_fy, get_trade_counts, refresh_analytics,
+)
+from backend.app.services.fifo_reference import (
+    FIFO_WINDOWS, deque_fifo, legacy_fifo, same_results, trades_to_arrays,
+)
+from backend.app.services.fifo_vectorized import compute_realised_pnl_windows_vectorized
+from backend.app.services.trades import compute_realised_pnl_windows
+
+EXEC_TIMES = ["", "09:15:00", "09:15:00", "11:30:00", "15:29:59"]
+
+
+def _chrono(t) -> tuple:
+    """lot_ledger.TRADE_ORDER: date, execution time, buys before sells, id."""
+    return (t["symbol"], t["trade_date"], t["exec_time"], t["trade_type"], t["id"])
+
+
+def _random_book(rng, n_trades: int, n_symbols: int, fractional: bool) -> list:
+    """Trades in insertion (id) order; few distinct times per day, so ties are common."""
+    days = {f"SYM{s}": 0 for s in range(n_symbols)}
+    trades = []
+    for trade_id in range(1, n_trades + 1):
+        symbol = rng.choice(list(days))
+        days[symbol] += rng.randint(0, 2)
+        year, day = divmod(days[symbol], 360)
+        is_buy = rng.random() < 0.6
+        quantity = float(rng.randint(1, 20) if is_buy else rng.randint(1, 40))
+        if fractional:
+            quantity += rng.choice([0.0, 0.5, 0.00005, 0.99995])
+        trades.append({
+            "id": trade_id,
+            "symbol": symbol,
+            "trade_date": f"{2018 + year}-{day // 30 + 1:02d}-{day % 30 + 1:02d}",
+            "exec_time": rng.choice(EXEC_TIMES),
+            "trade_type": "buy" if is_buy else "sell",
+            "quantity": quantity,
+            "price": round(rng.uniform(10, 5000), 2),
+        })
+    return trades
+
+
+def _insert(book: list):
+    db.insert_trades((
+        (t["symbol"], None, t["trade_date"], "NSE", "EQ", "EQ", t["trade_type"], "",
+         t["quantity"], t["price"], f"T{t['id']}", f"O{t['id']}", t["exec_time"], "test", t.get("user_id", ""))
+        for t in book
+    ))
+
+
+def _all_engines(book: list) -> dict:
+    """Every engine's results, plus the reference, for a book already in the database."""
+    ordered = sorted(book, key=_chrono)
+    return {
+        "legacy": legacy_fifo(ordered, FIFO_WINDOWS),
+        "deque": deque_fifo(ordered, FIFO_WINDOWS),
+        "vectorized": compute_realised_pnl_windows_vectorized(FIFO_WINDOWS, trades_to_arrays(ordered)),
+        "ledger": compute_realised_pnl_windows(FIFO_WINDOWS),
+        "vectorized_db": compute_realised_pnl_windows(FIFO_WINDOWS, engine="vectorized"),
+    }
+
+
+@pytest.mark.parametrize("fractional", [False, True], ids=["whole", "fractional"])
+@pytest.mark.parametrize("seed", range(25))
+def test_engines_match_legacy(conn, seed, fractional):
+    rng = random.Random(seed)
+    book = _random_book(rng, rng.randint(1, 300), rng.randint(1, 6), fractional)
+    _insert(book)
+
+    results = _all_engines(book)
+    expected = results.pop("legacy")
+    for name, result in results.items():
+        assert same_results(expected, result), name
+
+
+def test_ledger_matches_legacy_after_incremental_inserts(conn):
+    rng = random.Random(7)
+    book = _random_book(rng, 400, 4, fractional=False)
+
+    # Apply in three batches, refreshing the ledger between them; later
+    # batches contain back-dated trades that force per-symbol rebuilds.
+    for batch in (book[:150], book[150:300], book[300:]):
+        _insert(batch)
+        compute_realised_pnl_windows(FIFO_WINDOWS)
+
+    ordered = sorted(book, key=_chrono)
+    assert same_results(legacy_fifo(ordered, FIFO_WINDOWS), compute_realised_pnl_windows(FIFO_WINDOWS))
+
+
+def test_same_timestamp_buy_applies_before_sell(conn):
+    # The sell was recorded first; the original engine's ORDER BY had no
+    # tie-break, so it matched in insertion order and realised nothing.
+    book = [
+        {"id": 1, "symbol": "INFY", "trade_date": "2024-05-02", "exec_time": "10:00:00",
+         "trade_type": "sell", "quantity": 10.0, "price": 120.0},
+        {"id": 2, "symbol": "INFY", "trade_date": "2024-05-02", "exec_time": "10:00:00",
+         "trade_type": "buy", "quantity": 10.0, "price": 100.0},
+    ]
+    _insert(book)
+
+    assert legacy_fifo(book, {"all": (None, None)})["all"]["total_realised_pnl"] == 0.0
+    for name, result in _all_engines(book).items():
+        assert result["all"]["total_realised_pnl"] == 200.0, name
+        assert result["all"]["by_symbol"]["INFY"]["qty_sold"] == 10.0, name
+
+
+def test_residuals_within_epsilon_are_dropped(conn):
+    # A lot left with 0.00005 units after the first sell is discarded, and
+    # so is the 0.00005 the last sell has left over: neither may be matched
+    # against a lot priced 10,000x higher.
+    book = [
+        {"id": 1, "symbol": "TINY", "trade_date": "2024-01-01", "exec_time": "",
+         "trade_type": "buy", "quantity": 1.00005, "price": 100.0},
+        {"id": 2, "symbol": "TINY", "trade_date": "2024-01-02", "exec_time": "",
+         "trade_type": "sell", "quantity": 1.0, "price": 100.0},
+        {"id": 3, "symbol": "TINY", "trade_date": "2024-01-03", "exec_time": "",
+         "trade_type": "buy", "quantity": 10.0, "price": 1_000_000.0},
+        {"id": 4, "symbol": "TINY", "trade_date": "2024-01-04", "exec_time": "",
+         "trade_type": "sell", "quantity": 10.0, "price": 1_000_000.0},
+        {"id": 5, "symbol": "TINY", "trade_date": "2024-01-05", "exec_time": "",
+         "trade_type": "buy", "quantity": 5.0, "price": 100.0},
+        {"id": 6, "symbol": "TINY", "trade_date": "2024-01-06", "exec_time": "",
+         "trade_type": "buy", "quantity": 5.0, "price": 1_000_000.0},
+        {"id": 7, "symbol": "TINY", "trade_date": "2024-01-07", "exec_time": "",
+         "trade_type": "sell", "quantity": 5.00005, "price": 100.0},
+    ]
+    _insert(book)
+
+    for name, result in _all_engines(book).items():
+        assert result["all"]["total_realised_pnl"] == 0.0, name
+
+
+def test_sells_never_match_another_accounts_lots(conn):
+    # AB1234's buy must not cover CD5678's earlier-dated sell
+    book = [
+        {"id": 1, "user_id": "AB1234", "symbol": "INFY", "trade_date": "2024-05-01", "exec_time": "",
+         "trade_type": "buy", "quantity": 10.0, "price": 100.0},
+        {"id": 2, "user_id": "CD5678", "symbol": "INFY", "trade_date": "2024-05-02", "exec_time": "",
+         "trade_type": "sell", "quantity": 10.0, "price": 150.0},
+        {"id": 3, "user_id": "AB1234", "symbol": "INFY", "trade_date": "2024-05-03", "exec_time": "",
+         "trade_type": "sell", "quantity": 10.0, "price": 120.0},
+    ]
+    _insert(book)
+
+    for engine in ("ledger", "vectorized"):
+        result = compute_realised_pnl_windows(FIFO_WINDOWS, engine=engine)["all"]
+        assert result["total_realised_pnl"] == 200.0, engine
+        assert result["by_symbol"]["INFY"] == {"realised_pnl": 200.0, "qty_sold": 20.0}, engine
+        assert result["total_sells"] == 2, engine
+
+    refresh_analytics()
+    by_fy = get_realised_pnl_by_fy(["FY2024-25"])["FY2024-25"]
+    assert by_fy["by_symbol"]["INFY"] == {"realised_pnl": 200.0, "qty_sold": 20.0}
+    assert get_trade_counts() == {"INFY": 3}
+    # AB1234 exited; CD5678 only ever sold, so it has no exited position
+    assert [(r["user_id"], r["symbol"]) for r in get_exited_positions()] == [("AB1234", "INFY")]
@@ -0,0 +1,33 @@
+"""
+job_runs history is pruned to the last JOB_RUNS_KEEP runs of each job.
+"""
+
+from conftest import query_plan, traced
+
+from backend.app.services import job_store
+
+
+def _run_ids(conn, job_id: str) -> list:
+    return [r[0] for r in conn.execute("SELECT id FROM job_runs WHERE job_id = ? ORDER BY id", (job_id,))]
+
+
+def test_history_keeps_the_last_runs_of_each_job(conn, monkeypatch):
+    monkeypatch.setattr(job_store, "JOB_RUNS_KEEP", 3)
+    for i in range(5):
+        job_store.record_job_run("trade_sync_morning", "ok", duration_ms=float(i))
+    job_store.record_job_run("snapshot_eod", "missed", scheduled_at="2024-06-03T16:35:00+05:30")
+    job_store.record_job_run("trade_sync_morning", "error", "HTTP 503", duration_ms=5.0)
+
+    assert _run_ids(conn, "trade_sync_morning") == [4, 5, 7]
+    assert _run_ids(conn, "snapshot_eod") == [6]
+    assert job_store.get_job_duration_stats()["trade_sync_morning"]["runs"] == 3
+    assert [f["error"] for f in job_store.get_recent_job_failures()] == ["HTTP 503", None]
+
+
+def test_pruning_uses_the_job_index(conn):
+    with traced(conn) as statements:
+        job_store.record_job_run("trade_sync_morning", "ok")
+
+    delete = next(sql for sql in statements if sql.lstrip().startswith("DELETE FROM job_runs"))
+    plan = query_plan(conn, delete)
+    assert not any(step.startswith("SCAN job_runs") for step in plan), plan
@@ -0,0 +1,148 @@
+"""
+kite_client against a local stand-in Kite server: which calls are retried,
+how long it backs off, timeouts, and the 10 requests/second bucket.
+"""
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+import requests
+
+from backend.app.services import kite_client
+from backend.app.services.kite_client import TokenBucket
+
+
+class _Kite(BaseHTTPRequestHandler):
+    """Answers each path with the next status scripted for it (then 200)."""
+
+    def _answer(self):
+        server = self.server
+        with server.lock:
+            server.hits.append((self.command, self.path, time.monotonic()))
+            script = server.script.get(self.path, [])
+            status = script.pop(0) if script else 200
+        if self.path == "/slow":
+            time.sleep(0.5)
+        body = b'{"status": "success", "data": []}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._answer()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._answer()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def kite(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Kite)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.hits = []
+    server.script = {}
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    monkeypatch.setattr(kite_client, "KITE_API_ROOT", f"http://127.0.0.1:{server.server_address[1]}")
+    monkeypatch.setattr(kite_client, "_bucket", TokenBucket(1000, 1000))
+    monkeypatch.setattr(kite_client, "RETRY_BACKOFF_BASE", 0.05)
+    # No jitter, so the backoff is exactly base * 2**attempt
+    monkeypatch.setattr(kite_client.random, "uniform", lambda a, b: 1.0)
+    kite_client.close_session()
+    yield server
+    kite_client.close_session()
+    server.shutdown()
+    server.server_close()
+
+
+def _gaps(hits) -> list:
+    return [later[2] - earlier[2] for earlier, later in zip(hits, hits[1:])]
+
+
+@pytest.mark.parametrize("status", [503, 429])
+def test_get_is_retried_with_backoff(kite, status):
+    kite.script["/portfolio/holdings"] = [status, status]
+
+    response = kite_client.kite_get("/portfolio/holdings", "tok", api_key="key")
+
+    assert response.status_code == 200
+    assert len(kite.hits) == 3
+    first, second = _gaps(kite.hits)
+    assert first >= 0.05 and second >= 0.1
+
+
+def test_get_returns_the_last_error_once_retries_run_out(kite):
+    kite.script["/trades"] = [503] * (kite_client.MAX_RETRIES + 1)
+
+    assert kite_client.kite_get("/trades", "tok", api_key="key").status_code == 503
+    assert len(kite.hits) == kite_client.MAX_RETRIES + 1
+
+
+def test_get_times_out_and_retries(kite, monkeypatch):
+    monkeypatch.setitem(kite_client.TIMEOUTS, "/slow", (1, 0.1))
+
+    started = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        kite_client.kite_get("/slow", "tok", api_key="key")
+    assert len(kite.hits) == kite_client.MAX_RETRIES + 1
+    # Three 0.1s reads plus 0.05 + 0.1 backoff; nowhere near the 0.5s answers
+    assert time.monotonic() - started < 1.2
+
+
+def test_post_is_never_retried(kite):
+    kite.script["/session/token"] = [503]
+
+    assert kite_client.kite_post("/session/token", {"request_token": "r"}).status_code == 503
+    assert [hit[:2] for hit in kite.hits] == [("POST", "/session/token")]
+
+
+def test_async_calls_share_the_retry_policy(kite, monkeypatch):
+    monkeypatch.setitem(kite_client.TIMEOUTS, "/slow", (1, 0.1))
+    kite.script["/portfolio/holdings"] = [503]
+    kite.script["/session/token"] = [503]
+
+    async def scenario():
+        try:
+            get = await kite_client.akite_get("/portfolio/holdings", "tok", api_key="key")
+            post = await kite_client.akite_post("/session/token", {"request_token": "r"})
+            with pytest.raises(httpx.TimeoutException):
+                await kite_client.akite_get("/slow", "tok", api_key="key")
+            return get.status_code, post.status_code
+        finally:
+            await kite_client.aclose_async_client()
+
+    assert asyncio.run(scenario()) == (200, 503)
+    calls = [hit[:2] for hit in kite.hits]
+    assert calls.count(("GET", "/portfolio/holdings")) == 2
+    assert calls.count(("POST", "/session/token")) == 1
+    assert calls.count(("GET", "/slow")) == kite_client.MAX_RETRIES + 1
+
+
+def test_token_bucket_caps_requests_at_ten_per_second(kite, monkeypatch):
+    monkeypatch.setattr(kite_client, "_bucket",
+                        TokenBucket(kite_client.RATE_LIMIT_PER_SEC, kite_client.RATE_LIMIT_BURST))
+
+    threads = [threading.Thread(target=kite_client.kite_get, args=("/user/margins/equity", "tok", "key"))
+               for _ in range(25)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    times = sorted(hit[2] for hit in kite.hits)
+    assert len(times) == 25
+    # The burst of 10 goes at once; the other 15 are spaced at 10/s
+    assert times[-1] - times[0] >= 1.4
+    for start in range(len(times) - 20):
+        assert times[start + 20] - times[start] >= 1.0 - 0.05
@@ -0,0 +1,52 @@
+"""
+Data-carrying migrations, run against rows written under the old schema.
+"""
+
+from backend.app.services import db
+
+
+def _migrate_to(monkeypatch, tmp_path, last_version: int):
+    """A scratch database migrated up to and including `last_version`."""
+    db.close_connections()
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "test.db")
+    discover = db._discover_migrations
+    monkeypatch.setattr(db, "_discover_migrations",
+                        lambda: [m for m in discover() if m[0] <= last_version])
+    db.run_migrations()
+    monkeypatch.setattr(db, "_discover_migrations", discover)
+    return db.get_connection()
+
+
+def test_0013_assigns_trades_to_accounts(monkeypatch, tmp_path):
+    conn = _migrate_to(monkeypatch, tmp_path, 12)
+    with db.transaction():
+        conn.execute("""
+            INSERT INTO zerodha_sessions (id, user_id, access_token, created_at, expires_at)
+            VALUES ('s1', 'AB1234', 'tok', '2024-01-01', '2024-01-02'),
+                   ('s2', 'AB1234', 'tok', '2024-01-02', '2024-01-03')
+        """)
+        for trade_id, source_file in (("T1", "tradebook-QX1480-EQ.csv"),
+                                      ("T2", "tradebook-QX1480-EQ (1).csv"),
+                                      ("T3", "kite_api_sync"),
+                                      ("T4", "manual.csv")):
+            conn.execute("""
+                INSERT INTO trades (symbol, trade_date, exchange, trade_type, quantity, price,
+                                    trade_id, source_file)
+                VALUES ('INFY', '2024-01-01', 'NSE', 'buy', 1, 100, ?, ?)
+            """, (trade_id, source_file))
+
+    try:
+        db.run_migrations()
+        rows = conn.execute("SELECT id, trade_id, user_id FROM trades ORDER BY id").fetchall()
+        assert [(r["id"], r["trade_id"], r["user_id"]) for r in rows] == [
+            (1, "T1", "QX1480"), (2, "T2", "QX1480"), (3, "T3", "AB1234"), (4, "T4", ""),
+        ]
+
+        # New rows continue after the copied ids
+        db.insert_trades([
+            ("INFY", None, "2024-01-02", "NSE", "EQ", "EQ", "sell", "", 1, 110.0,
+             "T5", "O5", "", "test", "AB1234"),
+        ])
+        assert conn.execute("SELECT MAX(id) FROM trades").fetchone()[0] == 5
+    finally:
+        db.close_connections()
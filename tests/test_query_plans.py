@@ -0,0 +1,111 @@
+"""
+The hot queries named in migration 0002 must be served by their indexes.
+Each test runs the real code path, captures the SQL it issued and checks
+EXPLAIN QUERY PLAN for it.
+"""
+
+import re
+
+from conftest import query_plan, traced
+
+from backend.app.services import db, lot_ledger
+from backend.app.services.fifo_vectorized import load_trade_arrays
+
+
+def _plans(conn, statements, *fragments: str) -> list:
+    plans = [query_plan(conn, sql) for sql in statements
+             if sql.lstrip().upper().startswith("SELECT") and all(f in sql for f in fragments)]
+    assert plans, f"no SELECT containing {fragments} was run"
+    return plans
+
+
+def _seed_trades(conn):
+    db.insert_trades([
+        ("INFY", "INE009A01021", f"2024-01-0{day}", "NSE", "EQ", "EQ", side, "", 10, 1500.0,
+         f"T{day}{side}", f"O{day}", f"2024-01-0{day}T10:00:00", "test", "AB1234")
+        for day in range(1, 6) for side in ("buy", "sell")
+    ])
+
+
+def test_fifo_trade_scans_use_chronological_index(conn):
+    _seed_trades(conn)
+    with traced(conn) as statements:
+        lot_ledger.rebuild_ledger()
+        load_trade_arrays()
+
+    plans = _plans(conn, statements, "FROM trades", "ORDER BY user_id, symbol, trade_date")
+    assert len(plans) == 2
+    for plan in plans:
+        assert any("idx_trades_user_symbol_chrono" in step for step in plan), plan
+        # At most the tail of the ORDER BY (exec time / type / id) is sorted
+        assert "USE TEMP B-TREE FOR ORDER BY" not in plan, plan
+
+    # Per-account, per-symbol replay after a back-dated trade
+    with traced(conn) as statements, db.transaction():
+        lot_ledger._rebuild_symbol(conn, "AB1234", "INFY")
+    for plan in _plans(conn, statements, "FROM trades", "ORDER BY trade_date"):
+        assert any("idx_trades_user_symbol_chrono (user_id=? AND symbol=?)" in step for step in plan), plan
+
+
+def test_account_reads_seek_to_the_account(conn):
+    from backend.app.services.dashboard import trade_counts
+    from backend.app.services.trades import compute_historical_holdings
+
+    _seed_trades(conn)
+    with traced(conn) as statements:
+        compute_historical_holdings([], user_id="AB1234")
+        trade_counts("AB1234")   # summaries are stale: counted from trades
+
+    plans = (_plans(conn, statements, "FROM trades", "AND user_id = 'AB1234'")
+             + _plans(conn, statements, "FROM trades WHERE user_id = 'AB1234'"))
+    assert len(plans) == 2
+    for plan in plans:
+        assert any("idx_trades_user_symbol_chrono (user_id=?)" in step for step in plan), plan
+
+
+def test_snapshot_duplicate_check_uses_snapshot_date(conn):
+    holdings = [{"tradingsymbol": "INFY", "exchange": "NSE", "quantity": 5,
+                 "average_price": 1400.0, "last_price": 1500.0, "pnl": 500.0}]
+    with traced(conn) as statements:
+        db.write_holdings_snapshots([
+            ("2024-01-02", "EOD", "2024-01-02T16:45:00+05:30", "AB1234", holdings),
+        ])
+
+    for plan in _plans(conn, statements, "FROM holdings_snapshots"):
+        assert any("idx_snapshots_date_type" in step and "snapshot_date=?" in step for step in plan), plan
+
+
+def test_snapshot_meta_uses_tradingsymbol_index(conn):
+    with traced(conn) as statements:
+        db.get_latest_snapshot_meta("INFY")
+
+    for plan in _plans(conn, statements, "FROM holdings_snapshots"):
+        assert plan == ["SEARCH holdings_snapshots USING COVERING INDEX idx_snapshots_symbol_at (tradingsymbol=?)"]
+
+
+def test_active_token_lookups_use_sessions_index(conn):
+    with traced(conn) as statements:
+        db.get_active_accounts()
+
+    for plan in _plans(conn, statements, "FROM zerodha_sessions"):
+        assert any("idx_sessions_active" in step and "is_active=?" in step for step in plan), plan
+        assert not any(step.startswith("SCAN zerodha_sessions") for step in plan), plan
+
+
+def test_summary_freshness_check_does_not_read_trades(conn):
+    from backend.app.services import analytics
+
+    assert not analytics.is_current()
+    _seed_trades(conn)
+    analytics.refresh_analytics()
+
+    with traced(conn) as statements:
+        assert analytics.get_trade_counts() == {"INFY": 10}
+    assert not any(re.search(r"\b(FROM|JOIN) trades\b", sql) for sql in statements), statements
+
+    # An insert that adds rows bumps the write counter
+    db.insert_trades([("TCS", None, "2024-02-01", "NSE", "EQ", "EQ", "buy", "", 1, 3500.0,
+                       "T-TCS", "O-TCS", "", "test", "AB1234")])
+    assert analytics.get_trade_counts() is None
+    analytics.refresh_analytics()
+    assert analytics.get_trade_counts() == {"INFY": 10, "TCS": 1}
@@ -0,0 +1,161 @@
+"""
+SQL statements per request for the portfolio routes: the instrument and
+sector work is batched, so the count must not grow with the portfolio.
+Also: route-level session checks.
+"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.app.routes import portfolio
+from backend.app.services import db, enrichment
+from backend.app.services.sector_map import SECTOR_MAP
+
+
+@pytest.fixture
+def statements(conn, monkeypatch):
+    """Every statement run on any thread's connection (route, DB executor)."""
+    statements = []
+    connect = db._connect
+
+    def traced_connect():
+        new = connect()
+        new.set_trace_callback(statements.append)
+        return new
+
+    db.close_connections()
+    monkeypatch.setattr(db, "_connect", traced_connect)
+    monkeypatch.setattr(enrichment, "_queued", set())
+    monkeypatch.setattr(enrichment, "_queue", enrichment.queue.Queue())
+    return statements
+
+
+def _client(monkeypatch, n_holdings: int) -> TestClient:
+    # Half sector_map symbols (sector written on first sight), half left
+    # to the enrichment worker
+    mapped = list(SECTOR_MAP)[:n_holdings // 2]
+    symbols = mapped + [f"UNMAPPED{i}" for i in range(n_holdings - len(mapped))]
+    holdings = [
+        {"tradingsymbol": symbol, "exchange": "NSE", "isin": None,
+         "quantity": 10, "average_price": 100.0, "last_price": 110.0, "pnl": 100.0}
+        for symbol in symbols
+    ]
+
+    async def fake_holdings(session_id):
+        return holdings
+
+    monkeypatch.setattr(portfolio, "afetch_zerodha_holdings", fake_holdings)
+    app = FastAPI()
+    app.include_router(portfolio.router)
+    client = TestClient(app)
+    client.cookies.set("tf_session", db.save_zerodha_session("AB1234", "tok"))
+    return client
+
+
+def _seed_exited(n_symbols: int, user_id: str = "AB1234", price: float = 100.0):
+    db.insert_trades([
+        (f"EXITED{s}", f"INE{s:09d}", f"2024-0{1 + i}-10", "NSE", "EQ", "EQ", side, "",
+         5, price + i, f"T{s}-{side}", f"O{s}-{side}", "", "test", user_id)
+        for s in range(n_symbols) for i, side in enumerate(("buy", "sell"))
+    ])
+
+
+def _count(statements, client, path: str) -> int:
+    statements.clear()
+    response = client.get(path)
+    assert response.status_code == 200, response.text
+    # BEGIN/COMMIT bracket writes; count the statements doing the work
+    return sum(1 for sql in statements if sql.split()[0].upper() not in ("BEGIN", "COMMIT"))
+
+
+@pytest.mark.parametrize("path", ["/portfolio/holdings", "/portfolio/sector-allocation",
+                                  "/portfolio/historical-holdings"])
+def test_statement_count_is_independent_of_portfolio_size(statements, monkeypatch, path):
+    counts = []
+    for size in (2, 40):
+        db.get_connection().execute("DELETE FROM trades")
+        db.get_connection().execute("DELETE FROM instruments")
+        _seed_exited(size)
+        client = _client(monkeypatch, size)
+        # First request creates instruments; the second is the steady state
+        counts.append([_count(statements, client, path) for _ in range(2)])
+
+    assert counts[0] == counts[1]
+    assert max(max(c) for c in counts) <= 8, counts
+
+
+def test_all_accounts_trade_sync_needs_a_session(conn, monkeypatch):
+    calls = []
+    monkeypatch.setattr(portfolio, "sync_all_accounts", lambda trigger: calls.append(trigger) or {})
+    app = FastAPI()
+    app.include_router(portfolio.router)
+    client = TestClient(app)
+
+    assert client.post("/portfolio/trade-sync/trigger?all_accounts=true").status_code == 401
+    assert calls == []
+
+    client.cookies.set("tf_session", db.save_zerodha_session("AB1234", "tok"))
+    assert client.post("/portfolio/trade-sync/trigger?all_accounts=true").status_code == 200
+    assert calls == ["manual"]
+
+
+def test_trade_sync_stores_fills_under_the_callers_account(conn, monkeypatch):
+    from backend.app.services import trade_sync
+
+    class Response:
+        status_code = 200
+
+        def json(self):
+            return {"data": [{
+                "tradingsymbol": "INFY", "exchange": "NSE", "product": "CNC",
+                "transaction_type": "BUY", "quantity": 5, "average_price": 1500.0,
+                "trade_id": "T1", "order_id": "O1", "fill_timestamp": "2024-06-03 10:00:00",
+            }]}
+
+    tokens = []
+    monkeypatch.setattr(trade_sync, "KITE_API_KEY", "key")
+    monkeypatch.setattr(trade_sync, "kite_get", lambda path, token, api_key: tokens.append(token) or Response())
+    db.save_zerodha_session("OTHER1", "tok-other")
+    app = FastAPI()
+    app.include_router(portfolio.router)
+    client = TestClient(app)
+
+    # No cookie: no falling back to some other account's token
+    assert client.post("/portfolio/trade-sync/trigger").status_code == 401
+    assert tokens == []
+
+    client.cookies.set("tf_session", db.save_zerodha_session("AB1234", "tok-ab"))
+    assert client.post("/portfolio/trade-sync/trigger").json()["inserted"] == 1
+    assert tokens == ["tok-ab"]
+    assert [tuple(r) for r in conn.execute("SELECT trade_id, user_id FROM trades")] == [("T1", "AB1234")]
+
+
+@pytest.mark.parametrize("summaries", ["current", "stale"])
+def test_trade_routes_only_see_the_callers_account(statements, monkeypatch, summaries):
+    from backend.app.services.analytics import refresh_analytics
+
+    _seed_exited(2, user_id="AB1234", price=100.0)   # realised 5 per symbol
+    _seed_exited(3, user_id="CD5678", price=200.0)   # same symbols, another account
+    if summaries == "current":
+        refresh_analytics()
+    client = _client(monkeypatch, 0)
+
+    by_fy = client.get("/portfolio/realised-pnl/by-fy?include_symbols=true").json()
+    assert [(r["label"], r["realised_pnl"], r["symbols_sold"]) for r in by_fy["data"]] == [("FY2023-24", 10.0, 2)]
+
+    specific = client.get("/portfolio/realised-pnl?fy=FY2023-24").json()["specific_fy"]
+    assert (specific["realised_pnl"], specific["total_sells"]) == (10.0, 2)
+
+    historical = client.get("/portfolio/historical-holdings").json()
+    assert [(d["user_id"], d["symbol"]) for d in historical["data"]] == [("AB1234", "EXITED0"), ("AB1234", "EXITED1")]
+
+    dashboard = client.get("/portfolio/dashboard?fields=session,realised_pnl,historical&fy=FY2023-24").json()
+    assert dashboard["session"]["user_id"] == "AB1234"
+    assert dashboard["realised_pnl"]["specific_fy"]["realised_pnl"] == 10.0
+    assert dashboard["historical"]["count"] == 2
+
+    client.cookies.clear()
+    for path in ("/portfolio/realised-pnl", "/portfolio/realised-pnl/by-fy",
+                 "/portfolio/historical-holdings", "/portfolio/dashboard?fields=realised_pnl"):
+        assert client.get(path).status_code == 401, path
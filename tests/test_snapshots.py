@@ -0,0 +1,124 @@
+"""
+Scheduled snapshots go through the write-behind queue: a capture returns
+once queued and the writer records its run after committing, reruns are
+deduplicated, failures free their window, and shutdown writes out
+whatever is still queued.
+"""
+
+from datetime import datetime
+
+import pytest
+
+from backend.app.services import snapshots
+from backend.app.services.db import IST
+
+NOW = IST.localize(datetime(2024, 6, 3, 17, 0))  # Monday, EOD window
+HOLDINGS = {
+    "U1": [{"tradingsymbol": "INFY", "exchange": "NSE", "quantity": 5,
+            "average_price": 1400.0, "last_price": 1500.0, "pnl": 500.0}],
+    "U2": [{"tradingsymbol": "TCS", "exchange": "NSE", "quantity": 2,
+            "average_price": 3500.0, "last_price": 3800.0, "pnl": 600.0},
+           {"tradingsymbol": "ITC", "exchange": "NSE", "quantity": 10,
+            "average_price": 400.0, "last_price": 430.0, "pnl": 300.0}],
+}
+
+
+@pytest.fixture
+def writer(conn, monkeypatch):
+    monkeypatch.setattr(snapshots, "_queue", snapshots.queue.Queue())
+    monkeypatch.setattr(snapshots, "_seen", set())
+    monkeypatch.setattr(snapshots, "_stats", dict.fromkeys(snapshots._stats, 0))
+    monkeypatch.setattr(snapshots, "get_active_accounts",
+                        lambda: [{"user_id": u, "access_token": f"tok-{u}"} for u in HOLDINGS])
+    monkeypatch.setattr(snapshots, "_fetch_all",
+                        lambda accounts: ({a["user_id"]: HOLDINGS[a["user_id"]] for a in accounts}, {}))
+    yield
+    snapshots.stop_snapshot_writer()
+
+
+def _stored(conn) -> int:
+    return conn.execute("SELECT COUNT(*) FROM holdings_snapshots").fetchone()[0]
+
+
+def _capture(**kwargs) -> dict:
+    """Capture, wait for the writer, and return the recorded run."""
+    snapshots.capture_holdings_snapshots("EOD", now_ist=NOW, **kwargs)
+    snapshots.flush_snapshots()
+    return snapshots.get_snapshot_status(limit=1)["runs"][0]
+
+
+def test_capture_is_recorded_after_the_writer_commits(conn, writer, monkeypatch):
+    # Writer not running: the capture returns with its snapshots queued
+    start_writer = snapshots._ensure_writer
+    monkeypatch.setattr(snapshots, "_ensure_writer", lambda: None)
+    queued = snapshots.capture_holdings_snapshots("EOD", now_ist=NOW)
+    assert (queued["status"], queued["accounts"]) == ("queued", 2)
+    assert snapshots.get_snapshot_status()["runs"] == []
+
+    start_writer()
+    snapshots.flush_snapshots()
+    run = snapshots.get_snapshot_status()["runs"][0]
+    assert (run["status"], run["snapshots_written"], run["rows_written"]) == ("ok", 2, 3)
+    assert _stored(conn) == 3
+    assert snapshots.get_snapshot_writer_status()["written"] == 2
+
+    # Same window again: deduplicated in memory, nothing queued, recorded at once
+    rerun = snapshots.capture_holdings_snapshots("EOD", now_ist=NOW)
+    assert (rerun["status"], rerun["snapshots_written"]) == ("ok", 0)
+    assert snapshots.get_snapshot_writer_status()["deduped"] == 2
+    assert _stored(conn) == 3
+
+
+def test_failed_write_frees_the_window(conn, writer, monkeypatch):
+    real = snapshots.write_holdings_snapshots
+
+    def broken(batch):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(snapshots, "write_holdings_snapshots", broken)
+    run = _capture()
+    assert run["status"] == "failed" and "disk full" in run["error"]
+    assert _stored(conn) == 0
+
+    monkeypatch.setattr(snapshots, "write_holdings_snapshots", real)
+    retry = _capture()
+    assert (retry["status"], retry["snapshots_written"]) == ("ok", 2)
+
+
+def test_shutdown_writes_out_queued_snapshots(conn, writer, monkeypatch):
+    # Writer not running: snapshots stay queued until shutdown
+    monkeypatch.setattr(snapshots, "_ensure_writer", lambda: None)
+    ticket = snapshots.enqueue_holdings_snapshots(
+        (NOW.date().isoformat(), "EOD", NOW.isoformat(), user_id, h) for user_id, h in HOLDINGS.items()
+    )
+    assert not ticket.done.is_set() and _stored(conn) == 0
+
+    snapshots.stop_snapshot_writer()
+    assert ticket.done.is_set()
+    assert ticket.written == {"snapshots": 2, "rows": 3}
+    assert _stored(conn) == 3
+
+
+def test_manual_trigger_needs_a_session_and_covers_only_its_account(conn, writer, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from backend.app.routes import portfolio
+    from backend.app.services.db import save_zerodha_session
+
+    app = FastAPI()
+    app.include_router(portfolio.router)
+    client = TestClient(app)
+
+    assert client.post("/portfolio/snapshots/trigger").status_code == 401
+    client.cookies.set("tf_session", "not-a-session")
+    assert client.post("/portfolio/snapshots/trigger").status_code == 401
+
+    client.cookies.set("tf_session", save_zerodha_session("U2", "tok-U2"))
+    assert client.post("/portfolio/snapshots/trigger?type=EOD").json()["status"] == "queued"
+    snapshots.flush_snapshots()
+    run = snapshots.get_snapshot_status(limit=1)["runs"][0]
+    assert (run["trigger"], run["accounts"], run["snapshots_written"], run["rows_written"]) == ("manual", 1, 1, 2)
+    assert [r[0] for r in conn.execute("SELECT DISTINCT user_id FROM holdings_snapshots")] == ["U2"]
+    # A one-account run doesn't satisfy the scheduler's catch-up check
+    assert not snapshots.snapshot_captured("EOD", run["snapshot_date"])
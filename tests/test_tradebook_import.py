@@ -0,0 +1,81 @@
+"""
+Tradebook import: manifest bookkeeping for unchanged files, and the
+chunked process-pool path against the in-process one.
+"""
+
+import os
+import shutil
+from pathlib import Path
+
+from backend.app.services import trades
+
+BUNDLED = Path(trades.DATA_DIR)
+BOOK = "tradebook-QX1480-EQ.csv"
+
+
+def _manifest(conn) -> dict:
+    return {r["file_name"]: dict(r) for r in conn.execute("SELECT * FROM import_manifest")}
+
+
+def test_touched_and_renamed_files_keep_row_count(conn, tmp_path):
+    book = tmp_path / BOOK
+    shutil.copy(BUNDLED / BOOK, book)
+    first = trades.import_tradebooks(tmp_path)[BOOK]
+    assert first["status"] == "imported" and first["rows"] > 0
+
+    # Touch: same name and content, new mtime
+    os.utime(book, (book.stat().st_atime, book.stat().st_mtime + 60))
+    assert trades.import_tradebooks(tmp_path)[BOOK]["rows"] == first["rows"]
+    entry = _manifest(conn)[BOOK]
+    assert entry["row_count"] == first["rows"]
+    assert entry["inserted"] == first["inserted"]
+    assert entry["mtime"] == book.stat().st_mtime
+
+    # Copy under a new name: recorded with the original's row count
+    copy = tmp_path / "tradebook-QX1480-EQ (copy).csv"
+    shutil.copy(book, copy)
+    summary = trades.import_tradebooks(tmp_path)
+    assert summary[copy.name] == trades._unchanged_summary(first["rows"])
+    assert _manifest(conn)[copy.name]["row_count"] == first["rows"]
+
+    # And both stay skipped, with their real counts, on the next run
+    summary = trades.import_tradebooks(tmp_path)
+    assert {s["rows"] for s in summary.values()} == {first["rows"]}
+
+
+def test_chunked_pool_import_matches_in_process(conn, tmp_path, monkeypatch):
+    for path in BUNDLED.glob(trades.TRADEBOOK_GLOB):
+        shutil.copy(path, tmp_path / path.name)
+
+    serial = trades.import_tradebooks(tmp_path)
+    expected = conn.execute("SELECT * FROM trades ORDER BY trade_id, symbol").fetchall()
+    conn.execute("DELETE FROM trades")
+    conn.execute("DELETE FROM import_manifest")
+
+    # Force the pool, with chunks small enough to split every file
+    monkeypatch.setattr(trades, "PARALLEL_MIN_BYTES", 0)
+    monkeypatch.setattr(trades, "IMPORT_CHUNK_BYTES", 16 * 1024)
+    pooled = trades.import_tradebooks(tmp_path)
+
+    assert {name: s["rows"] for name, s in pooled.items()} == {name: s["rows"] for name, s in serial.items()}
+    actual = conn.execute("SELECT * FROM trades ORDER BY trade_id, symbol").fetchall()
+    assert [tuple(r)[1:-1] for r in actual] == [tuple(r)[1:-1] for r in expected]  # minus id, imported_at
+
+
+def test_parsing_runs_outside_write_transactions(conn, tmp_path, monkeypatch):
+    shutil.copy(BUNDLED / BOOK, tmp_path / BOOK)
+    read_rows = trades._read_tradebook_rows
+    parsed_in_transaction = []
+
+    def watched_rows(path, errors):
+        for row in read_rows(path, errors):
+            parsed_in_transaction.append(conn.in_transaction)
+            yield row
+
+    monkeypatch.setattr(trades, "_read_tradebook_rows", watched_rows)
+    monkeypatch.setattr(trades, "IMPORT_BATCH_ROWS", 50)
+    summary = trades.import_tradebooks(tmp_path)[BOOK]
+
+    assert summary["rows"] == len(parsed_in_transaction) > 50
+    assert not any(parsed_in_transaction)
+    assert _manifest(conn)[BOOK]["row_count"] == summary["rows"]